@@ -360,6 +360,18 @@ of the choice of plugin.
         Plugins that support the concept of build types build in Release mode
         by default. Setting the 'debug' attribute requests that they instead
         build in Debug mode.
+
+      - incremental-build:
+        Keep the build directory when the part is built again because its
+        source changed, only bringing over the source files that changed
+        (hard-linked where possible) and removing the ones that are gone.
+        This allows build systems to reuse their previous results.
+
+      - source-fingerprint:
+        Record a digest of the contents of a local source when pulling, and
+        pull the part again whenever those contents change.
+
+        Supported by: local sources
 """
 
 from collections import OrderedDict                 # noqa
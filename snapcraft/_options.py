@@ -145,6 +145,10 @@ class ProjectOptions:
 
         return build_count
 
+    @property
+    def jobs(self):
+        return self.__jobs
+
     @property
     def is_cross_compiling(self):
         return self.__target_machine != self.__platform_arch
@@ -214,7 +218,7 @@ class ProjectOptions:
         return self.__debug
 
     def __init__(self, use_geoip=False, parallel_builds=True,
-                 target_deb_arch=None, debug=False):
+                 target_deb_arch=None, debug=False, jobs=1):
         # TODO: allow setting a different project dir and check for
         #       snapcraft.yaml
         self.__project_dir = os.getcwd()
@@ -222,6 +226,7 @@ class ProjectOptions:
         self.__parallel_builds = parallel_builds
         self._set_machine(target_deb_arch)
         self.__debug = debug
+        self.__jobs = jobs
 
     def get_core_dynamic_linker(self):
         """Returns the dynamic linker used for the targeted core.
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import functools
+import importlib
 import logging
 import os
 import sys
@@ -26,28 +27,37 @@ from snapcraft.internal import deprecations
 from snapcraft.internal import log
 from . import echo
 from . import env
-from .assertions import assertionscli
-from .containers import containerscli
-from .discovery import discoverycli
-from .lifecycle import lifecyclecli
-from .store import storecli
-from .parts import partscli
-from .help import helpcli
-from .ci import cicli
 from ._options import add_build_options
 from ._errors import exception_handler
 
 
-command_groups = [
-    storecli,
-    cicli,
-    assertionscli,
-    containerscli,
-    discoverycli,
-    helpcli,
-    lifecyclecli,
-    partscli,
-]
+# The command groups, with the commands they provide, are only imported when
+# one of their commands is needed. This keeps the modules behind them from
+# being loaded on every run.
+_COMMAND_GROUPS = {
+    'store': ('storecli', [
+        'close', 'export-login', 'list-registered', 'list-revisions',
+        'login', 'logout', 'push', 'push-metadata', 'register', 'release',
+        'status', 'whoami']),
+    'ci': ('cicli', ['enable-ci']),
+    'assertions': ('assertionscli', [
+        'create-key', 'edit-collaborators', 'gated', 'list-keys',
+        'register-key', 'sign-build', 'validate']),
+    'cache': ('cachecli', ['cache']),
+    'containers': ('containerscli', ['refresh']),
+    'discovery': ('discoverycli', ['list-plugins']),
+    'help': ('helpcli', ['help']),
+    'lifecycle': ('lifecyclecli', [
+        'build', 'clean', 'cleanbuild', 'init', 'pack', 'prime', 'pull',
+        'snap', 'stage']),
+    'parts': ('partscli', ['define', 'search', 'update']),
+}
+
+_COMMAND_MODULES = {
+    command: module
+    for module, (_, commands) in _COMMAND_GROUPS.items()
+    for command in commands
+}
 
 _CMD_DEPRECATED_REPLACEMENTS = {
     'strip': 'prime',
@@ -82,14 +92,29 @@ class SnapcraftGroup(click.Group):
             else:
                 echo.warning('DEPRECATED: Use {!r} instead of {!r}'.format(
                     new_cmd_name, cmd_name))
-            cmd = click.Group.get_command(self, ctx, new_cmd_name)
+            cmd = self._get_command(ctx, new_cmd_name)
         else:
             cmd_name = _CMD_ALIASES.get(cmd_name, cmd_name)
-            cmd = click.Group.get_command(self, ctx, cmd_name)
+            cmd = self._get_command(ctx, cmd_name)
         return cmd
 
+    def _get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in _COMMAND_MODULES:
+            self._add_command_group(_COMMAND_MODULES[cmd_name])
+        return click.Group.get_command(self, ctx, cmd_name)
+
+    def _add_command_group(self, module_name):
+        # This would be much easier if they were subcommands
+        group_name, _ = _COMMAND_GROUPS[module_name]
+        module = importlib.import_module(
+            '.{}'.format(module_name), __name__)
+        command_group = getattr(module, group_name)
+        for command in command_group.commands.values():
+            self.add_command(command)
+
     def list_commands(self, ctx):
-        commands = super().list_commands(ctx)
+        commands = sorted(
+            set(super().list_commands(ctx)).union(_COMMAND_MODULES))
         # Let's keep edit-collaborators hidden until we get the green light
         # from the store.
         commands.pop(commands.index('edit-collaborators'))
@@ -121,10 +146,4 @@ def run(ctx, debug, catch_exceptions=False, **kwargs):
     log.configure(log_level=log_level)
     # The default command
     if not ctx.invoked_subcommand:
-        ctx.forward(lifecyclecli.commands['snap'])
-
-
-# This would be much easier if they were subcommands
-for command_group in command_groups:
-    for command in command_group.commands:
-        run.add_command(command_group.commands[command])
+        ctx.forward(ctx.command.get_command(ctx, 'snap'))
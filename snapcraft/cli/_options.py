@@ -26,6 +26,7 @@ class HiddenOption(click.Option):
 
 _BUILD_OPTION_NAMES = [
     '--enable-geoip',
+    '--jobs',
     '--no-parallel-builds',
     '--target-arch',
 ]
@@ -34,6 +35,8 @@ _BUILD_OPTIONS = [
     dict(is_flag=True,
          help=('Detect best candidate location for stage-packages using '
                'geoip')),
+    dict(metavar='<n>', type=int,
+         help='Number of parts to pull and build concurrently.'),
     dict(is_flag=True,
          help='Force a squential build.'),
     dict(metavar='<arch>',
@@ -63,6 +66,7 @@ def get_project_options(**kwargs):
         use_geoip=kwargs.pop('enable_geoip'),
         parallel_builds=not kwargs.pop('no_parallel_builds'),
         target_deb_arch=kwargs.pop('target_arch'),
+        jobs=kwargs.pop('jobs', None) or 1,
     )
 
     return ProjectOptions(**project_args)
@@ -0,0 +1,74 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import click
+from tabulate import tabulate
+
+from snapcraft.internal import cache as snapcraft_cache
+
+
+@click.group()
+def cachecli():
+    pass
+
+
+@cachecli.group()
+def cache():
+    """Inspect and prune the snapcraft cache."""
+
+
+@cache.command()
+def stats():
+    """Show the number of entries and size of each part of the cache."""
+    cache_stats = snapcraft_cache.CacheManager().stats()
+    rows = []
+    total_count = total_size = 0
+    for section, (count, size) in cache_stats.items():
+        rows.append((section, count, _format_size(size)))
+        total_count += count
+        total_size += size
+    rows.append(('total', total_count, _format_size(total_size)))
+    click.echo(tabulate(rows, headers=['Cache', 'Entries', 'Size'],
+                        tablefmt='plain'))
+
+
+@cache.command()
+@click.option('--max-size', metavar='<size>',
+              help=('Size to shrink the cache to, e.g. 10G. Defaults to '
+                    '$SNAPCRAFT_CACHE_MAX_SIZE, or to emptying the cache.'))
+def prune(max_size):
+    """Evict the least recently used entries from the cache.
+
+    \b
+    Examples:
+        snapcraft cache prune
+        snapcraft cache prune --max-size 5G
+    """
+    if max_size is not None:
+        max_size = snapcraft_cache.parse_size(max_size)
+    else:
+        max_size = snapcraft_cache.get_max_size() or 0
+
+    pruned = snapcraft_cache.CacheManager().prune(max_size=max_size)
+    click.echo('Pruned {} cache entries.'.format(len(pruned)))
+
+
+def _format_size(size):
+    if size < 1024:
+        return '{} B'.format(size)
+    for unit in ('KiB', 'MiB', 'GiB', 'TiB'):
+        size /= 1024
+        if size < 1024 or unit == 'TiB':
+            return '{:.1f} {}'.format(size, unit)
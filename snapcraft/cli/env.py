@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
 from distutils import util
-from snapcraft.internal import errors, lxd
+from snapcraft.internal import errors
 
 
 class ContainerConfig:
@@ -37,6 +37,8 @@ class ContainerConfig:
             self._remote = None
         except ValueError:
             self._use_container = True
+            # lxd brings in the whole lifecycle, only load it when needed.
+            from snapcraft.internal import lxd
             # Verbatim name of a remote
             if not lxd._remote_is_valid(container_builds):
                 raise errors.InvalidContainerRemoteError(container_builds)
@@ -19,9 +19,10 @@ import hashlib
 import logging
 import os
 import shutil
+import stat
 import subprocess
 import sys
-from typing import Pattern, Callable, Generator
+from typing import Pattern, Callable, Generator, List, Set
 
 
 from snapcraft.internal.errors import (
@@ -121,14 +122,39 @@ def link_or_copy(source: str, destination: str,
         with suppress(OSError):
             os.unlink(destination)
 
-        shutil.copy2(source, destination, follow_symlinks=follow_symlinks)
-        uid = os.stat(source, follow_symlinks=follow_symlinks).st_uid
-        gid = os.stat(source, follow_symlinks=follow_symlinks).st_gid
-        try:
-            os.chown(destination, uid, gid, follow_symlinks=follow_symlinks)
-        except PermissionError as e:
-            logger.debug('Unable to chown {destination}: {error}'.format(
-                destination=destination, error=e))
+        copy(source, destination, follow_symlinks=follow_symlinks)
+
+
+def copy(source: str, destination: str,
+         follow_symlinks: bool=False) -> None:
+    """Copy source to destination, preserving metadata and ownership.
+
+    :param str source: The source to be copied.
+    :param str destination: The destination to copy to.
+    :param bool follow_symlinks: Whether or not symlinks should be followed.
+    """
+    shutil.copy2(source, destination, follow_symlinks=follow_symlinks)
+    uid = os.stat(source, follow_symlinks=follow_symlinks).st_uid
+    gid = os.stat(source, follow_symlinks=follow_symlinks).st_gid
+    try:
+        os.chown(destination, uid, gid, follow_symlinks=follow_symlinks)
+    except PermissionError as e:
+        logger.debug('Unable to chown {destination}: {error}'.format(
+            destination=destination, error=e))
+
+
+def unshare(path: str) -> None:
+    """Give path a copy of its own if it is hard-linked elsewhere.
+
+    Files linked from a cache must be unshared before they are modified in
+    place, so that the change does not show through every other link.
+
+    :param str path: The file to unshare.
+    """
+    if os.stat(path, follow_symlinks=False).st_nlink > 1:
+        tmp_path = path + '.snapcraft-unshare'
+        copy(path, tmp_path)
+        os.replace(tmp_path, path)
 
 
 def link_or_copy_tree(source_tree: str, destination_tree: str,
@@ -177,6 +203,130 @@ def link_or_copy_tree(source_tree: str, destination_tree: str,
             copy_function(source, destination)
 
 
+def sync_tree(source_tree: str, destination_tree: str, *,
+              synced_paths: Set[str]=None,
+              ignore: Callable[[str, List[str]], List[str]]=None,
+              prune: bool=False) -> Set[str]:
+    """Update destination_tree so it mirrors source_tree, hard-linking files.
+
+    Only the entries that changed since they were last synced are replaced.
+    Entries that are in synced_paths, but no longer in source_tree, are
+    removed, while anything else found in destination_tree is left alone
+    unless prune is set.
+
+    :param str source_tree: Source directory to be mirrored.
+    :param str destination_tree: Destination directory.
+    :param set synced_paths: Relative paths returned by a previous call.
+    :param callable ignore: Callable with the same signature as the one
+                            taken by shutil.copytree.
+    :param bool prune: Whether to remove everything in destination_tree
+                       that is not in source_tree.
+    :returns: The relative paths of all the entries synced.
+    """
+
+    if not synced_paths:
+        synced_paths = set()
+    paths = set()  # type: Set[str]
+
+    create_similar_directory(source_tree, destination_tree)
+
+    # The destination may be inside the source, it is not synced to itself.
+    destination_abspath = os.path.abspath(destination_tree)
+    for root, directories, files in os.walk(source_tree):
+        directories[:] = [
+            d for d in directories
+            if os.path.abspath(os.path.join(root, d)) != destination_abspath]
+        files = _filter_walk(root, directories, files, ignore)
+        relroot = os.path.relpath(root, source_tree)
+        if prune:
+            _prune_directory(os.path.join(destination_tree, relroot),
+                             directories + files)
+        paths |= _sync_directories(root, os.path.join(
+            destination_tree, relroot), relroot, directories)
+        paths |= _sync_files(root, os.path.join(
+            destination_tree, relroot), relroot, files)
+
+    _remove_paths(destination_tree, synced_paths - paths)
+
+    return paths
+
+
+def _filter_walk(root, directories, files, ignore):
+    # Leaves out ignored entries, and moves symlinks to directories over
+    # to files as they are synced as such. Returns the files.
+    ignored = set(ignore(root, directories + files)) if ignore else set()
+    files = [f for f in files if f not in ignored]
+    files += [d for d in directories if d not in ignored and
+              os.path.islink(os.path.join(root, d))]
+    directories[:] = [d for d in directories if d not in ignored and
+                      not os.path.islink(os.path.join(root, d))]
+    return files
+
+
+def _sync_directories(source_root, destination_root, relroot, directories):
+    paths = set()
+    for directory in directories:
+        destination = os.path.join(destination_root, directory)
+        if os.path.islink(destination) or os.path.isfile(destination):
+            os.remove(destination)
+        create_similar_directory(
+            os.path.join(source_root, directory), destination)
+        paths.add(os.path.normpath(os.path.join(relroot, directory)))
+    return paths
+
+
+def _sync_files(source_root, destination_root, relroot, files):
+    paths = set()
+    for file_name in files:
+        source = os.path.join(source_root, file_name)
+        destination = os.path.join(destination_root, file_name)
+        paths.add(os.path.normpath(os.path.join(relroot, file_name)))
+        if not _is_synced(source, destination):
+            _remove_path(destination)
+            link_or_copy(source, destination)
+    return paths
+
+
+def _prune_directory(destination, names):
+    with suppress(FileNotFoundError):
+        _remove_paths(destination, set(os.listdir(destination)) - set(names))
+
+
+def _remove_paths(destination_tree, relpaths):
+    # Subdirectories sort after their parents, so reverse to remove them
+    # first.
+    for relpath in sorted(relpaths, reverse=True):
+        _remove_path(os.path.join(destination_tree, relpath))
+
+
+def _remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def _is_synced(source: str, destination: str) -> bool:
+    try:
+        destination_stat = os.stat(destination, follow_symlinks=False)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source, follow_symlinks=False)
+
+    if (source_stat.st_dev, source_stat.st_ino) == (
+            destination_stat.st_dev, destination_stat.st_ino):
+        return True
+
+    if stat.S_ISLNK(source_stat.st_mode):
+        return (stat.S_ISLNK(destination_stat.st_mode) and
+                os.readlink(source) == os.readlink(destination))
+
+    # A copy is considered synced as long as it has not been touched.
+    return (source_stat.st_mode == destination_stat.st_mode and
+            source_stat.st_size == destination_stat.st_size and
+            source_stat.st_mtime_ns == destination_stat.st_mtime_ns)
+
+
 def create_similar_directory(source: str, destination: str,
                              follow_symlinks: bool=False) -> None:
     """Create a directory with the same permission bits and owner information.
@@ -17,4 +17,8 @@
 from ._apt import AptStagePackageCache  # noqa
 from ._cache import SnapcraftCache      # noqa
 from ._file import FileCache            # noqa
+from ._git import GitCache              # noqa
+from ._manager import CacheManager      # noqa
+from ._manager import get_max_size, parse_size  # noqa
 from ._snap import SnapCache            # noqa
+from ._soname import SonameCache        # noqa
@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import os
+import tempfile
 
 from xdg import BaseDirectory
 
@@ -37,6 +39,32 @@ class SnapcraftCache:
     def prune(self, *args, **kwargs):
         raise NotImplementedError
 
+    def mark_used(self, path):
+        """Record that the cache entry at path was just used.
+
+        This is what the least recently used entries are evicted by.
+        """
+        with contextlib.suppress(OSError):
+            os.utime(path, follow_symlinks=False)
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Yield a temporary path that is moved to path once written.
+
+    Concurrent builds never see a partially written path this way.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.', dir=os.path.dirname(path))
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
 
 class SnapcraftProjectCache(SnapcraftCache):
     """Project specific cache"""
@@ -13,12 +13,15 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
 import logging
 import os
 import shutil
 
+import yaml
+
 from snapcraft.file_utils import calculate_hash
-from ._cache import SnapcraftCache
+from ._cache import SnapcraftCache, atomic_path
 
 logger = logging.getLogger(__name__)
 
@@ -47,13 +50,13 @@ class FileCache(SnapcraftCache):
                            'provided'.format(filename))
             return None
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
-        os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
         try:
             if not os.path.isfile(cached_file_path):
                 # this must not be hard-linked, as rebuilding a snap
                 # with changes should invalidate the cache, hence avoids
                 # using fileutils.link_or_copy.
-                shutil.copyfile(filename, cached_file_path)
+                with atomic_path(cached_file_path) as tmp_path:
+                    shutil.copyfile(filename, tmp_path)
         except OSError:
             logger.warning(
                 'Unable to cache file {}.'.format(cached_file_path))
@@ -71,6 +74,71 @@ class FileCache(SnapcraftCache):
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
         if os.path.exists(cached_file_path):
             logger.debug('Cache hit for hash {!r}'.format(hash))
+            self.mark_used(cached_file_path)
             return cached_file_path
         else:
             return None
+
+    def cache_download(self, *, filename, url, headers):
+        """Cache a file downloaded from url, to be revalidated later on.
+
+        Files served without an ETag nor a Last-Modified header are not
+        cached, as there would be no way to tell whether they changed.
+
+        :param str filename: path to the downloaded file.
+        :param str url: the url the file was downloaded from.
+        :param headers: the headers of the response filename came from.
+        :returns: path to cached file.
+        """
+        request_headers = dict()
+        if headers.get('ETag'):
+            request_headers['If-None-Match'] = headers.get('ETag')
+        if headers.get('Last-Modified'):
+            request_headers['If-Modified-Since'] = headers.get(
+                'Last-Modified')
+        if not request_headers:
+            return None
+
+        entry_path = self._get_download_path(url)
+        cached_file_path = os.path.join(entry_path, 'download')
+        try:
+            # this must not be hard-linked either, the downloaded file
+            # could be changed in place.
+            with atomic_path(cached_file_path) as tmp_path:
+                shutil.copyfile(filename, tmp_path)
+            # The headers go last, so they never validate a stale download.
+            with atomic_path(
+                    os.path.join(entry_path, 'headers.yaml')) as tmp_path:
+                with open(tmp_path, 'w') as headers_file:
+                    yaml.dump(request_headers, headers_file)
+        except OSError:
+            logger.warning(
+                'Unable to cache download of {!r}.'.format(url))
+            return None
+        return cached_file_path
+
+    def get_download(self, *, url):
+        """Get the file last downloaded from url.
+
+        :param str url: the url the file was downloaded from.
+        :returns: a tuple of the path to cached file and the headers to
+                  revalidate it with, or (None, None).
+        """
+        entry_path = self._get_download_path(url)
+        cached_file_path = os.path.join(entry_path, 'download')
+        try:
+            with open(os.path.join(entry_path, 'headers.yaml')) as f:
+                headers = yaml.safe_load(f)
+        except (OSError, yaml.YAMLError):
+            return None, None
+        if not isinstance(headers, dict) or not os.path.exists(
+                cached_file_path):
+            return None, None
+
+        logger.debug('Cache hit for url {!r}'.format(url))
+        self.mark_used(entry_path)
+        return cached_file_path, headers
+
+    def _get_download_path(self, url):
+        return os.path.join(
+            self.file_cache, 'urls', hashlib.sha1(url.encode()).hexdigest())
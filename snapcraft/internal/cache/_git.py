@@ -0,0 +1,96 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Dict  # noqa
+
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+
+class GitCache(SnapcraftCache):
+    """Cache of bare mirrors of the git repositories sources come from."""
+
+    def __init__(self, *, command: str='git') -> None:
+        super().__init__()
+        self.git_cache_root = os.path.join(self.cache_root, 'git')
+        self._command = command
+
+    def get_mirror_path(self, source: str) -> str:
+        return os.path.join(self.git_cache_root, 'mirrors', _digest(source))
+
+    def mirror(self, source: str, *,
+               call_kwargs: Dict[str, Any]=None) -> str:
+        """Create or update the mirror of the repository at source.
+
+        Clones can use the mirror as a reference, only fetching what it
+        lacks from source.
+
+        :param str source: the url of the repository.
+        :param dict call_kwargs: extra arguments for the git calls.
+        :returns: path to the mirror, or None if it could not be updated.
+        """
+        mirror_path = self.get_mirror_path(source)
+        lock_path = os.path.join(
+            self.git_cache_root, 'locks', _digest(source))
+        os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        if call_kwargs is None:
+            call_kwargs = dict()
+
+        # Builds pulling the same repository take turns to update it.
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(mirror_path):
+                    logger.debug(
+                        'Updating the git mirror of {!r}'.format(source))
+                    subprocess.check_call([
+                        self._command, '-C', mirror_path, 'fetch',
+                        '--prune', '--quiet', 'origin'], **call_kwargs)
+                else:
+                    self._clone(source, mirror_path, call_kwargs)
+            except subprocess.CalledProcessError:
+                logger.warning(
+                    'Unable to update the git mirror of {!r}.'.format(source))
+                return None
+
+        self.mark_used(mirror_path)
+        return mirror_path
+
+    def _clone(self, source, mirror_path, call_kwargs):
+        logger.debug('Creating a git mirror of {!r}'.format(source))
+        # The mirror is only moved into place once complete.
+        tmp_path = tempfile.mkdtemp(
+            prefix='.', dir=os.path.dirname(mirror_path))
+        try:
+            subprocess.check_call([
+                self._command, 'clone', '--mirror', '--quiet', source,
+                tmp_path], **call_kwargs)
+            os.rename(tmp_path, mirror_path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _digest(source):
+    return hashlib.sha1(source.encode()).hexdigest()
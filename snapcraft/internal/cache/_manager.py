@@ -0,0 +1,192 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import glob
+import logging
+import os
+import re
+import shutil
+from typing import Dict, List, Set, Tuple  # noqa
+
+from snapcraft.internal import errors
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+_MAX_SIZE_ENVVAR = 'SNAPCRAFT_CACHE_MAX_SIZE'
+_SIZE_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+# What can be evicted from each section of the cache, relative to the cache
+# root. Entries may be nested in others, the outer entry is then only
+# evicted after the entries inside it.
+_SECTIONS = collections.OrderedDict([
+    ('files', [
+        os.path.join('files', '*', '*'),
+    ]),
+    ('git', [
+        os.path.join('git', 'mirrors', '*'),
+    ]),
+    ('snaps', [
+        os.path.join('projects', '*', 'snap_hashes', '*', '*'),
+    ]),
+    ('sonames', [
+        os.path.join('sonames', '*'),
+    ]),
+    ('stage-packages', [
+        os.path.join('stage-packages', 'apt', '*'),
+        os.path.join('stage-packages', 'apt', '*', 'var', 'cache', 'apt',
+                     'archives', '*.deb'),
+        os.path.join('stage-packages', 'apt', '*', 'unpacked', '*', '*'),
+    ]),
+])
+
+_CacheEntry = collections.namedtuple(
+    '_CacheEntry', ['path', 'section', 'last_used', 'size'])
+
+
+class CacheManager(SnapcraftCache):
+    """Size accounting and eviction for everything in the XDG cache.
+
+    Entries are evicted least recently used first. The caches mark their
+    entries as used when they are hit by touching their modification time,
+    access times are left out as measuring an entry updates them. An entry
+    holding other entries is as recently used as the newest of them.
+    """
+
+    def _entries(self) -> List[_CacheEntry]:
+        paths = dict()  # type: Dict[str, str]
+        for section, patterns in _SECTIONS.items():
+            for pattern in patterns:
+                for path in glob.glob(os.path.join(self.cache_root, pattern)):
+                    paths[path] = section
+
+        nested_paths = set(paths)
+        entries = []  # type: List[_CacheEntry]
+        for path, section in paths.items():
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+                size = _get_size(path, exclude=nested_paths)
+            except FileNotFoundError:
+                # Removed by a concurrent build.
+                continue
+            entries.append(_CacheEntry(path, section, stat.st_mtime, size))
+
+        return self._with_nested_last_used(entries)
+
+    def _with_nested_last_used(self, entries):
+        last_used = {e.path: e.last_used for e in entries}
+        for entry in entries:
+            parent = os.path.dirname(entry.path)
+            while len(parent) > len(self.cache_root):
+                if parent in last_used:
+                    last_used[parent] = max(
+                        last_used[parent], entry.last_used)
+                parent = os.path.dirname(parent)
+
+        return [e._replace(last_used=last_used[e.path]) for e in entries]
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        """Return the number of entries and their size for each section."""
+        stats = collections.OrderedDict(
+            (section, (0, 0)) for section in _SECTIONS)
+        for entry in self._entries():
+            count, size = stats[entry.section]
+            stats[entry.section] = (count + 1, size + entry.size)
+        return stats
+
+    def prune(self, *, max_size: int) -> List[str]:
+        """Evict the least recently used entries down to max_size bytes.
+
+        :returns: pruned paths list.
+        """
+        entries = self._entries()
+        total_size = sum(e.size for e in entries)
+        pruned = []  # type: List[str]
+        removed = set()  # type: Set[str]
+        # Inner entries go before the outer ones on ties.
+        for entry in sorted(entries,
+                            key=lambda e: (e.last_used, -len(e.path))):
+            if total_size <= max_size:
+                break
+            if entry.path in removed:
+                # It went along with an outer entry.
+                continue
+            if not _remove(entry.path):
+                continue
+            # The entries still inside it are gone too.
+            prefix = entry.path + os.sep
+            gone = [e for e in entries
+                    if e.path.startswith(prefix) and e.path not in removed]
+            gone.append(entry)
+            removed.update(e.path for e in gone)
+            total_size -= sum(e.size for e in gone)
+            pruned.append(entry.path)
+
+        return pruned
+
+
+def get_max_size() -> int:
+    """Return the configured maximum size of the cache, or None."""
+    value = os.getenv(_MAX_SIZE_ENVVAR)
+    if not value:
+        return None
+    return parse_size(value)
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes, optionally suffixed with K, M, G or T."""
+    match = re.match(r'^(\d+)([KMGT]?)B?$', value.strip().upper())
+    if not match:
+        raise errors.InvalidCacheSizeError(value=value)
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def _remove(path: str) -> bool:
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        # Removed by a concurrent build.
+        pass
+    except OSError as e:
+        logger.warning('Unable to prune {}: {}'.format(path, e))
+        return False
+    return True
+
+
+def _get_size(path: str, *, exclude: Set[str]) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+
+    size = 0
+    seen_inodes = set()  # type: Set[int]
+    for root, directories, files in os.walk(path):
+        # Nested entries are accounted for on their own.
+        directories[:] = [d for d in directories
+                          if os.path.join(root, d) not in exclude]
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            if file_path in exclude:
+                continue
+            stat = os.lstat(file_path)
+            if stat.st_ino not in seen_inodes:
+                seen_inodes.add(stat.st_ino)
+                size += stat.st_size
+
+    return size
@@ -21,7 +21,7 @@ import subprocess
 import tempfile
 import yaml
 
-from ._cache import SnapcraftProjectCache
+from ._cache import SnapcraftProjectCache, atomic_path
 from snapcraft import file_utils
 
 logger = logging.getLogger(__name__)
@@ -69,7 +69,8 @@ class SnapCache(SnapcraftProjectCache):
                 # this must not be hard-linked, as rebuilding a snap
                 # with changes should invalidate the cache, hence avoids
                 # using fileutils.link_or_copy.
-                shutil.copyfile(snap_filename, cached_snap_path)
+                with atomic_path(cached_snap_path) as tmp_path:
+                    shutil.copyfile(snap_filename, tmp_path)
         except OSError:
             logger.warning(
                 'Unable to cache snap {}.'.format(snap_filename))
@@ -94,12 +95,16 @@ class SnapCache(SnapcraftProjectCache):
         if snap_hash:
             for cached_hash in cached_hashes:
                 if cached_hash == snap_hash:
-                    return os.path.join(snap_cache_dir, cached_hash)
+                    cached_snap = os.path.join(snap_cache_dir, cached_hash)
+                    self.mark_used(cached_snap)
+                    return cached_snap
             return None
 
         cached_snaps = [os.path.join(snap_cache_dir, f)
                         for f in cached_hashes]
-        return max(cached_snaps, key=os.path.getctime)
+        cached_snap = max(cached_snaps, key=os.path.getctime)
+        self.mark_used(cached_snap)
+        return cached_snap
 
     def prune(self, *, deb_arch, keep_hash):
         """Prune the snap revisions beside the keep_hash in XDG cache.
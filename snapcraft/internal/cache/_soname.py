@@ -0,0 +1,70 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List  # noqa
+
+from ._cache import SnapcraftCache, atomic_path
+
+logger = logging.getLogger(__name__)
+
+
+class SonameCache(SnapcraftCache):
+    """Cache for the soname indexes of base snaps, one per revision."""
+
+    def __init__(self):
+        super().__init__()
+        self.soname_cache_root = os.path.join(self.cache_root, 'sonames')
+
+    def _get_index_path(self, base_path: str) -> str:
+        # A mounted revision of a base snap is immutable but an unsquashed
+        # one (e.g. SNAPCRAFT_SETUP_CORE) is replaced in place, so the
+        # snap metadata is part of the key along with the resolved path.
+        key = hashlib.sha1(os.path.realpath(base_path).encode())
+        snap_yaml_path = os.path.join(base_path, 'meta', 'snap.yaml')
+        with contextlib.suppress(FileNotFoundError):
+            key.update(str(os.stat(snap_yaml_path).st_mtime_ns).encode())
+            with open(snap_yaml_path, 'rb') as snap_yaml:
+                key.update(snap_yaml.read())
+        return os.path.join(self.soname_cache_root, key.hexdigest())
+
+    def get(self, *, base_path: str) -> Dict[str, List[str]]:
+        """Get the soname index for the revision of base_path.
+
+        :returns: the index, or None if it is not cached.
+        """
+        index_path = self._get_index_path(base_path)
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+            self.mark_used(index_path)
+            return index
+        return None
+
+    def cache(self, *, base_path: str, index: Dict[str, List[str]]) -> None:
+        """Cache the soname index for the revision of base_path."""
+        index_path = self._get_index_path(base_path)
+        try:
+            with atomic_path(index_path) as tmp_path:
+                with open(tmp_path, 'w') as index_file:
+                    json.dump(index, index_file)
+        except OSError:
+            logger.warning(
+                'Unable to cache the soname index for {}.'.format(base_path))
@@ -13,19 +13,27 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import concurrent.futures
 import contextlib
 import glob
+import hashlib
+import json
 import logging
 import os
 import re
+import struct
 import subprocess
 import sys
 from functools import lru_cache, wraps
-from typing import FrozenSet, List, Set, Sequence
+from typing import (  # noqa
+    Dict, FrozenSet, Iterable, List, Optional, Set, Sequence)
 
 import magic
 
+from snapcraft import file_utils
 from snapcraft.internal import (
+    cache,
     common,
     errors,
     os_release,
@@ -64,33 +72,95 @@ class Library:
             self.in_base_snap = False
 
 
-@lru_cache()
+class _SonameIndex:
+    """Index the paths of the files in a tree by their file names."""
+
+    def __init__(self, paths: Dict[str, List[str]]) -> None:
+        self.paths = paths
+        self._found = {}  # type: Dict[str, str]
+
+    @classmethod
+    def from_tree(cls, top: str) -> '_SonameIndex':
+        paths = {}  # type: Dict[str, List[str]]
+        for root, directories, files in os.walk(top):
+            for file_name in files:
+                paths.setdefault(file_name, []).append(
+                    os.path.join(root, file_name))
+        return cls(paths)
+
+    def find(self, soname: str) -> str:
+        """Return the first dynamically linked elf file named soname."""
+        if soname not in self._found:
+            self._found[soname] = next(
+                (p for p in self.paths.get(soname, [])
+                 if _is_dynamically_linked(p)), None)
+        return self._found[soname]
+
+
+_soname_indexes = {}  # type: Dict[str, _SonameIndex]
+
+
+def _get_soname_index(path: str, *, persist: bool=False) -> _SonameIndex:
+    """Return the soname index for the tree at path.
+
+    :param bool persist: keep the index in the cache across runs, only
+                         valid for trees that never change such as the
+                         revision of a base snap.
+    """
+    if path in _soname_indexes:
+        return _soname_indexes[path]
+
+    if not os.path.exists(path):
+        index = _SonameIndex({})
+    elif persist:
+        soname_cache = cache.SonameCache()
+        paths = soname_cache.get(base_path=path)
+        if paths is None:
+            index = _SonameIndex.from_tree(path)
+            soname_cache.cache(base_path=path, index=index.paths)
+        else:
+            index = _SonameIndex(paths)
+    else:
+        index = _SonameIndex.from_tree(path)
+
+    _soname_indexes[path] = index
+    return index
+
+
+def _is_dynamically_linked(path: str) -> bool:
+    elf_info = _get_elf_info(path)
+    return bool(elf_info and elf_info.dynamically_linked)
+
+
 def _crawl_for_path(*, soname: str, root_path: str,
                     core_base_path: str) -> str:
-    for path in (root_path, core_base_path):
-        if not os.path.exists(path):
-            continue
-        for root, directories, files in os.walk(path):
-            for file_name in files:
-                if file_name == soname:
-                    file_path = os.path.join(root, file_name)
-                    if _is_dynamically_linked_elf(_get_magic(file_path)):
-                        return file_path
+    for index in (_get_soname_index(root_path),
+                  _get_soname_index(core_base_path, persist=True)):
+        path = index.find(soname)
+        if path:
+            return path
     return None
 
 
 class ElfFile:
     """ElfFile represents and elf file on a path and its attributes."""
 
-    def __init__(self, *, path: str, magic: str) -> None:
+    def __init__(self, *, path: str, magic: str=None,
+                 is_executable: bool=None) -> None:
         """Initialize an ElfFile instance.
 
         :param str path: path to an elf_file within a snapcraft project.
-        :param str magic: the magic string for path.
+        :param str magic: the magic string for path, used to determine
+                          is_executable if it is not set.
+        :param bool is_executable: whether path has a program interpreter.
         """
         self.path = path
-        self.is_executable = 'interpreter' in magic
+        if is_executable is None:
+            is_executable = 'interpreter' in (magic or '')
+        self.is_executable = is_executable
         self.dependencies = set()  # type: Set[Library]
+        self._ldd_output = None  # type: Optional[List[str]]
+        self._ldd_done = False
 
     def load_dependencies(self, root_path: str,
                           core_base_path: str) -> Set[str]:
@@ -104,13 +174,10 @@ class ElfFile:
                   elf.
         """
         logger.debug('Getting dependencies for {!r}'.format(self.path))
-        ldd_out = []  # type: List[str]
-        try:
-            # ldd output sample:
-            # /lib64/ld-linux-x86-64.so.2 (0x00007fb3c5298000)
-            # libm.so.6 => /lib/x86_64-linux-gnu/libm.so.6 (0x00007fb3bef03000)
-            ldd_out = common.run_output(['ldd', self.path]).split('\n')
-        except subprocess.CalledProcessError:
+        if not self._ldd_done:
+            self._set_ldd_output(_run_ldd(self.path))
+        ldd_out = self._ldd_output
+        if ldd_out is None:
             logger.warning(
                 'Unable to determine library dependencies for '
                 '{!r}'.format(self.path))
@@ -135,6 +202,118 @@ class ElfFile:
                 library_paths.add(l.path)
         return library_paths
 
+    def _set_ldd_output(self, ldd_output: Optional[List[str]]) -> None:
+        self._ldd_output = ldd_output
+        self._ldd_done = True
+
+
+def _run_ldd(path: str) -> Optional[List[str]]:
+    """Return the lines output by ldd for path, or None if it fails."""
+    try:
+        # ldd output sample:
+        # /lib64/ld-linux-x86-64.so.2 (0x00007fb3c5298000)
+        # libm.so.6 => /lib/x86_64-linux-gnu/libm.so.6 (0x00007fb3bef03000)
+        return common.run_output(['ldd', path]).split('\n')
+    except subprocess.CalledProcessError:
+        return None
+
+
+class _LddCache:
+    """Persisted ldd output for files, keyed by path, inode, size and mtime.
+
+    The whole cache is discarded if the environment ldd runs in changes.
+    Output with libraries that were not found is not kept, as they may be
+    found once they are staged.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        self._cache_path = cache_path
+        self._environment = hashlib.sha1(
+            common.assemble_env().encode()).hexdigest()
+        self._entries = {}  # type: Dict[str, List]
+
+        if not cache_path:
+            return
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            with open(cache_path) as cache_file:
+                cache = json.load(cache_file)
+            if cache.get('environment') == self._environment:
+                self._entries = cache['files']
+
+    def get(self, path: str) -> Optional[List[str]]:
+        entry = self._entries.get(path)
+        if entry and entry[0] == _get_signature(path):
+            return entry[1]
+        return None
+
+    def update(self, path: str, ldd_output: List[str]) -> None:
+        if any(line.rstrip().endswith('=> not found')
+               for line in ldd_output):
+            return
+        signature = _get_signature(path)
+        if signature:
+            self._entries[path] = [signature, ldd_output]
+
+    def save(self) -> None:
+        if not self._cache_path:
+            return
+        os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+        with open(self._cache_path, 'w') as cache_file:
+            json.dump({'environment': self._environment,
+                       'files': self._entries}, cache_file)
+
+
+def _get_signature(path: str) -> Optional[List[int]]:
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    return [file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def load_dependencies(elf_files: Iterable[ElfFile], *, root_path: str,
+                      core_base_path: str, cache_path: str=None) -> Set[str]:
+    """Load the dependencies for all of elf_files.
+
+    ldd runs concurrently for the elf files, and its output is memoized in
+    cache_path so that only the files that changed are inspected again.
+
+    :param elf_files: the ElfFile instances to load dependencies for.
+    :param str root_path: the base path to search for missing dependencies.
+    :param str core_base_path: the path to the base snap.
+    :param str cache_path: file to persist the output of ldd to.
+    :returns: the union of the paths returned by each
+              ElfFile.load_dependencies.
+    """
+    elf_files = list(elf_files)
+    ldd_cache = _LddCache(cache_path)
+    # root_path may have changed since it was last indexed.
+    _soname_indexes.pop(root_path, None)
+
+    pending = []  # type: List[ElfFile]
+    for elf_file in elf_files:
+        ldd_output = ldd_cache.get(elf_file.path)
+        if ldd_output is None:
+            pending.append(elf_file)
+        else:
+            elf_file._set_ldd_output(ldd_output)
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1) as executor:
+        ldd_outputs = executor.map(_run_ldd, [e.path for e in pending])
+        for elf_file, ldd_output in zip(pending, ldd_outputs):
+            elf_file._set_ldd_output(ldd_output)
+            if ldd_output is not None:
+                ldd_cache.update(elf_file.path, ldd_output)
+    ldd_cache.save()
+
+    dependencies = set()  # type: Set[str]
+    for elf_file in elf_files:
+        dependencies.update(elf_file.load_dependencies(
+            root_path=root_path, core_base_path=core_base_path))
+
+    return dependencies
+
 
 def _retry_patch(f):
     @wraps(f)
@@ -196,32 +375,55 @@ class Patcher:
 
         If the ELF is executable, patch it to use the configured linker.
         If the ELF has dependencies, set an rpath to them.
+        Both are set with a single patchelf invocation, and only if they
+        are not set to the expected values already.
 
         :param ElfFile elf: a data object representing an elf file and its
                             relevant attributes.
         :raises snapcraft.internal.errors.PatcherError:
             raised when the elf_file cannot be patched.
         """
-        if elf_file.is_executable:
-            self._patch_interpreter(elf_file)
+        try:
+            current_paths = _read_elf_paths(elf_file.path)
+        except (OSError, ValueError):
+            # Leave it to patchelf to deal with what cannot be read here.
+            current_paths = _ElfPaths(
+                interpreter=None, rpath=None, runpath=None)
+
+        args = []  # type: List[str]
+        if (elf_file.is_executable and
+                current_paths.interpreter != self._dynamic_linker):
+            args.extend(['--set-interpreter', self._dynamic_linker])
         if elf_file.dependencies:
-            self._patch_rpath(elf_file)
-
-    def _patch_interpreter(self, elf_file: ElfFile) -> None:
-        self._run_patchelf(args=['--set-interpreter',  self._dynamic_linker],
-                           elf_file_path=elf_file.path)
-
-    def _patch_rpath(self, elf_file: ElfFile) -> None:
-        rpath = self._get_rpath(elf_file)
-        # Parameters:
-        # --force-rpath: use RPATH instead of RUNPATH.
-        # --shrink-rpath: will remove unneeded entries, with the
-        #                 side effect of preferring host libraries
-        #                 so we simply do not use it.
-        # --set-rpath: set the RPATH to the colon separated argument.
-        self._run_patchelf(args=['--force-rpath',
-                                 '--set-rpath', rpath],
-                           elf_file_path=elf_file.path)
+            rpath = self._get_rpath(elf_file)
+            if current_paths.rpath != rpath or current_paths.runpath:
+                # Parameters:
+                # --force-rpath: use RPATH instead of RUNPATH.
+                # --shrink-rpath: will remove unneeded entries, with the
+                #                 side effect of preferring host libraries
+                #                 so we simply do not use it.
+                # --set-rpath: set the RPATH to the colon separated argument.
+                args.extend(['--force-rpath', '--set-rpath', rpath])
+
+        if args:
+            # The file may be hard-linked from a cache or from the other
+            # areas of the part, none of which must be patched along with it.
+            with contextlib.suppress(FileNotFoundError):
+                file_utils.unshare(elf_file.path)
+            self._run_patchelf(args=args, elf_file_path=elf_file.path)
+
+    def patch_all(self, *, elf_files: Iterable[ElfFile]) -> None:
+        """Patch all of elf_files concurrently.
+
+        :raises snapcraft.internal.errors.PatcherError:
+            raised when any of elf_files cannot be patched.
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1) as executor:
+            futures = [executor.submit(self.patch, elf_file=elf_file)
+                       for elf_file in elf_files]
+            for future in futures:
+                future.result()
 
     @_retry_patch
     def _run_patchelf(self, *, args: List[str], elf_file_path: str) -> None:
@@ -332,22 +534,188 @@ def _get_system_libs() -> FrozenSet[str]:
     return _libraries
 
 
-@lru_cache()
-def _get_magic(path: str) -> str:
+@lru_cache(maxsize=1)
+def _load_magic():
     ms = magic.open(magic.NONE)
     if ms.load() != 0:
         raise RuntimeError('Cannot load magic header detection')
+    return ms
+
 
+def _get_magic(path: str) -> str:
     fs_encoding = sys.getfilesystemencoding()
     path_b = path.encode(
         fs_encoding, errors='surrogateescape')  # type: bytes
-    return ms.file(path_b)
+    return _load_magic().file(path_b)
 
 
 def _is_dynamically_linked_elf(file_m: str) -> bool:
     return file_m.startswith('ELF') and 'dynamically linked' in file_m
 
 
+_ElfInfo = collections.namedtuple(
+    '_ElfInfo', ['dynamically_linked', 'has_interpreter'])
+_ElfPaths = collections.namedtuple(
+    '_ElfPaths', ['interpreter', 'rpath', 'runpath'])
+_ElfHeaders = collections.namedtuple(
+    '_ElfHeaders', ['e_type', 'segments', 'dynamic_entry'])
+_Segment = collections.namedtuple(
+    '_Segment', ['type', 'offset', 'vaddr', 'filesz'])
+
+_ELF_MAGIC = b'\x7fELF'
+# e_ident[EI_CLASS] to the struct formats for the e_type, e_phoff,
+# e_phentsize and e_phnum of the elf header, for the p_type, p_offset,
+# p_vaddr and p_filesz of a program header and for a dynamic entry.
+_ELF_CLASSES = {
+    1: ('H10xI10xHH', 'III4xI', 'iI'),
+    2: ('H14xQ14xHH', 'I4xQQ8xQ', 'qQ'),
+}
+_ELF_BYTE_ORDERS = {1: '<', 2: '>'}
+_ET_EXEC = 2
+_ET_DYN = 3
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+_PT_INTERP = 3
+_DT_NULL = 0
+_DT_STRTAB = 5
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+
+def _read_headers(elf_file) -> _ElfHeaders:
+    """Read the elf header and the program headers from elf_file.
+
+    :returns: None if elf_file is not an elf file.
+    :raises ValueError: if elf_file is an elf file that cannot be parsed.
+    """
+    header = elf_file.read(64)
+    if not header.startswith(_ELF_MAGIC):
+        return None
+    try:
+        header_format, segment_format, dynamic_format = (
+            _ELF_CLASSES[header[4]])
+        byte_order = _ELF_BYTE_ORDERS[header[5]]
+        e_type, e_phoff, e_phentsize, e_phnum = struct.unpack_from(
+            byte_order + header_format, header, 16)
+    except (IndexError, KeyError, struct.error) as e:
+        raise ValueError('Invalid elf header') from e
+
+    segment_struct = struct.Struct(byte_order + segment_format)
+    segments = []  # type: List[_Segment]
+    if e_phnum:
+        elf_file.seek(e_phoff)
+        program_headers = elf_file.read(e_phentsize * e_phnum)
+        if (e_phentsize < segment_struct.size or
+                len(program_headers) < e_phentsize * e_phnum):
+            raise ValueError('Truncated program headers')
+        segments = [
+            _Segment(*segment_struct.unpack_from(program_headers, offset))
+            for offset in range(0, len(program_headers), e_phentsize)]
+
+    return _ElfHeaders(e_type=e_type, segments=segments,
+                       dynamic_entry=struct.Struct(
+                           byte_order + dynamic_format))
+
+
+def _read_elf_info(path: str) -> _ElfInfo:
+    """Classify path by reading its elf header and program headers.
+
+    :returns: None if path is not an elf file.
+    :raises ValueError: if path is an elf file that cannot be parsed.
+    """
+    try:
+        elf_file = open(path, 'rb')
+    except OSError:
+        return None
+
+    with elf_file:
+        headers = _read_headers(elf_file)
+    if headers is None:
+        return None
+    if headers.e_type not in (_ET_EXEC, _ET_DYN):
+        return _ElfInfo(dynamically_linked=False, has_interpreter=False)
+
+    segment_types = {s.type for s in headers.segments}
+    return _ElfInfo(
+        dynamically_linked=bool(
+            segment_types & {_PT_DYNAMIC, _PT_INTERP}),
+        has_interpreter=_PT_INTERP in segment_types)
+
+
+def _read_elf_paths(path: str) -> _ElfPaths:
+    """Read the interpreter, rpath and runpath set for the elf file at path.
+
+    :raises ValueError: if path is not an elf file that can be parsed.
+    """
+    with open(path, 'rb') as elf_file:
+        headers = _read_headers(elf_file)
+        if headers is None:
+            raise ValueError('Not an elf file')
+
+        interpreter = None
+        dynamic = b''
+        for segment in headers.segments:
+            if segment.type == _PT_INTERP:
+                interpreter = _read_string(elf_file, segment.offset)
+            elif segment.type == _PT_DYNAMIC:
+                elf_file.seek(segment.offset)
+                dynamic = elf_file.read(segment.filesz)
+
+        tags = {}  # type: Dict[int, int]
+        entry_size = headers.dynamic_entry.size
+        for offset in range(0, len(dynamic) - entry_size + 1, entry_size):
+            tag, value = headers.dynamic_entry.unpack_from(dynamic, offset)
+            if tag == _DT_NULL:
+                break
+            tags.setdefault(tag, value)
+
+        paths = {}  # type: Dict[int, str]
+        for tag in (_DT_RPATH, _DT_RUNPATH):
+            if tag in tags:
+                if _DT_STRTAB not in tags:
+                    raise ValueError('Missing string table')
+                strtab = _get_file_offset(headers.segments, tags[_DT_STRTAB])
+                paths[tag] = _read_string(elf_file, strtab + tags[tag])
+
+    return _ElfPaths(interpreter=interpreter, rpath=paths.get(_DT_RPATH),
+                     runpath=paths.get(_DT_RUNPATH))
+
+
+def _get_file_offset(segments: List[_Segment], vaddr: int) -> int:
+    for segment in segments:
+        if (segment.type == _PT_LOAD and
+                segment.vaddr <= vaddr < segment.vaddr + segment.filesz):
+            return vaddr - segment.vaddr + segment.offset
+    raise ValueError('Address {:#x} is not loaded from the file'.format(vaddr))
+
+
+def _read_string(elf_file, offset: int) -> str:
+    elf_file.seek(offset)
+    data = b''
+    while True:
+        chunk = elf_file.read(256)
+        data += chunk
+        if not chunk or b'\0' in chunk:
+            break
+    return data.split(b'\0', 1)[0].decode(
+        sys.getfilesystemencoding(), errors='surrogateescape')
+
+
+def _get_elf_info(path: str) -> _ElfInfo:
+    """Return the _ElfInfo for path, or None if it is not an elf file.
+
+    libmagic is only relied upon for the elf files that cannot be parsed.
+    """
+    try:
+        return _read_elf_info(path)
+    except ValueError:
+        file_m = _get_magic(path)
+        if not file_m.startswith('ELF'):
+            return None
+        return _ElfInfo(dynamically_linked=_is_dynamically_linked_elf(file_m),
+                        has_interpreter='interpreter' in file_m)
+
+
 def get_elf_files(root: str,
                   file_list: Sequence[str]) -> FrozenSet[ElfFile]:
     """Return a frozenset of elf files from file_list prepended with root.
@@ -370,8 +738,9 @@ def get_elf_files(root: str,
                 path))
             continue
         # Finally, make sure this is actually an ELF file
-        file_m = _get_magic(path)
-        if _is_dynamically_linked_elf(file_m):
-            elf_files.add(ElfFile(path=path, magic=file_m))
+        elf_info = _get_elf_info(path)
+        if elf_info and elf_info.dynamically_linked:
+            elf_files.add(ElfFile(
+                path=path, is_executable=elf_info.has_interpreter))
 
     return frozenset(elf_files)
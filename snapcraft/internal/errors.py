@@ -99,6 +99,18 @@ class StepOutdatedError(SnapcraftError):
                          parts_names=' '.join(parts_names))
 
 
+class StepWorkerError(SnapcraftError):
+
+    fmt = (
+        'Failed to {step} {part!r}: '
+        'The worker running this step exited with status {exit_code}.\n'
+        'Check the output prefixed with {part!r} above for details.'
+    )
+
+    def __init__(self, *, step, part, exit_code):
+        super().__init__(step=step, part=part, exit_code=exit_code)
+
+
 class SnapcraftEnvironmentError(SnapcraftError):
     # FIXME This exception is too generic.
     # https://bugs.launchpad.net/snapcraft/+bug/1734231
@@ -414,6 +426,17 @@ class InvalidContainerImageInfoError(SnapcraftError):
         super().__init__(image_info=image_info)
 
 
+class InvalidCacheSizeError(SnapcraftError):
+
+    fmt = (
+        'Invalid cache size {value!r}: '
+        'Use a number of bytes, optionally followed by K, M, G or T.'
+    )
+
+    def __init__(self, *, value):
+        super().__init__(value=value)
+
+
 class PatcherError(SnapcraftError):
 
     fmt = (
@@ -13,8 +13,10 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
 import os
 import sys
+import time
 
 from urllib.request import urlretrieve
 from progressbar import (
@@ -25,6 +27,12 @@ from progressbar import (
     UnknownLength,
 )
 
+# Chunks are sized after the download, within these bounds.
+_MIN_CHUNK_SIZE = 2**16
+_MAX_CHUNK_SIZE = 2**20
+# Seconds between updates of the progress bar.
+_PROGRESS_INTERVAL = 0.1
+
 
 def _init_progress_bar(total_length, destination, message=None):
     if not message:
@@ -51,8 +59,15 @@ def _init_progress_bar(total_length, destination, message=None):
 
 
 def download_requests_stream(request_stream, destination, message=None,
-                             total_read=0):
-    """This is a facility to download a request with nice progress bars."""
+                             total_read=0, *, algorithms=()):
+    """This is a facility to download a request with nice progress bars.
+
+    :param algorithms: names of the hashlib algorithms to calculate digests
+                       of destination with as it is written.
+    :returns: a dict of the hex digests of destination by algorithm.
+    """
+    hashers = {algorithm: getattr(hashlib, algorithm)()
+               for algorithm in algorithms}
 
     # Doing len(request_stream.content) may defeat the purpose of a
     # progress bar
@@ -70,15 +85,37 @@ def download_requests_stream(request_stream, destination, message=None,
 
     if os.path.exists(destination):
         mode = 'ab'
+        # The digests are of the whole file, resumed or not.
+        if hashers:
+            _hash_file(destination, hashers.values())
     else:
         mode = 'wb'
+    # Enough chunks for the progress bar to move smoothly.
+    chunk_size = min(max(total_length // 100, _MIN_CHUNK_SIZE),
+                     _MAX_CHUNK_SIZE)
+    last_update = 0.0
     with open(destination, mode) as destination_file:
-        for buf in request_stream.iter_content(1024):
+        for buf in request_stream.iter_content(chunk_size):
             destination_file.write(buf)
+            for hasher in hashers.values():
+                hasher.update(buf)
             total_read += len(buf)
-            progress_bar.update(total_read)
+            now = time.monotonic()
+            if now - last_update >= _PROGRESS_INTERVAL:
+                progress_bar.update(total_read)
+                last_update = now
     progress_bar.finish()
 
+    return {algorithm: hasher.hexdigest()
+            for algorithm, hasher in hashers.items()}
+
+
+def _hash_file(path, hashers):
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(_MAX_CHUNK_SIZE), b''):
+            for hasher in hashers:
+                hasher.update(buf)
+
 
 class UrllibDownloader(object):
     """This is a facility to download an uri with nice progress bars."""
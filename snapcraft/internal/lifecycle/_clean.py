@@ -26,25 +26,14 @@ from . import constants
 logger = logging.getLogger(__name__)
 
 
-def _reverse_dependency_tree(config, part_name):
-    dependents = config.parts.get_dependents(part_name)
-    for dependent in dependents.copy():
-        # No need to worry about infinite recursion due to circular
-        # dependencies since the YAML validation won't allow it.
-        dependents |= _reverse_dependency_tree(config, dependent)
-
-    return dependents
-
-
 def _clean_part_and_all_dependents(part_name, step, config, staged_state,
                                    primed_state):
     # Obtain the reverse dependency tree for this part. Make sure all
     # dependents are cleaned.
-    dependents = _reverse_dependency_tree(config, part_name)
-    dependent_parts = {p for p in config.all_parts
-                       if p.name in dependents}
-    for dependent_part in dependent_parts:
-        dependent_part.clean(staged_state, primed_state, step)
+    dependents = config.parts.get_dependents(part_name, recursive=True)
+    for dependent in dependents:
+        config.parts.get_part(dependent).clean(
+            staged_state, primed_state, step)
 
     # Finally, clean the part in question
     config.parts.clean_part(part_name, staged_state, primed_state, step)
@@ -58,8 +47,8 @@ def _verify_dependents_will_be_cleaned(part_name, clean_part_names, step,
 
     # Verify that they're either already clean, or that they will be cleaned.
     if not dependents.issubset(clean_part_names):
-        for part in config.all_parts:
-            if part.name in dependents and not part.is_clean(step):
+        for dependent in dependents:
+            if not config.parts.get_part(dependent).is_clean(step):
                 humanized_parts = formatting_utils.humanize_list(
                     dependents, 'and')
                 additional_dependents.append(part_name)
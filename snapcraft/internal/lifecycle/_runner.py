@@ -13,11 +13,14 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import collections
 import contextlib
+import functools
 import logging
 import os
 from subprocess import check_call
 from tempfile import TemporaryDirectory
+from typing import Dict, List, Set  # noqa
 
 import yaml
 
@@ -31,13 +34,18 @@ from snapcraft.internal import (
     states
 )
 from snapcraft.internal import errors
-from snapcraft.internal.cache import SnapCache
+from snapcraft.internal.cache import CacheManager, SnapCache, get_max_size
 from snapcraft.internal.project_loader import replace_attr
 from . import constants
+from . import _workers
 
 
 logger = logging.getLogger(__name__)
 
+# Steps that only touch the part's own directories and can therefore run
+# for several parts at the same time.
+_CONCURRENT_STEPS = ['pull', 'build']
+
 
 def execute(step, project_options, part_names=None):
     """Execute until step in the lifecycle for part_names or all parts.
@@ -59,6 +67,8 @@ def execute(step, project_options, part_names=None):
     :returns: A dict with the snap name, version, type and architectures.
     """
     config = project_loader.load_config(project_options)
+    # Build packages and snaps are about to be installed.
+    pluginhandler.reset_machine_manifest()
     installed_packages = repo.Repo.install_build_packages(
         config.build_tools)
     if installed_packages is None:
@@ -77,6 +87,7 @@ def execute(step, project_options, part_names=None):
         _setup_core(project_options.deb_arch)
 
     _Executor(config, project_options).run(step, part_names)
+    _prune_cache()
 
     return {'name': config.data['name'],
             'version': config.data['version'],
@@ -84,6 +95,13 @@ def execute(step, project_options, part_names=None):
             'type': config.data.get('type', '')}
 
 
+def _prune_cache():
+    max_size = get_max_size()
+    if max_size is not None:
+        pruned = CacheManager().prune(max_size=max_size)
+        logger.debug('Pruned {} cache entries'.format(len(pruned)))
+
+
 def _setup_core(deb_arch):
     core_path = common.get_core_path()
     if os.path.exists(core_path) and os.listdir(core_path):
@@ -145,6 +163,7 @@ class _Executor:
         self.project_options = project_options
         self.parts_config = config.parts
         self._steps_run = self._init_run_states()
+        self._workers = {}  # type: Dict[str, _workers.StepWorker]
 
     def _init_run_states(self):
         steps_run = {}
@@ -174,11 +193,21 @@ class _Executor:
 
         step_index = common.COMMAND_ORDER.index(step) + 1
 
+        if self.project_options.jobs > 1 and not self._workers:
+            self._run_concurrently(common.COMMAND_ORDER[0:step_index], parts,
+                                   part_names)
+
         for step in common.COMMAND_ORDER[0:step_index]:
-            if step == 'stage':
+            # Parts that are already staged have been checked against each
+            # other when they were staged.
+            if step == 'stage' and any(
+                    step not in self._steps_run[p.name] for p in parts):
                 # XXX check only for collisions on the parts that have already
                 # been built --elopio - 20170713
-                pluginhandler.check_for_collisions(self.config.all_parts)
+                # Parts still being built by a worker cannot be checked yet.
+                pluginhandler.check_for_collisions(
+                    [p for p in self.config.all_parts
+                     if p.name not in self._workers])
             for part in parts:
                 if step not in self._steps_run[part.name]:
                     self._run_step(step, part, part_names)
@@ -186,6 +215,94 @@ class _Executor:
 
         self._create_meta(step, part_names)
 
+    def _run_concurrently(self, steps, parts, part_names):
+        """Pull and build independent parts using a pool of workers.
+
+        A part is only handed to a worker once all of its prerequisites
+        have been staged. Prerequisites are staged here once they are built
+        and no worker is running. Whatever cannot be scheduled is left for
+        the sequential run.
+        """
+        prereqs = {part.name: self.parts_config.get_prereqs(part.name)
+                   for part in parts}
+        pending = self._get_pending_steps(steps, parts, prereqs)
+
+        try:
+            while pending or self._workers:
+                self._start_workers(pending, prereqs, part_names)
+                if not self._workers:
+                    break
+                self._reap_workers(pending)
+        finally:
+            # Only left running on failures and interruptions.
+            for worker in self._workers.values():
+                worker.terminate()
+            self._workers.clear()
+
+    def _get_pending_steps(self, steps, parts, prereqs):
+        required = set()  # type: Set[str]
+        for part_prereqs in prereqs.values():
+            required |= part_prereqs
+
+        # Parts others depend on are built right away, they need to be
+        # staged before their dependents can even be pulled.
+        pending = collections.OrderedDict()
+        for part in parts:
+            part_steps = (_CONCURRENT_STEPS if part.name in required
+                          else [s for s in steps if s in _CONCURRENT_STEPS])
+            remaining = [s for s in part_steps
+                         if s not in self._steps_run[part.name]]
+            if remaining:
+                pending[part.name] = (part, remaining)
+
+        return pending
+
+    def _start_workers(self, pending, prereqs, part_names):
+        for name, (part, remaining) in list(pending.items()):
+            if len(self._workers) >= self.project_options.jobs:
+                return
+            if name in self._workers:
+                continue
+
+            unstaged_prereqs = {p for p in prereqs[name]
+                                if 'stage' not in self._steps_run[p]}
+            if any(p in pending or p in self._workers
+                   for p in unstaged_prereqs):
+                continue
+            if not unstaged_prereqs.issubset(part_names):
+                # Let the sequential run report the missing prerequisites.
+                del pending[name]
+                continue
+            if unstaged_prereqs:
+                # Workers may be reading from the stage directory.
+                if self._workers:
+                    continue
+                self.run('stage', unstaged_prereqs)
+
+            step = remaining[0]
+            if step == 'build':
+                # Compute the manifest recorded after each build before the
+                # worker is forked, rather than once in every worker.
+                pluginhandler.get_machine_manifest()
+            self._workers[name] = _workers.StepWorker(
+                part_name=name, step=step,
+                target=functools.partial(
+                    self._run_step, step, part, part_names),
+                debug=self.project_options.debug)
+
+    def _reap_workers(self, pending):
+        for worker in _workers.wait(list(self._workers.values())):
+            del self._workers[worker.part_name]
+            if worker.exit_code != 0:
+                raise errors.StepWorkerError(step=worker.step,
+                                             part=worker.part_name,
+                                             exit_code=worker.exit_code)
+            self._steps_run[worker.part_name].add(worker.step)
+            part, remaining = pending[worker.part_name]
+            remaining.remove(worker.step)
+            if not remaining:
+                del pending[worker.part_name]
+
     def _run_step(self, step, part, part_names):
         common.reset_env()
         prereqs = self.parts_config.get_prereqs(part.name)
@@ -228,7 +345,13 @@ class _Executor:
                 self.config.snapcraft_yaml_path)
 
     def _handle_dirty(self, part, step, dirty_report):
-        if step not in constants.STEPS_TO_AUTOMATICALLY_CLEAN_IF_DIRTY:
+        # A source that changed contents is pulled again, as opposed to
+        # changes to the part properties that need to be acknowledged.
+        only_source_changed = (dirty_report.changed_source and
+                               not dirty_report.dirty_properties and
+                               not dirty_report.dirty_project_options)
+        if (step not in constants.STEPS_TO_AUTOMATICALLY_CLEAN_IF_DIRTY and
+                not only_source_changed):
             raise errors.StepOutdatedError(
                 step=step, part=part.name,
                 dirty_properties=dirty_report.dirty_properties,
@@ -244,10 +367,11 @@ class _Executor:
         dependents = self.parts_config.get_dependents(part.name)
         if (index <= common.COMMAND_ORDER.index('stage') and
                 not part.is_clean('stage') and dependents):
-            for dependent in self.config.all_parts:
-                if (dependent.name in dependents and
-                        not dependent.is_clean('build')):
+            for dependent in dependents:
+                if not self.parts_config.get_part(dependent).is_clean(
+                        'build'):
                     raise errors.StepOutdatedError(step=step, part=part.name,
                                                    dependents=dependents)
 
-        part.clean(staged_state, primed_state, step, '(out of date)')
+        part.clean(staged_state, primed_state, step, '(out of date)',
+                   keep_build_basedir=True)
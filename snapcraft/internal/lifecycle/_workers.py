@@ -0,0 +1,139 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import sys
+import traceback
+from typing import Callable, Dict, List, Optional  # noqa
+
+from snapcraft.internal import errors
+
+
+logger = logging.getLogger(__name__)
+
+
+class StepWorker:
+    """Run a lifecycle step of a part in a forked process.
+
+    Everything the worker writes to stdout or stderr, including the output
+    of the commands it runs, is relayed line by line prefixed with the part
+    name so that the output of concurrent workers remains readable.
+    """
+
+    def __init__(self, *, part_name: str, step: str,
+                 target: Callable[[], None], debug: bool=False) -> None:
+        self.part_name = part_name
+        self.step = step
+        self._target = target
+        self._debug = debug
+        self._pending_output = b''
+
+        self._read_fd, write_fd = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        context = multiprocessing.get_context('fork')
+        self._process = context.Process(target=self._run, args=(write_fd,))
+        self._process.start()
+        os.close(write_fd)
+        # The worker leads a process group of its own, so that it can be
+        # terminated along with the commands it runs. Both ends set it to
+        # avoid racing with the worker.
+        with contextlib.suppress(OSError):
+            os.setpgid(self._process.pid, self._process.pid)
+
+    @property
+    def exit_code(self) -> Optional[int]:
+        return self._process.exitcode
+
+    def _run(self, write_fd: int) -> None:
+        with contextlib.suppress(OSError):
+            os.setpgid(0, 0)
+        os.close(self._read_fd)
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        os.close(write_fd)
+
+        try:
+            self._target()
+        except errors.SnapcraftError as e:
+            if self._debug:
+                traceback.print_exc()
+            logger.error(str(e))
+            sys.exit(e.get_exit_code())
+
+    def _relay(self, data: bytes) -> None:
+        lines = (self._pending_output + data).split(b'\n')
+        self._pending_output = lines.pop()
+        for line in lines:
+            sys.stdout.write('{}| {}\n'.format(
+                self.part_name,
+                line.decode(sys.getfilesystemencoding(), 'replace')))
+        sys.stdout.flush()
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def read(self) -> bool:
+        """Relay the available output, return False once it is exhausted."""
+        data = os.read(self._read_fd, 65536)
+        if data:
+            self._relay(data)
+            return True
+
+        if self._pending_output:
+            self._relay(b'\n')
+        return False
+
+    def finish(self) -> None:
+        """Relay any remaining output and reap the worker process."""
+        while self.read():
+            pass
+        os.close(self._read_fd)
+        self._process.join()
+
+    def terminate(self) -> None:
+        """Kill the worker and the commands it runs, then reap it."""
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(self._process.pid, signal.SIGKILL)
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(self._process.pid, signal.SIGKILL)
+        os.close(self._read_fd)
+        self._process.join()
+
+
+def wait(workers: List[StepWorker]) -> List[StepWorker]:
+    """Relay output from workers until at least one of them is done.
+
+    :returns: the workers that finished, already reaped.
+    """
+    workers_by_fd = {
+        worker.fileno(): worker
+        for worker in workers}  # type: Dict[int, StepWorker]
+    finished = []  # type: List[StepWorker]
+    while not finished:
+        readable, _, _ = select.select(list(workers_by_fd), [], [])
+        for fd in readable:
+            worker = workers_by_fd[fd]
+            if not worker.read():
+                worker.finish()
+                finished.append(worker)
+                del workers_by_fd[fd]
+
+    return finished
@@ -14,14 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import concurrent.futures
 import contextlib
 import copy
 import filecmp
+import json
 import logging
 import os
 import shutil
+import stat
 import sys
 from glob import glob, iglob
+from typing import Any, Dict, List, Tuple  # noqa
 
 import yaml
 
@@ -37,18 +42,28 @@ from snapcraft.internal import (
     states,
 )
 from ._scriptlets import ScriptRunner
+from ._fileset_matcher import FilesetMatcher
 from ._build_attributes import BuildAttributes
 from ._metadata_extraction import extract_metadata
+from ._machine_manifest import get_machine_manifest
 
 from ._plugin_loader import load_plugin  # noqa
+from ._machine_manifest import reset_machine_manifest  # noqa
 
 logger = logging.getLogger(__name__)
 
+# The defaults in a part schema are gathered once, for all the parts. They
+# are keyed by the identity of the schema, which is kept around so that the
+# id cannot be reused.
+_part_schema_defaults = dict()  # type: Dict[int, Tuple[Any, Dict[str, Any]]]
+
 
 class DirtyReport:
-    def __init__(self, dirty_properties, dirty_project_options):
+    def __init__(self, dirty_properties, dirty_project_options,
+                 changed_source=False):
         self.dirty_properties = dirty_properties
         self.dirty_project_options = dirty_project_options
+        self.changed_source = changed_source
 
 
 class PluginHandler:
@@ -215,11 +230,29 @@ class PluginHandler:
             differing_options = state.diff_project_options_of_interest(
                 self._project_options)
 
-        if differing_properties or differing_options:
-            return DirtyReport(differing_properties, differing_options)
+        # The contents of the source are only tracked if requested, since
+        # the source needs to be walked to tell whether it changed.
+        changed_source = False
+        if step == 'pull' and state:
+            recorded_fingerprint = getattr(state, 'source_fingerprint', None)
+            changed_source = bool(
+                recorded_fingerprint and
+                recorded_fingerprint != self._get_source_fingerprint())
+
+        if differing_properties or differing_options or changed_source:
+            return DirtyReport(differing_properties, differing_options,
+                               changed_source)
 
         return None
 
+    def _get_source_fingerprint(self):
+        if not (self.source_handler and
+                self._build_attributes.source_fingerprint()):
+            return None
+
+        return self.source_handler.fingerprint(
+            index_path=os.path.join(self.plugin.statedir, 'source-index'))
+
     def should_step_run(self, step, force=False):
         return force or self.is_clean(step)
 
@@ -303,7 +336,8 @@ class PluginHandler:
             build_packages=part_build_packages,
             source_details=self.source_handler.source_details,
             metadata=metadata,
-            metadata_files=metadata_files
+            metadata_files=metadata_files,
+            source_fingerprint=self._get_source_fingerprint()
         ))
 
     def clean_pull(self, hint=''):
@@ -324,6 +358,11 @@ class PluginHandler:
             else:
                 shutil.rmtree(self.plugin.sourcedir)
 
+        for memo in ('source-index', 'elf-dependencies', 'stage-digests'):
+            memo_path = os.path.join(self.plugin.statedir, memo)
+            if os.path.exists(memo_path):
+                os.remove(memo_path)
+
         self.plugin.clean_pull()
         self.mark_cleaned('pull')
 
@@ -338,9 +377,6 @@ class PluginHandler:
         self.makedirs()
         self.notify_part_progress('Building')
 
-        if os.path.exists(self.plugin.build_basedir):
-            shutil.rmtree(self.plugin.build_basedir)
-
         # FIXME: It's not necessary to ignore here anymore since it's now done
         # in the Local source. However, it's left here so that it continues to
         # work on old snapcraft trees that still have src symlinks.
@@ -355,8 +391,13 @@ class PluginHandler:
             else:
                 return []
 
-        shutil.copytree(self.plugin.sourcedir, self.plugin.build_basedir,
-                        symlinks=True, ignore=ignore)
+        if self._build_attributes.incremental_build():
+            self._sync_build_basedir(ignore)
+        else:
+            if os.path.exists(self.plugin.build_basedir):
+                shutil.rmtree(self.plugin.build_basedir)
+            shutil.copytree(self.plugin.sourcedir, self.plugin.build_basedir,
+                            symlinks=True, ignore=ignore)
 
         script_runner = ScriptRunner(builddir=self.plugin.build_basedir)
 
@@ -370,10 +411,29 @@ class PluginHandler:
 
         self.mark_build_done()
 
+    def _sync_build_basedir(self, ignore):
+        # Only what changed in the source is brought over, leaving whatever
+        # the build produced in place so build systems can reuse it.
+        synced_paths = set()
+        with contextlib.suppress(FileNotFoundError):
+            with open(self._build_sync_state_path) as f:
+                synced_paths = set(json.load(f))
+
+        synced_paths = file_utils.sync_tree(
+            self.plugin.sourcedir, self.plugin.build_basedir,
+            synced_paths=synced_paths, ignore=ignore)
+
+        with open(self._build_sync_state_path, 'w') as f:
+            json.dump(sorted(synced_paths), f)
+
+    @property
+    def _build_sync_state_path(self):
+        return os.path.join(self.plugin.statedir, 'build-sync')
+
     def mark_build_done(self):
         build_properties = self.plugin.get_build_properties()
         plugin_manifest = self.plugin.get_manifest()
-        machine_manifest = self._get_machine_manifest()
+        machine_manifest = get_machine_manifest()
 
         # Extract any requested metadata available in the build directory,
         # followed by the install directory (which takes precedence)
@@ -410,14 +470,7 @@ class PluginHandler:
             metadata=metadata,
             metadata_files=metadata_files))
 
-    def _get_machine_manifest(self):
-        return {
-            'uname': common.run_output(['uname', '-srvmpio']),
-            'installed-packages': repo.Repo.get_installed_packages(),
-            'installed-snaps': repo.snaps.get_installed_snaps()
-        }
-
-    def clean_build(self, hint=''):
+    def clean_build(self, hint='', keep_build_basedir=False):
         if self.is_clean('build'):
             hint = '{} {}'.format(hint, '(already clean)').strip()
             self.notify_part_progress('Skipping cleaning build for',
@@ -426,8 +479,14 @@ class PluginHandler:
 
         self.notify_part_progress('Cleaning build for', hint)
 
-        if os.path.exists(self.plugin.build_basedir):
-            shutil.rmtree(self.plugin.build_basedir)
+        # Incremental builds keep the build directory around unless a clean
+        # has been explicitly requested.
+        if not (keep_build_basedir and
+                self._build_attributes.incremental_build()):
+            if os.path.exists(self.plugin.build_basedir):
+                shutil.rmtree(self.plugin.build_basedir)
+            if os.path.exists(self._build_sync_state_path):
+                os.remove(self._build_sync_state_path)
 
         if os.path.exists(self.installdir):
             shutil.rmtree(self.installdir)
@@ -514,14 +573,12 @@ class PluginHandler:
         _migrate_files(snap_files, snap_dirs, self.stagedir, self.primedir)
 
         elf_files = elf.get_elf_files(self.primedir, snap_files)
-        all_dependencies = set()
         # TODO: base snap support
         core_path = common.get_core_path()
 
-        for elf_file in elf_files:
-            all_dependencies.update(
-                elf_file.load_dependencies(root_path=self.primedir,
-                                           core_base_path=core_path))
+        all_dependencies = elf.load_dependencies(
+            elf_files, root_path=self.primedir, core_base_path=core_path,
+            cache_path=os.path.join(self.plugin.statedir, 'elf-dependencies'))
 
         # Split the necessary dependencies into their corresponding location.
         # We'll both migrate and track the system dependencies, but we'll only
@@ -560,8 +617,7 @@ class PluginHandler:
             dynamic_linker = self._project_options.get_core_dynamic_linker()
             elf_patcher = elf.Patcher(dynamic_linker=dynamic_linker,
                                       root_path=self.primedir)
-            for elf_file in elf_files:
-                elf_patcher.patch(elf_file=elf_file)
+            elf_patcher.patch_all(elf_files=elf_files)
 
         self.mark_prime_done(snap_files, snap_dirs, dependency_paths)
 
@@ -621,7 +677,7 @@ class PluginHandler:
         return self.plugin.env(root)
 
     def clean(self, project_staged_state=None, project_primed_state=None,
-              step=None, hint=''):
+              step=None, hint='', keep_build_basedir=False):
         if not project_staged_state:
             project_staged_state = {}
 
@@ -630,7 +686,7 @@ class PluginHandler:
 
         try:
             self._clean_steps(project_staged_state, project_primed_state,
-                              step, hint)
+                              step, hint, keep_build_basedir)
         except errors.MissingStateCleanError:
             # If one of the step cleaning rules is missing state, it must be
             # running on the output of an old Snapcraft. In that case, if we
@@ -651,7 +707,7 @@ class PluginHandler:
             os.rmdir(self.plugin.partdir)
 
     def _clean_steps(self, project_staged_state, project_primed_state,
-                     step=None, hint=None):
+                     step=None, hint=None, keep_build_basedir=False):
         index = None
         if step:
             if step not in common.COMMAND_ORDER:
@@ -668,7 +724,7 @@ class PluginHandler:
             self.clean_stage(project_staged_state, hint)
 
         if not index or index <= common.COMMAND_ORDER.index('build'):
-            self.clean_build(hint)
+            self.clean_build(hint, keep_build_basedir=keep_build_basedir)
 
         if not index or index <= common.COMMAND_ORDER.index('pull'):
             self.clean_pull(hint)
@@ -720,15 +776,18 @@ def _expand_part_properties(part_properties, part_schema):
     in the schema itself.
     """
 
-    # First make a deep copy of the part schema. It contains nested mutables,
-    # and we'd rather not change them.
-    part_schema = copy.deepcopy(part_schema)
-
     # Come up with a dictionary of part schema properties and their default
     # values as defined in the schema.
-    properties = {}
-    for schema_property, subschema in part_schema.items():
-        properties[schema_property] = subschema.get('default')
+    try:
+        _, defaults = _part_schema_defaults[id(part_schema)]
+    except KeyError:
+        defaults = {schema_property: subschema.get('default')
+                    for schema_property, subschema in part_schema.items()}
+        _part_schema_defaults[id(part_schema)] = (part_schema, defaults)
+
+    # The defaults contain nested mutables, make a deep copy of them as we'd
+    # rather not share them between parts.
+    properties = copy.deepcopy(defaults)
 
     # Now expand (overwriting if necessary) the default schema properties with
     # the ones from the actual part.
@@ -740,47 +799,66 @@ def _expand_part_properties(part_properties, part_schema):
 def _migratable_filesets(fileset, srcdir):
     includes, excludes = _get_file_list(fileset)
 
-    include_files = _generate_include_set(srcdir, includes)
-    exclude_files, exclude_dirs = _generate_exclude_set(srcdir, excludes)
+    matcher = FilesetMatcher(srcdir)
+    include_files = matcher.include_set(includes)
+    exclude_files, exclude_dirs = matcher.exclude_set(excludes)
 
     # And chop files, including whole trees if any dirs are mentioned
     snap_files = include_files - exclude_files
-    for exclude_dir in exclude_dirs:
+    if exclude_dirs:
         snap_files = set([x for x in snap_files
-                          if not x.startswith(exclude_dir + '/')])
+                          if not _has_parent_in(x, exclude_dirs)])
 
     # Separate dirs from files
     snap_dirs = set([x for x in snap_files
-                     if os.path.isdir(os.path.join(srcdir, x)) and
-                     not os.path.islink(os.path.join(srcdir, x))])
+                     if matcher.is_dir(x) and not matcher.is_symlink(x)])
     snap_files = snap_files - snap_dirs
 
     # Make sure we also obtain the parent directories of files
+    parent_dirs = set()
     for snap_file in snap_files:
         dirname = os.path.dirname(snap_file)
-        while dirname:
-            snap_dirs.add(dirname)
+        while dirname and dirname not in parent_dirs:
+            parent_dirs.add(dirname)
             dirname = os.path.dirname(dirname)
+    snap_dirs |= parent_dirs
 
     return snap_files, snap_dirs
 
 
 def _migrate_files(snap_files, snap_dirs, srcdir, dstdir, missing_ok=False,
                    follow_symlinks=False, fixup_func=lambda *args: None):
-
-    for directory in snap_dirs:
+    # Create every directory once, parents first, before any file is
+    # migrated into it.
+    directories = set(snap_dirs)
+    directories.update(os.path.dirname(f) for f in snap_files)
+    for directory in sorted(directories):
         src = os.path.join(srcdir, directory)
         dst = os.path.join(dstdir, directory)
 
         snapcraft.file_utils.create_similar_directory(src, dst)
 
-    for snap_file in snap_files:
+    migrations = _get_file_migrations(snap_files, srcdir, dstdir, missing_ok)
+    if migrations:
+        # Copies are mostly waiting on I/O, so they are done concurrently.
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1) as executor:
+            futures = [executor.submit(copy_function, src, dst,
+                                       follow_symlinks=follow_symlinks)
+                       for copy_function, src, dst in migrations]
+            for future in futures:
+                future.result()
+
+    for _, _, dst in migrations:
+        fixup_func(dst)
+
+
+def _get_file_migrations(snap_files, srcdir, dstdir, missing_ok):
+    migrations = []
+    for snap_file in sorted(snap_files):
         src = os.path.join(srcdir, snap_file)
         dst = os.path.join(dstdir, snap_file)
 
-        snapcraft.file_utils.create_similar_directory(os.path.dirname(src),
-                                                      os.path.dirname(dst))
-
         if missing_ok and not os.path.exists(src):
             continue
 
@@ -793,11 +871,11 @@ def _migrate_files(snap_files, snap_dirs, srcdir, dstdir, missing_ok=False,
             os.remove(dst)
 
         if src.endswith('.pc'):
-            shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+            migrations.append((shutil.copy2, src, dst))
         else:
-            file_utils.link_or_copy(src, dst, follow_symlinks=follow_symlinks)
+            migrations.append((file_utils.link_or_copy, src, dst))
 
-        fixup_func(dst)
+    return migrations
 
 
 def _organize_filesets(fileset, base_dir):
@@ -857,47 +935,13 @@ def _get_file_list(stage_set):
     return includes, excludes
 
 
-def _generate_include_set(directory, includes):
-    include_files = set()
-    for include in includes:
-        if '*' in include:
-            pattern = os.path.join(directory, include)
-            matches = iglob(pattern, recursive=True)
-            include_files |= set(matches)
-        else:
-            include_files |= set([os.path.join(directory, include), ])
-
-    include_dirs = [x for x in include_files if os.path.isdir(x)]
-    include_files = set([os.path.relpath(x, directory) for x in include_files])
-
-    # Expand includeFiles, so that an exclude like '*/*.so' will still match
-    # files from an include like 'lib'
-    for include_dir in include_dirs:
-        for root, dirs, files in os.walk(include_dir):
-            include_files |= \
-                set([os.path.relpath(os.path.join(root, d), directory)
-                     for d in dirs])
-            include_files |= \
-                set([os.path.relpath(os.path.join(root, f), directory)
-                     for f in files])
-
-    return include_files
-
-
-def _generate_exclude_set(directory, excludes):
-    exclude_files = set()
-
-    for exclude in excludes:
-        pattern = os.path.join(directory, exclude)
-        matches = iglob(pattern, recursive=True)
-        exclude_files |= set(matches)
-
-    exclude_dirs = [os.path.relpath(x, directory)
-                    for x in exclude_files if os.path.isdir(x)]
-    exclude_files = set([os.path.relpath(x, directory)
-                         for x in exclude_files])
-
-    return exclude_files, exclude_dirs
+def _has_parent_in(path, directories):
+    dirname = os.path.dirname(path)
+    while dirname:
+        if dirname in directories:
+            return True
+        dirname = os.path.dirname(dirname)
+    return False
 
 
 def _validate_relative_paths(files):
@@ -928,37 +972,121 @@ def _file_collides(file_this, file_other):
     return False
 
 
+class _StagedFiles:
+    """The files a part stages, stat'ed and hashed on demand.
+
+    Digests are kept in the part's state directory and only recomputed for
+    files whose size, mtime or inode changed since they were recorded.
+    """
+
+    def __init__(self, part):
+        self.name = part.name
+        self.installdir = part.installdir
+        self._index_path = os.path.join(part.plugin.statedir,
+                                        'stage-digests')
+        self._stats = {}  # type: Dict[str, os.stat_result]
+        self._index = None  # type: Dict[str, List]
+        self._index_changed = False
+
+    def path(self, relpath):
+        return os.path.join(self.installdir, relpath)
+
+    def stat(self, relpath):
+        """Return the stat of relpath, None if it does not exist."""
+        try:
+            return self._stats[relpath]
+        except KeyError:
+            pass
+        try:
+            file_stat = os.stat(self.path(relpath))
+        except OSError:
+            file_stat = None
+        self._stats[relpath] = file_stat
+        return file_stat
+
+    def digest(self, relpath):
+        if self._index is None:
+            self._index = _load_digests(self._index_path)
+        file_stat = self.stat(relpath)
+        signature = [file_stat.st_size, file_stat.st_mtime_ns,
+                     file_stat.st_ino]
+        cached = self._index.get(relpath)
+        if cached and cached[:3] == signature:
+            return cached[3]
+        digest = file_utils.calculate_hash(self.path(relpath),
+                                           algorithm='sha384')
+        self._index[relpath] = signature + [digest]
+        self._index_changed = True
+        return digest
+
+    def save(self):
+        if self._index_changed:
+            os.makedirs(os.path.dirname(self._index_path), exist_ok=True)
+            with open(self._index_path, 'w') as index_file:
+                json.dump(self._index, index_file)
+
+
+def _load_digests(index_path):
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        with open(index_path) as index_file:
+            return json.load(index_file)
+    return {}
+
+
+def _staged_file_collides(relpath, this, other):
+    this_stat = this.stat(relpath)
+    other_stat = other.stat(relpath)
+    if this_stat is None or other_stat is None:
+        return False
+    if os.path.islink(this.path(relpath)) and os.path.islink(
+            other.path(relpath)):
+        return False
+    # Hardlinks of the same file cannot differ.
+    if (this_stat.st_dev == other_stat.st_dev and
+            this_stat.st_ino == other_stat.st_ino):
+        return False
+    if relpath.endswith('.pc'):
+        return _file_collides(this.path(relpath), other.path(relpath))
+    if not (stat.S_ISREG(this_stat.st_mode) and
+            stat.S_ISREG(other_stat.st_mode)):
+        return True
+    if this_stat.st_size != other_stat.st_size:
+        return True
+    return this.digest(relpath) != other.digest(relpath)
+
+
 def check_for_collisions(parts):
-    """Raises a SnapcraftPartConflictError if conflicts are found."""
-    parts_files = {}
-    for part in parts:
-        # Gather our own files up
-        part_files, _ = part.migratable_fileset_for('stage')
-
-        # Scan previous parts for collisions
-        for other_part_name in parts_files:
-            common = part_files & parts_files[other_part_name]['files']
-            conflict_files = []
-            for f in common:
-                this = os.path.join(part.installdir, f)
-                other = os.path.join(
-                    parts_files[other_part_name]['installdir'],
-                    f)
-                if os.path.exists(this) and os.path.exists(other):
-                    if os.path.islink(this) and os.path.islink(other):
-                        continue
-                    if _file_collides(this, other):
-                        conflict_files.append(f)
-
-            if conflict_files:
-                raise errors.SnapcraftPartConflictError(
-                    other_part_name=other_part_name,
-                    part_name=part.name,
-                    conflict_files=conflict_files)
-
-        # And add our files to the list
-        parts_files[part.name] = {'files': part_files,
-                                  'installdir': part.installdir}
+    """Raises a SnapcraftPartConflictError if conflicts are found.
+
+    Every staged path is indexed once, so only the paths shared by more
+    than one part are ever compared.
+    """
+    staged_by = {}  # type: Dict[str, List[_StagedFiles]]
+    staged_parts = []  # type: List[_StagedFiles]
+    try:
+        for part in parts:
+            part_files, _ = part.migratable_fileset_for('stage')
+            this = _StagedFiles(part)
+
+            conflicts = collections.OrderedDict(
+                (other.name, []) for other in staged_parts)
+            staged_parts.append(this)
+            for f in part_files:
+                for other in staged_by.get(f, []):
+                    if _staged_file_collides(f, this, other):
+                        conflicts[other.name].append(f)
+            for other_part_name, conflict_files in conflicts.items():
+                if conflict_files:
+                    raise errors.SnapcraftPartConflictError(
+                        other_part_name=other_part_name,
+                        part_name=part.name,
+                        conflict_files=conflict_files)
+
+            for f in part_files:
+                staged_by.setdefault(f, []).append(this)
+    finally:
+        for staged in staged_parts:
+            staged.save()
 
 
 def _get_includes(fileset):
@@ -22,3 +22,9 @@ class BuildAttributes:
 
     def no_system_libraries(self):
         return 'no-system-libraries' in self._attributes
+
+    def incremental_build(self):
+        return 'incremental-build' in self._attributes
+
+    def source_fingerprint(self):
+        return 'source-fingerprint' in self._attributes
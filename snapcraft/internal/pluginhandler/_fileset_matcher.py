@@ -0,0 +1,227 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import fnmatch
+import os
+import re
+from typing import (  # noqa
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+
+_Entry = collections.namedtuple('_Entry', ['is_dir', 'is_symlink'])
+
+_MAGIC = re.compile('[*?[]')
+
+
+class FilesetMatcher:
+    """Match fileset patterns against the contents of a directory.
+
+    Patterns follow the semantics of glob.iglob(recursive=True), but every
+    directory is only listed once no matter how many patterns are matched,
+    and each pattern component is compiled once.
+    """
+
+    def __init__(self, top: str) -> None:
+        self._top = top
+        self._listings = {}  # type: Dict[str, Dict[str, _Entry]]
+        self._compiled = {}  # type: Dict[str, Pattern]
+
+    def include_set(self, includes: List[str]) -> Set[str]:
+        """Return the paths matched by includes, with included dirs expanded.
+
+        Includes without a '*' are taken literally, whether they exist or
+        not.
+        """
+        matches = set()  # type: Set[str]
+        for include in includes:
+            if '*' in include:
+                matches.update(self.glob(include))
+            else:
+                matches.add(include)
+        include_files = {_normalize(p) for p in matches}
+
+        # Expand the included directories, so that an exclude like '*/*.so'
+        # will still match files from an include like 'lib'
+        walked = set()  # type: Set[str]
+        for include_dir in sorted(p for p in matches if self.is_dir(p)):
+            if self._is_walked(include_dir, walked):
+                continue
+            include_files.update(
+                _normalize(p) for p in self._walk(include_dir))
+            walked.add(include_dir)
+
+        return include_files
+
+    def exclude_set(self, excludes: List[str]) -> Tuple[Set[str], Set[str]]:
+        """Return the paths matched by excludes, and which of them are dirs."""
+        matches = set()  # type: Set[str]
+        for exclude in excludes:
+            matches.update(self.glob(exclude))
+        exclude_files = {_normalize(p) for p in matches}
+        exclude_dirs = {_normalize(p) for p in matches if self.is_dir(p)}
+
+        return exclude_files, exclude_dirs
+
+    def glob(self, pattern: str) -> Set[str]:
+        """Return the paths matching pattern, relative to the top dir."""
+        if not _MAGIC.search(pattern):
+            if os.path.lexists(os.path.join(self._top, pattern)):
+                return {pattern}
+            return set()
+
+        paths = {''}
+        components = pattern.split(os.sep)
+        magic_seen = False
+        for index, component in enumerate(components):
+            dironly = index < len(components) - 1
+            magic_seen = magic_seen or bool(_MAGIC.search(component))
+            if not magic_seen:
+                # Like glob, only check for the existence of the literal
+                # components that follow a magic one.
+                paths = {os.path.join(p, component) for p in paths}
+                continue
+            paths = {match for path in paths
+                     for match in self._glob_in_dir(path, component, dironly)}
+        return paths
+
+    def is_dir(self, path: str) -> bool:
+        """Whether path is a directory, following symlinks."""
+        entry = self._get_entry(path)
+        if entry:
+            return entry.is_dir
+        return os.path.isdir(os.path.join(self._top, path))
+
+    def is_symlink(self, path: str) -> bool:
+        entry = self._get_entry(path)
+        if entry:
+            return entry.is_symlink
+        return os.path.islink(os.path.join(self._top, path))
+
+    def _get_entry(self, path: str) -> _Entry:
+        parent, name = os.path.split(path)
+        if name in ('', os.curdir, os.pardir):
+            return None
+        return self._list(parent).get(name)
+
+    def _list(self, path: str) -> Dict[str, _Entry]:
+        if path not in self._listings:
+            listing = {}  # type: Dict[str, _Entry]
+            try:
+                with os.scandir(os.path.join(self._top, path)) as entries:
+                    for entry in entries:
+                        listing[entry.name] = _Entry(
+                            is_dir=_is_dir(entry),
+                            is_symlink=entry.is_symlink())
+            except OSError:
+                pass
+            self._listings[path] = listing
+        return self._listings[path]
+
+    def _glob_in_dir(self, path: str, component: str,
+                     dironly: bool) -> Iterator[str]:
+        if component == '**':
+            yield path
+            yield from self._list_recursively(path, dironly)
+        elif _MAGIC.search(component):
+            for name in self._match(path, component, dironly):
+                yield os.path.join(path, name)
+        elif not component:
+            if self.is_dir(path):
+                yield path
+        elif component in (os.curdir, os.pardir):
+            if os.path.lexists(os.path.join(self._top, path, component)):
+                yield os.path.join(path, component)
+        elif component in self._list(path):
+            yield os.path.join(path, component)
+
+    def _match(self, path: str, component: str,
+               dironly: bool) -> Iterator[str]:
+        if component not in self._compiled:
+            self._compiled[component] = re.compile(
+                fnmatch.translate(component))
+        pattern = self._compiled[component]
+        include_hidden = component.startswith('.')
+        for name, entry in self._list(path).items():
+            if dironly and not entry.is_dir:
+                continue
+            if not include_hidden and name.startswith('.'):
+                continue
+            if pattern.match(name):
+                yield name
+
+    def _list_recursively(self, path: str, dironly: bool,
+                          ancestors: FrozenSet[Tuple[int, int]]=frozenset()
+                          ) -> Iterator[str]:
+        # Symlinks are followed like glob does, but never into a directory
+        # that is being listed already so that symlink loops terminate.
+        try:
+            path_stat = os.stat(os.path.join(self._top, path))
+        except OSError:
+            return
+        directory = (path_stat.st_dev, path_stat.st_ino)
+        if directory in ancestors:
+            return
+        ancestors = ancestors | {directory}
+
+        for name, entry in self._list(path).items():
+            if name.startswith('.') or (dironly and not entry.is_dir):
+                continue
+            child = os.path.join(path, name)
+            yield child
+            if entry.is_dir:
+                yield from self._list_recursively(child, dironly, ancestors)
+
+    def _is_walked(self, path: str, walked: Set[str]) -> bool:
+        # Whether walking a parent in walked already went through path.
+        if path != _normalize(path):
+            return False
+        while not self.is_symlink(path):
+            path = os.path.dirname(path)
+            if not path:
+                return '' in walked or os.curdir in walked
+            if path in walked:
+                return True
+        return False
+
+    def _walk(self, top: str) -> Iterator[str]:
+        # The equivalent of os.walk, which does not descend into symlinks
+        # to directories other than top.
+        for name, entry in self._list(top).items():
+            child = os.path.join(top, name)
+            yield child
+            if entry.is_dir and not entry.is_symlink:
+                yield from self._walk(child)
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        # e.g. a symlink loop
+        return False
+
+
+def _normalize(path: str) -> str:
+    # The equivalent of os.path.relpath for paths relative to the top dir.
+    return os.path.normpath(path)
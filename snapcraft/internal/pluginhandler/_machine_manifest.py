@@ -0,0 +1,73 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import copy
+import glob
+import os
+from typing import Any, Dict, List, Optional, Tuple  # noqa
+
+from snapcraft.internal import common, repo
+
+# The installed packages are recorded here.
+_DPKG_STATUS = '/var/lib/dpkg/status'
+# The current link of each snap in here points to its installed revision.
+_SNAP_MOUNT_DIR = '/snap'
+
+_cached_key = None  # type: Optional[Tuple[Any, ...]]
+_cached_manifest = None  # type: Dict[str, Any]
+
+
+def get_machine_manifest() -> Dict[str, Any]:
+    """Return the manifest of the machine parts are built on.
+
+    Listing the installed packages and snaps is expensive, so the manifest
+    is computed once and reused until what is installed changes.
+    """
+    global _cached_key, _cached_manifest
+    key = (_get_mtime(_DPKG_STATUS), _get_snap_revisions())
+    if _cached_manifest is None or key != _cached_key:
+        _cached_manifest = {
+            'uname': common.run_output(['uname', '-srvmpio']),
+            'installed-packages': repo.Repo.get_installed_packages(),
+            'installed-snaps': repo.snaps.get_installed_snaps()
+        }
+        _cached_key = key
+
+    return copy.deepcopy(_cached_manifest)
+
+
+def reset_machine_manifest() -> None:
+    """Forget the manifest, so that it is computed again when next used."""
+    global _cached_key, _cached_manifest
+    _cached_key = None
+    _cached_manifest = None
+
+
+def _get_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _get_snap_revisions() -> Tuple[Tuple[str, str], ...]:
+    revisions = []  # type: List[Tuple[str, str]]
+    for link in sorted(glob.glob(
+            os.path.join(_SNAP_MOUNT_DIR, '*', 'current'))):
+        with contextlib.suppress(OSError):
+            revisions.append((link, os.readlink(link)))
+    return tuple(revisions)
@@ -14,10 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import contextlib
+import copy
 import importlib
 import logging
 import sys
+from typing import Any, Dict, Tuple  # noqa
 
 import jsonschema
 
@@ -30,22 +33,26 @@ from snapcraft.internal import (
 
 logger = logging.getLogger(__name__)
 
+_PluginSchema = collections.namedtuple(
+    '_PluginSchema',
+    ['part_schema', 'definitions_schema', 'schema', 'validator'])
+
+# Parts using the same plugin share its class and the compiled schema of its
+# options. The schemas are keyed by the identity of the part schema and hold
+# on to it, so the id cannot be reused. The definitions are handed out as a
+# new copy every time, so they are compared instead.
+_plugin_classes = dict()  # type: Dict[Tuple[str, str], Tuple[str, Any, Any]]
+_plugin_schemas = dict()  # type: Dict[Tuple[Any, int], _PluginSchema]
+
 
 def load_plugin(plugin_name, part_name, project_options, properties,
                 part_schema, definitions_schema):
-    module_name = plugin_name.replace('-', '_')
-    module = _load_module(module_name, plugin_name, project_options)
-    plugin_class = _get_plugin(module)
-    if not plugin_class:
-        raise errors.PluginError(
-            'no plugin found in module {!r}'.format(plugin_name))
-
-    _validate_pull_and_build_properties(
+    plugin_class = _get_plugin_class(plugin_name, project_options)
+    plugin_schema = _get_plugin_schema(
         plugin_name, plugin_class, part_schema, definitions_schema)
 
     try:
-        options = _make_options(
-            part_schema, definitions_schema, properties, plugin_class.schema())
+        options = _make_options(plugin_schema, properties)
     except jsonschema.ValidationError as e:
         error = YamlValidationError.from_validation_error(e)
         raise errors.PluginError(
@@ -80,28 +87,75 @@ def load_plugin(plugin_name, part_name, project_options, properties,
     return plugin
 
 
+def _get_plugin_class(plugin_name, project_options):
+    key = (plugin_name, project_options.local_plugins_dir)
+    with contextlib.suppress(KeyError):
+        import_name, module, plugin_class = _plugin_classes[key]
+        # The module may have been replaced since it was loaded.
+        if sys.modules.get(import_name) is module:
+            return plugin_class
+
+    module_name = plugin_name.replace('-', '_')
+    import_name, module = _load_module(
+        module_name, plugin_name, project_options)
+    plugin_class = _get_plugin(module)
+    if not plugin_class:
+        raise errors.PluginError(
+            'no plugin found in module {!r}'.format(plugin_name))
+
+    _plugin_classes[key] = (import_name, module, plugin_class)
+    return plugin_class
+
+
+def _get_plugin_schema(plugin_name, plugin_class, part_schema,
+                       definitions_schema):
+    key = (plugin_class, id(part_schema))
+    plugin_schema = _plugin_schemas.get(key)
+    if (plugin_schema is not None and
+            plugin_schema.definitions_schema == definitions_schema):
+        return plugin_schema
+
+    schema = _merged_part_and_plugin_schemas(
+        part_schema, definitions_schema, plugin_class.schema())
+    _validate_pull_and_build_properties(plugin_name, plugin_class, schema)
+
+    # This is for backwards compatibility for when most of the
+    # schema was overridable by the plugins.
+    if 'required' in schema and not schema['required']:
+        del schema['required']
+
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    plugin_schema = _PluginSchema(
+        part_schema, definitions_schema, schema, validator_class(schema))
+    _plugin_schemas[key] = plugin_schema
+
+    return plugin_schema
+
+
 def _load_module(module_name, plugin_name, project_options):
     module = None
     with contextlib.suppress(ImportError):
-        module = _load_local('x-{}'.format(plugin_name),
-                             project_options.local_plugins_dir)
+        import_name = 'x-{}'.format(plugin_name)
+        module = _load_local(import_name, project_options.local_plugins_dir)
         logger.info('Loaded local plugin for %s', plugin_name)
 
     if not module:
         with contextlib.suppress(ImportError):
-            module = importlib.import_module(
-                'snapcraft.plugins.{}'.format(module_name))
+            import_name = 'snapcraft.plugins.{}'.format(module_name)
+            module = importlib.import_module(import_name)
 
     if not module:
         logger.info('Searching for local plugin for %s', plugin_name)
         with contextlib.suppress(ImportError):
-            module = _load_local(module_name,
+            import_name = module_name
+            module = _load_local(import_name,
                                  project_options.local_plugins_dir)
         if not module:
             raise errors.PluginError(
                 'unknown plugin: {!r}'.format(plugin_name))
 
-    return module
+    return import_name, module
 
 
 def _load_local(module_name, local_plugin_dir):
@@ -125,10 +179,7 @@ def _get_plugin(module):
         return attr
 
 
-def _validate_pull_and_build_properties(plugin_name, plugin, part_schema,
-                                        definitions_schema):
-    merged_schema = _merged_part_and_plugin_schemas(
-        part_schema, definitions_schema, plugin.schema())
+def _validate_pull_and_build_properties(plugin_name, plugin, merged_schema):
     merged_properties = merged_schema['properties']
 
     # First, validate pull properties
@@ -157,20 +208,9 @@ def _validate_step_properties(step_properties, schema_properties):
     return invalid_properties
 
 
-def _make_options(part_schema, definitions_schema, properties, plugin_schema):
-    # Make copies as these dictionaries are tampered with
-    part_schema = part_schema.copy()
-    properties = properties.copy()
-
-    plugin_schema = _merged_part_and_plugin_schemas(
-        part_schema, definitions_schema, plugin_schema)
-
-    # This is for backwards compatibility for when most of the
-    # schema was overridable by the plugins.
-    if 'required' in plugin_schema and not plugin_schema['required']:
-            del plugin_schema['required']
-    # With the same backwards compatibility in mind we need to remove
-    # the source entry before validation. To those concerned, it has
+def _make_options(plugin_schema, properties):
+    # For backwards compatibility we need to remove the source entry
+    # before validation. To those concerned, it has
     # already been validated.
     validated_properties = properties.copy()
     remove_set = [k for k in sources.get_source_defaults().keys()
@@ -178,9 +218,9 @@ def _make_options(part_schema, definitions_schema, properties, plugin_schema):
     for key in remove_set:
         del validated_properties[key]
 
-    jsonschema.validate(validated_properties, plugin_schema)
+    plugin_schema.validator.validate(validated_properties)
 
-    options = _populate_options(properties, plugin_schema)
+    options = _populate_options(properties, plugin_schema.schema)
 
     return options
 
@@ -210,8 +250,11 @@ def _populate_options(properties, schema):
     schema_properties = schema.get('properties', {})
     for key in schema_properties:
         attr_name = key.replace('-', '_')
-        default_value = schema_properties[key].get('default')
-        attr_value = properties.get(key, default_value)
+        if key in properties:
+            attr_value = properties[key]
+        else:
+            # The schema is shared between parts, and so are its defaults.
+            attr_value = copy.deepcopy(schema_properties[key].get('default'))
         setattr(options, attr_name, attr_value)
 
     return options
@@ -0,0 +1,127 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import heapq
+from typing import Dict, List, Set  # noqa
+
+from . import errors
+
+
+class DependencyGraph:
+    """The graph of parts and the parts they are built after.
+
+    Parts are indexed by name in both directions, so looking up a part, its
+    prerequisites or its dependents does not require going through all the
+    parts.
+    """
+
+    def __init__(self, parts, after_requests: Dict[str, List[str]]) -> None:
+        self._parts = {part.name: part for part in parts}
+        self._order = {part.name: i for i, part in enumerate(parts)}
+        # The names are indexed as requested, unknown parts are only left
+        # out when walking the graph as they are reported when loading.
+        self._prereqs = {
+            name: list(prereqs) for name, prereqs in
+            after_requests.items()}  # type: Dict[str, List[str]]
+        self._dependents = dict()  # type: Dict[str, List[str]]
+        for name, prereqs in after_requests.items():
+            for prereq in prereqs:
+                self._dependents.setdefault(prereq, []).append(name)
+
+        self._ancestors = dict()  # type: Dict[str, Set[str]]
+        self._descendants = dict()  # type: Dict[str, Set[str]]
+        self.sorted_parts = self._sort()
+
+    def _sort(self):
+        # Kahn's algorithm from the leaves of the graph. Ties are broken by
+        # the order the parts were defined in, building the order from the
+        # back.
+        pending = {name: len(self._get_edges(name, self._dependents))
+                   for name in self._parts}
+        ready = [self._order[name]
+                 for name, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        names = list(self._parts)
+        sorted_names = []  # type: List[str]
+
+        while ready:
+            name = names[heapq.heappop(ready)]
+            sorted_names.append(name)
+            for prereq in self._get_edges(name, self._prereqs):
+                pending[prereq] -= 1
+                if pending[prereq] == 0:
+                    heapq.heappush(ready, self._order[prereq])
+
+        if len(sorted_names) < len(names):
+            cycle = self._find_cycle(
+                [name for name in names if pending[name]], pending)
+            raise errors.SnapcraftLogicError(
+                'circular dependency chain found in parts definition: '
+                '{}'.format(' -> '.join(cycle)))
+
+        return [self._parts[name] for name in reversed(sorted_names)]
+
+    def _find_cycle(self, unsorted_names, pending):
+        # Every part left unsorted has a dependent that is left unsorted
+        # too, following those eventually leads back to a visited part.
+        path = []  # type: List[str]
+        positions = dict()  # type: Dict[str, int]
+        name = unsorted_names[0]
+        while name not in positions:
+            positions[name] = len(path)
+            path.append(name)
+            name = next(d for d in self._get_edges(name, self._dependents)
+                        if pending[d])
+        cycle = path[positions[name]:] + [name]
+
+        # Each part in the path is built after the one before it.
+        return list(reversed(cycle))
+
+    def _get_edges(self, part_name, edges):
+        return [name for name in edges.get(part_name, [])
+                if name in self._parts]
+
+    def get_part(self, part_name):
+        """Return the part named part_name, or None."""
+        return self._parts.get(part_name)
+
+    def get_prereqs(self, part_name) -> Set[str]:
+        """Return the names of the parts part_name is built after."""
+        return set(self._prereqs.get(part_name, []))
+
+    def get_dependents(self, part_name) -> Set[str]:
+        """Return the names of the parts built after part_name."""
+        return set(self._dependents.get(part_name, []))
+
+    def get_ancestors(self, part_name) -> Set[str]:
+        """Return the names of all the parts part_name depends upon."""
+        return set(self._closure(part_name, self._prereqs, self._ancestors))
+
+    def get_descendants(self, part_name) -> Set[str]:
+        """Return the names of all the parts depending upon part_name."""
+        return set(self._closure(
+            part_name, self._dependents, self._descendants))
+
+    def _closure(self, part_name, edges, closures):
+        if part_name not in self._parts:
+            return set()
+        if part_name not in closures:
+            closure = set()  # type: Set[str]
+            for name in self._get_edges(part_name, edges):
+                closure.add(name)
+                closure |= self._closure(name, edges, closures)
+            closures[part_name] = closure
+        return closures[part_name]
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import logging
 
 import snapcraft
@@ -28,10 +29,8 @@ from ._env import (
     build_env_for_stage,
     runtime_env,
 )
-from . import (
-    errors,
-    grammar_processing,
-)
+from . import grammar_processing
+from ._dependency_graph import DependencyGraph
 
 logger = logging.getLogger(__name__)
 
@@ -85,63 +84,31 @@ class PartsConfig:
 
             self.load_part(part_name, plugin_name, properties)
 
+        self.graph = DependencyGraph(self.all_parts, self.after_requests)
         self._compute_dependencies()
-        self.all_parts = self._sort_parts()
+        self.all_parts = self.graph.sorted_parts
 
     def _compute_dependencies(self):
         '''Gather the lists of dependencies and adds to all_parts.'''
 
         for part in self.all_parts:
-            dep_names = self.after_requests.get(part.name, [])
-            for dep in dep_names:
-                for i in range(len(self.all_parts)):
-                    if dep == self.all_parts[i].name:
-                        part.deps.append(self.all_parts[i])
-                        break
-
-    def _sort_parts(self):
-        '''Performs an inneficient but easy to follow sorting of parts.'''
-        sorted_parts = []
-
-        while self.all_parts:
-            top_part = None
-            for part in self.all_parts:
-                mentioned = False
-                for other in self.all_parts:
-                    if part in other.deps:
-                        mentioned = True
-                        break
-                if not mentioned:
-                    top_part = part
-                    break
-            if not top_part:
-                raise errors.SnapcraftLogicError(
-                    'circular dependency chain found in parts definition')
-            sorted_parts = [top_part] + sorted_parts
-            self.all_parts.remove(top_part)
-
-        return sorted_parts
+            for dep in self.after_requests.get(part.name, []):
+                dep_part = self.graph.get_part(dep)
+                if dep_part:
+                    part.deps.append(dep_part)
 
     def get_prereqs(self, part_name):
         """Returns a set with all of part_names' prerequisites."""
         return set(self.after_requests.get(part_name, []))
 
-    def get_dependents(self, part_name):
+    def get_dependents(self, part_name, *, recursive=False):
         """Returns a set of all the parts that depend upon part_name."""
-
-        dependents = set()
-        for part, prerequisites in self.after_requests.items():
-            if part_name in prerequisites:
-                dependents.add(part)
-
-        return dependents
+        if recursive:
+            return self.graph.get_descendants(part_name)
+        return self.graph.get_dependents(part_name)
 
     def get_part(self, part_name):
-        for part in self.all_parts:
-            if part.name == part_name:
-                return part
-
-        return None
+        return self.graph.get_part(part_name)
 
     def clean_part(self, part_name, staged_state, primed_state, step):
         part = self.get_part(part_name)
@@ -206,18 +173,24 @@ class PartsConfig:
         return part
 
     def build_env_for_part(self, part, root_part=True):
-        """Return a build env of all the part's dependencies."""
+        """Return a build env of all the part's dependencies.
+
+        Every dependency contributes to the env once, where it is first
+        reached in the after graph, and repeated entries are only kept
+        where they last appear, as that is the one the shell applies.
+        """
 
         env = []
         stagedir = self._project_options.stage_dir
+        stage_runtime_env = runtime_env(
+            stagedir, self._project_options.arch_triplet)
 
         if root_part:
             # this has to come before any {}/usr/bin
             env += part.env(part.installdir)
             env += runtime_env(
                 part.installdir, self._project_options.arch_triplet)
-            env += runtime_env(
-                stagedir, self._project_options.arch_triplet)
+            env += stage_runtime_env
             env += build_env(
                 part.installdir,
                 self._snap_name,
@@ -235,11 +208,22 @@ class PartsConfig:
                        self._project_options.parallel_build_count))
         else:
             env += part.env(stagedir)
-            env += runtime_env(
-                stagedir, self._project_options.arch_triplet)
+            env += stage_runtime_env
+
+        env += self._build_env_for_deps(part, stage_runtime_env, set())
 
+        return list(reversed(collections.OrderedDict.fromkeys(reversed(env))))
+
+    def _build_env_for_deps(self, part, stage_runtime_env, visited):
+        stagedir = self._project_options.stage_dir
+        env = []
         for dep_part in part.deps:
+            if dep_part.name in visited:
+                continue
+            visited.add(dep_part.name)
             env += dep_part.env(stagedir)
-            env += self.build_env_for_part(dep_part, root_part=False)
+            env += stage_runtime_env
+            env += self._build_env_for_deps(
+                dep_part, stage_runtime_env, visited)
 
         return env
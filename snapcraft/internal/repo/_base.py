@@ -167,7 +167,7 @@ class BaseRepo:
         """
         raise errors.NoNativeBackendError()
 
-    def normalize(self, unpackdir):
+    def normalize(self, unpackdir, *, artifacts=None):
         """Normalize artifacts in unpackdir.
 
         Repo specific packages are generally created to live in a specific
@@ -176,8 +176,15 @@ class BaseRepo:
         when building and to also work within a snap's environment.
 
         :param str unpackdir: directory where files where unpacked.
+        :param list artifacts: paths in unpackdir that need to be fixed up,
+                               if already known. unpackdir is scanned for
+                               them otherwise.
         """
-        self._fix_artifacts(unpackdir)
+        if artifacts is None:
+            self._fix_artifacts(unpackdir)
+        else:
+            for path in artifacts:
+                self._fix_artifact(path, unpackdir)
         self._fix_xml_tools(unpackdir)
         self._fix_shebangs(unpackdir)
 
@@ -195,29 +202,27 @@ class BaseRepo:
             # Symlinks to directories will be in dirs, while symlinks to
             # non-directories will be in files.
             for entry in itertools.chain(files, dirs):
-                path = os.path.join(root, entry)
-                if os.path.islink(path) and os.path.isabs(os.readlink(path)):
-                    self._fix_symlink(path, unpackdir, root)
-                elif os.path.exists(path):
-                    _fix_filemode(path)
+                self._fix_artifact(os.path.join(root, entry), unpackdir)
 
-                if path.endswith('.pc') and not os.path.islink(path):
-                    fix_pkg_config(unpackdir, path)
+    def _fix_artifact(self, path, unpackdir):
+        if os.path.islink(path) and os.path.isabs(os.readlink(path)):
+            self._fix_symlink(path, unpackdir, os.path.dirname(path))
+        elif os.path.exists(path):
+            _fix_filemode(path)
+
+        if path.endswith('.pc') and not os.path.islink(path):
+            fix_pkg_config(unpackdir, path)
 
     def _fix_xml_tools(self, unpackdir):
-        xml2_config_path = os.path.join(
-            unpackdir, 'usr', 'bin', 'xml2-config')
-        with contextlib.suppress(FileNotFoundError):
-            file_utils.search_and_replace_contents(
-                xml2_config_path, re.compile(r'prefix=/usr'),
-                'prefix={}/usr'.format(unpackdir))
-
-        xslt_config_path = os.path.join(
-            unpackdir, 'usr', 'bin', 'xslt-config')
-        with contextlib.suppress(FileNotFoundError):
-            file_utils.search_and_replace_contents(
-                xslt_config_path, re.compile(r'prefix=/usr'),
-                'prefix={}/usr'.format(unpackdir))
+        for tool in ('xml2-config', 'xslt-config'):
+            tool_path = os.path.join(unpackdir, 'usr', 'bin', tool)
+            with contextlib.suppress(FileNotFoundError):
+                # The tool may be hard-linked from a cache, which must not
+                # be rewritten along with it.
+                file_utils.unshare(tool_path)
+                file_utils.search_and_replace_contents(
+                    tool_path, re.compile(r'prefix=/usr'),
+                    'prefix={}/usr'.format(unpackdir))
 
     def _fix_symlink(self, path, unpackdir, root):
         host_target = os.readlink(path)
@@ -287,4 +292,6 @@ def _fix_filemode(path):
     mode = stat.S_IMODE(os.stat(path, follow_symlinks=False).st_mode)
     if mode & 0o4000 or mode & 0o2000:
         logger.warning('Removing suid/guid from {}'.format(path))
+        # The file may be hard-linked from a cache, keep its mode there.
+        file_utils.unshare(path)
         os.chmod(path, mode & 0o1777)
@@ -14,9 +14,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import contextlib
+import fcntl
 import glob
 import hashlib
+import json
 import logging
 import os
 import shutil
@@ -24,11 +27,16 @@ import stat
 import string
 import subprocess
 import sys
+import tarfile
+import tempfile
+import time
 import urllib
 import urllib.request
+import weakref
 from typing import Dict, Set, List  # noqa
 
 import apt
+import debian.arfile
 from xml.etree import ElementTree
 
 import snapcraft
@@ -54,6 +62,67 @@ deb http://${security}.ubuntu.com/${suffix} ${release}-security multiverse
 '''
 _GEOIP_SERVER = "http://geoip.ubuntu.com/lookup"
 _library_list = dict()  # type: Dict[str, Set[str]]
+# Package lists fetched less than this many seconds ago are not refreshed,
+# they are refreshed at most once per run otherwise.
+_LISTS_TTL_ENVVAR = 'SNAPCRAFT_APT_LISTS_TTL'
+_LISTS_STAMP = 'snapcraft-lists-updated'
+_LISTS_LOCK = 'snapcraft-lists.lock'
+# Identifies this run in the lists stamp, step workers forked from it
+# inherit the same value and so share the refresh.
+_RUN_ID = '{}-{}'.format(os.getpid(), time.time())
+_DOWNLOAD_CONNECTIONS = 4
+# Bump whenever the way packages are unpacked into the cache changes.
+_UNPACKED_FORMAT = 'v1'
+_TARFILE_DATA_MEMBERS = (
+    'data.tar', 'data.tar.gz', 'data.tar.bz2', 'data.tar.xz')
+
+
+class _AptSession:
+    """An apt cache shared by every user of the same apt sources.
+
+    Users acquire a reference to the session and release it when done.
+    The cache is opened on first use and closed once the last reference is
+    released. The package lists are refreshed at most once per run, across
+    every process taking part in it.
+    """
+
+    @classmethod
+    def acquire(cls, apt_cache: '_AptCache',
+                cache_dir: str) -> '_AptSession':
+        digest = apt_cache.sources_digest()
+        if digest not in _sessions:
+            _sessions[digest] = cls(apt_cache, cache_dir)
+        session = _sessions[digest]
+        session._refcount += 1
+        return session
+
+    def __init__(self, apt_cache: '_AptCache', cache_dir: str) -> None:
+        self._apt = apt_cache
+        self._cache_dir = cache_dir
+        self._refcount = 0
+        self._apt_cache = None  # type: apt.Cache
+        self.progress = None  # type: apt.progress.base.AcquireProgress
+
+    @property
+    def apt_cache(self) -> apt.Cache:
+        if self._apt_cache is None:
+            self._apt_cache = self._apt._setup_apt(self._cache_dir)
+            self.progress = self._apt.progress
+            self._apt_cache.open()
+        return self._apt_cache
+
+    def release(self) -> None:
+        self._refcount -= 1
+        if self._refcount > 0:
+            return
+
+        if self._apt_cache is not None:
+            self._apt_cache.close()
+            self._apt_cache = None
+        _sessions.pop(self._apt.sources_digest(), None)
+
+
+_sessions = dict()  # type: Dict[str, _AptSession]
 
 
 class _AptCache:
@@ -62,6 +131,7 @@ class _AptCache:
         self._deb_arch = deb_arch
         self._sources_list = sources_list
         self._use_geoip = use_geoip
+        self._sources_digest = None  # type: str
 
     def _setup_apt(self, cache_dir):
         # Do not install recommends
@@ -95,6 +165,11 @@ class _AptCache:
         # on the system.
         apt.apt_pkg.config.clear('APT::Update::Post-Invoke-Success')
 
+        # Let stage-packages be downloaded over several connections to the
+        # same archive.
+        apt.apt_pkg.config.set('Acquire::QueueHost::Limit',
+                               str(_DOWNLOAD_CONNECTIONS))
+
         self.progress = apt.progress.text.AcquireProgress()
         if is_dumb_terminal():
             # Make output more suitable for logging.
@@ -122,28 +197,44 @@ class _AptCache:
                 "Cannot find 'dpkg' command needed to support multiarch")
 
         apt_cache = apt.Cache(rootdir=cache_dir, memonly=True)
-        apt_cache.update(fetch_progress=self.progress,
-                         sources_list=sources_list_file)
+        # Concurrent step workers take turns, only the first one refreshes.
+        with open(os.path.join(cache_dir, _LISTS_LOCK), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            stamp_file = os.path.join(cache_dir, _LISTS_STAMP)
+            if not _lists_are_fresh(stamp_file):
+                apt_cache.update(fetch_progress=self.progress,
+                                 sources_list=sources_list_file)
+                with open(stamp_file, 'w') as stamp:
+                    stamp.write(_RUN_ID)
 
         return apt_cache
 
     @contextlib.contextmanager
     def archive(self, cache_dir):
         try:
-            apt_cache = self._setup_apt(cache_dir)
-            apt_cache.open()
-
+            session = _AptSession.acquire(self, cache_dir)
             try:
-                yield apt_cache
+                yield session.apt_cache
             finally:
-                apt_cache.close()
+                session.release()
         except Exception as e:
             logger.debug('Exception occurred: {!r}'.format(e))
             raise e
 
+    def session(self, cache_dir):
+        """Return a reference to the apt session for these sources.
+
+        The session remains open, so that later archive() calls reuse it,
+        until the reference is released.
+        """
+        return _AptSession.acquire(self, cache_dir)
+
     def sources_digest(self):
-        return hashlib.sha384(self._collected_sources_list().encode(
-            sys.getfilesystemencoding())).hexdigest()
+        if self._sources_digest is None:
+            self._sources_digest = hashlib.sha384(
+                self._collected_sources_list().encode(
+                    sys.getfilesystemencoding())).hexdigest()
+        return self._sources_digest
 
     def _collected_sources_list(self):
         if self._use_geoip or self._sources_list:
@@ -297,12 +388,19 @@ class Ubuntu(BaseRepo):
         self._cache = cache.AptStagePackageCache(
             sources_digest=self._apt.sources_digest())
 
+        # Every repo for the same sources shares one apt cache, which is
+        # kept open for as long as any of them is alive.
+        self._session = self._apt.session(self._cache.base_dir)
+        weakref.finalize(self, self._session.release)
+
     def is_valid(self, package_name):
         with self._apt.archive(self._cache.base_dir) as apt_cache:
             return package_name in apt_cache
 
     def get(self, package_names):
         with self._apt.archive(self._cache.base_dir) as apt_cache:
+            # The cache is shared, drop what an earlier get() marked.
+            apt_cache.clear()
             self._mark_install(apt_cache, package_names)
             self._filter_base_packages(apt_cache, package_names)
             return self._get(apt_cache)
@@ -342,40 +440,84 @@ class Ubuntu(BaseRepo):
     def _get(self, apt_cache):
         # Ideally we'd use apt.Cache().fetch_archives() here, but it seems to
         # mangle some package names on disk such that we can't match it up to
-        # the archive later. We could get around this a few different ways:
-        #
-        # 1. Store each stage package in the cache named by a hash instead of
-        #    its name from the archive.
-        # 2. Download packages in a different manner.
-        #
-        # In the end, (2) was chosen for minimal overhead and a simpler cache
-        # implementation. So we're using fetch_binary() here instead.
-        # Downloading each package individually has the drawback of witholding
-        # any clue of how long the whole pulling process will take, but that's
-        # something we'll have to live with.
-        pkg_list = []
-        for package in apt_cache.get_changes():
-            pkg_list.append(str(package.candidate))
-            source = package.candidate.fetch_binary(
-                self._cache.packages_dir, progress=self._apt.progress)
+        # the archive later. So every deb is queued in a single fetcher under
+        # the name it has in the archive instead, which also lets apt
+        # download them concurrently and report the overall progress.
+        versions = [package.candidate for package in apt_cache.get_changes()]
+        sources = _fetch_binaries(
+            versions, self._cache.packages_dir, self._session.progress)
+        for source in sources:
+            self._cache.mark_used(source)
             destination = os.path.join(
                 self._downloaddir, os.path.basename(source))
             with contextlib.suppress(FileNotFoundError):
                 os.remove(destination)
             file_utils.link_or_copy(source, destination)
 
-        return pkg_list
+        return [str(version) for version in versions]
 
     def unpack(self, unpackdir):
         pkgs_abs_path = glob.glob(os.path.join(self._downloaddir, '*.deb'))
-        for pkg in pkgs_abs_path:
-            # TODO needs elegance and error control
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1) as executor:
+            unpacked = list(executor.map(self._unpack_cached, pkgs_abs_path))
+
+        # Link in the same order packages used to be extracted in, so that
+        # the same package wins when several ship the same file.
+        artifacts = []  # type: List[str]
+        for tree, tree_artifacts in unpacked:
+            file_utils.link_or_copy_tree(
+                tree, unpackdir, copy_function=_relink)
+            if tree_artifacts is None or artifacts is None:
+                # Some package was extracted by dpkg-deb, look for everything.
+                artifacts = None
+            else:
+                artifacts.extend(
+                    os.path.join(unpackdir, a) for a in tree_artifacts)
+        self.normalize(unpackdir, artifacts=artifacts)
+
+    def _unpack_cached(self, pkg):
+        """Return the unpacked tree of pkg and its artifacts.
+
+        The tree is extracted into the stage-packages cache the first time
+        and reused afterwards, as it only depends on the name, version and
+        architecture of the package, which make up the name of the deb.
+        """
+        cached_dir = os.path.join(
+            self._cache.unpacked_dir, _UNPACKED_FORMAT,
+            os.path.splitext(os.path.basename(pkg))[0])
+        tree = os.path.join(cached_dir, 'tree')
+        artifacts_file = os.path.join(cached_dir, 'artifacts.json')
+        with contextlib.suppress(FileNotFoundError):
+            with open(artifacts_file) as f:
+                artifacts = json.load(f)
+            self._cache.mark_used(cached_dir)
+            return tree, artifacts
+
+        os.makedirs(os.path.dirname(cached_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(cached_dir))
+        try:
+            tmp_tree = os.path.join(tmp_dir, 'tree')
+            os.mkdir(tmp_tree)
+            artifacts = _extract_deb(pkg, tmp_tree)
+            if artifacts is not None:
+                artifacts = [os.path.relpath(a, tmp_tree) for a in artifacts]
+            # Shebangs do not depend on where the tree ends up, so rewrite
+            # them once here.
+            self._fix_shebangs(tmp_tree)
+            with open(os.path.join(tmp_dir, 'artifacts.json'), 'w') as f:
+                json.dump(artifacts, f)
+            os.chmod(tmp_dir, 0o755)
             try:
-                subprocess.check_call(
-                    ['dpkg-deb', '--extract', pkg, unpackdir])
-            except subprocess.CalledProcessError:
-                raise errors.UnpackError(pkg)
-        self.normalize(unpackdir)
+                os.rename(tmp_dir, cached_dir)
+            except OSError:
+                # Somebody else cached the same package meanwhile.
+                logger.debug('{!r} is already cached'.format(pkg))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        with open(artifacts_file) as f:
+            return tree, json.load(f)
 
     def _manifest_dep_names(self, apt_cache):
         manifest_dep_names = set()
@@ -390,6 +532,141 @@ class Ubuntu(BaseRepo):
         return manifest_dep_names
 
 
+def _relink(source, destination):
+    # Replace rather than copy over what an earlier unpack left behind.
+    if os.path.islink(destination) or os.path.isfile(destination):
+        os.unlink(destination)
+    file_utils.link_or_copy(source, destination)
+
+
+def _extract_deb(pkg, unpackdir):
+    """Extract the data of the deb at pkg into unpackdir.
+
+    The data is streamed out of the deb and suid/guid bits are dropped as
+    the files are written. dpkg-deb is used instead if the data is
+    compressed in a way tarfile does not support.
+
+    :returns: the extracted absolute symlinks and pkg-config files, which
+              still need fixing up, or None if they are unknown.
+    """
+    # Importing DebFile causes LP: #1731478 when snapcraft is
+    # run as a snap.
+    try:
+        deb_ar = debian.arfile.ArFile(pkg)
+        data_member_name = [
+            i for i in deb_ar.getnames() if i.startswith('data.tar')][0]
+    except (debian.arfile.ArError, IndexError):
+        raise errors.UnpackError(pkg)
+
+    if data_member_name not in _TARFILE_DATA_MEMBERS:
+        try:
+            subprocess.check_call(['dpkg-deb', '--extract', pkg, unpackdir])
+        except subprocess.CalledProcessError:
+            raise errors.UnpackError(pkg)
+        return None
+
+    try:
+        with tarfile.open(fileobj=deb_ar.getmember(data_member_name),
+                          mode='r|*') as tar:
+            return _extract_tar_members(tar, unpackdir)
+    except tarfile.TarError:
+        raise errors.UnpackError(pkg)
+
+
+def _extract_tar_members(tar, unpackdir):
+    artifacts = []
+    for member in tar:
+        name = os.path.normpath(member.name)
+        if name == '.':
+            continue
+        if os.path.isabs(name) or name.startswith('..'):
+            logger.warning('Skipping {!r} outside of the package'.format(
+                member.name))
+            continue
+
+        path = os.path.join(unpackdir, name)
+        # Packages do not always list the parent directories of their
+        # members, and may list the same member more than once.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not member.isdir() and os.path.lexists(path):
+            os.remove(path)
+
+        if member.mode & 0o4000 or member.mode & 0o2000:
+            logger.warning('Removing suid/guid from {}'.format(path))
+            member.mode &= 0o1777
+        tar.extract(member, unpackdir)
+
+        if member.issym():
+            if os.path.isabs(member.linkname):
+                artifacts.append(path)
+        elif name.endswith('.pc'):
+            artifacts.append(path)
+
+    return artifacts
+
+
+def _fetch_binaries(versions, destdir, progress):
+    """Download the debs for versions into destdir.
+
+    Debs already in destdir with the expected size and hash are reused,
+    the rest are downloaded in one run of the apt fetcher, which verifies
+    their hashes.
+
+    :returns: the paths to the debs, in the same order as versions.
+    """
+    fetcher = apt.apt_pkg.Acquire(progress)
+    paths = []
+    items = []
+    for version in versions:
+        path = os.path.join(destdir, os.path.basename(version.filename))
+        paths.append(path)
+        if _is_fetched(path, version):
+            logger.debug('Reusing cached {!r}'.format(path))
+            continue
+        items.append(apt.apt_pkg.AcquireFile(
+            fetcher, version.uri, hash='SHA256:{}'.format(version.sha256),
+            size=version.size, descr=os.path.basename(path),
+            destfile=path))
+
+    if items:
+        fetcher.run()
+    for item in items:
+        if item.status != item.STAT_DONE:
+            raise errors.PackageFetchError(item.error_text)
+
+    return paths
+
+
+def _is_fetched(path, version):
+    try:
+        if os.path.getsize(path) != version.size:
+            return False
+    except FileNotFoundError:
+        return False
+
+    return file_utils.calculate_hash(
+        path, algorithm='sha256') == version.sha256
+
+
+def _lists_are_fresh(stamp_file):
+    with contextlib.suppress(FileNotFoundError):
+        with open(stamp_file) as stamp:
+            if stamp.read() == _RUN_ID:
+                return True
+
+    try:
+        ttl = int(os.getenv(_LISTS_TTL_ENVVAR, '0'))
+    except ValueError:
+        logger.warning('Ignoring invalid {} value {!r}'.format(
+            _LISTS_TTL_ENVVAR, os.getenv(_LISTS_TTL_ENVVAR)))
+        return False
+
+    try:
+        return time.time() - os.stat(stamp_file).st_mtime < ttl
+    except FileNotFoundError:
+        return False
+
+
 def _get_local_sources_list():
     sources_list = glob.glob('/etc/apt/sources.list.d/*.list')
     sources_list.append('/etc/apt/sources.list')
@@ -73,6 +73,14 @@ class PackageNotFoundError(RepoError):
         return self.message
 
 
+class PackageFetchError(RepoError):
+
+    fmt = 'Package fetch error: {message}'
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message=message)
+
+
 class UnpackError(RepoError):
 
     fmt = 'Error while provisioning {package!r}'
@@ -13,6 +13,8 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import logging
 import os
 import requests
 import shutil
@@ -25,6 +27,8 @@ from snapcraft.internal.indicators import (
 )
 from ._checksum import split_checksum, verify_checksum
 
+logger = logging.getLogger(__name__)
+
 
 class Base:
 
@@ -42,6 +46,16 @@ class Base:
 
         self.command = command
 
+    def fingerprint(self, index_path):
+        """Return a digest of the source contents.
+
+        Sources that cannot tell whether their contents changed return None.
+
+        :param str index_path: file where a stat index can be persisted to
+                               speed up subsequent calls.
+        """
+        return None
+
 
 class FileBase(Base):
 
@@ -60,9 +74,9 @@ class FileBase(Base):
             # this file and we don't want that.
             shutil.copy2(self.source, source_file)
 
-        # Verify before provisioning
-        if self.source_checksum:
-            verify_checksum(self.source_checksum, source_file)
+            # Verify before provisioning, downloads verify themselves.
+            if self.source_checksum:
+                verify_checksum(self.source_checksum, source_file)
 
         # We finally provision
         self.provision(self.source_dir, src=source_file)
@@ -70,8 +84,10 @@ class FileBase(Base):
     def download(self):
         # First check if we already have the source file cached.
         file_cache = FileCache()
+        algorithms = []
         if self.source_checksum:
             algorithm, hash = split_checksum(self.source_checksum)
+            algorithms.append(algorithm)
             cache_file = file_cache.get(algorithm=algorithm, hash=hash)
             if cache_file:
                 self.file = os.path.join(self.source_dir,
@@ -84,22 +100,44 @@ class FileBase(Base):
         # If not we download and store
         self.file = os.path.join(
                 self.source_dir, os.path.basename(self.source))
+        # Downloads resume into existing files, start from scratch.
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.file)
 
+        # Files are hashed as they are downloaded.
+        digests = dict()
+        response_headers = None
         if snapcraft.internal.common.get_url_scheme(self.source) == 'ftp':
             download_urllib_source(self.source, self.file)
         else:
+            # Revalidate what was last downloaded from the same url.
+            cache_file, headers = file_cache.get_download(url=self.source)
             request = requests.get(
-                self.source, stream=True, allow_redirects=True)
+                self.source, stream=True, allow_redirects=True,
+                headers=headers)
             request.raise_for_status()
 
-            download_requests_stream(request, self.file)
+            if cache_file and request.status_code == 304:
+                logger.debug('{!r} has not changed since it was last '
+                             'downloaded'.format(self.source))
+                shutil.copy2(cache_file, self.file)
+            else:
+                digests = download_requests_stream(
+                    request, self.file, algorithms=algorithms)
+                response_headers = request.headers
 
         # We verify the file if source_checksum is defined
         # and we cache the file for future reuse.
         if self.source_checksum:
             algorithm, digest = verify_checksum(
-                self.source_checksum, self.file)
+                self.source_checksum, self.file,
+                calculated_digest=digests.get(algorithm))
             file_cache.cache(filename=self.file,
                              algorithm=algorithm,
                              hash=hash)
+        # Only verified downloads are cached for revalidation.
+        if response_headers is not None:
+            file_cache.cache_download(filename=self.file,
+                                      url=self.source,
+                                      headers=response_headers)
         return self.file
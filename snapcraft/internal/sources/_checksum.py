@@ -33,11 +33,14 @@ def split_checksum(source_checksum: str) -> Tuple:
     return (algorithm, digest)
 
 
-def verify_checksum(source_checksum: str, checkfile: str) -> Tuple:
+def verify_checksum(source_checksum: str, checkfile: str, *,
+                    calculated_digest: str=None) -> Tuple:
     """Verifies that checkfile corresponds to the given source_checksum.
     :param str source_checksum: algorithm/hash expected for checkfile.
     :param str checkfile: the file to calculate the sum for with the
                           algorithm defined in source_checksum.
+    :param str calculated_digest: the hash of checkfile if it was already
+                                  calculated while writing it.
     :raises ValueError: if source_checksum is not of the form algorightm/hash.
     :raises DigestDoesNotMatchError: if checkfile does not match the expected
                                      hash calculated with the algorithm defined
@@ -46,7 +49,8 @@ def verify_checksum(source_checksum: str, checkfile: str) -> Tuple:
     """
     algorithm, digest = split_checksum(source_checksum)
 
-    calculated_digest = calculate_hash(checkfile, algorithm=algorithm)
+    if calculated_digest is None:
+        calculated_digest = calculate_hash(checkfile, algorithm=algorithm)
     if digest != calculated_digest:
         raise errors.DigestDoesNotMatchError(digest, calculated_digest)
 
@@ -0,0 +1,98 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import hashlib
+import json
+import os
+import stat
+from typing import Callable, Dict, List  # noqa
+
+from snapcraft import file_utils
+
+
+def fingerprint_tree(top: str, *, index_path: str,
+                     ignore: Callable[[str, List[str]], List[str]]=None
+                     ) -> str:
+    """Return a digest for the contents of the tree at top.
+
+    The digest is built Merkle style: every directory hashes the names,
+    types, permissions and digests of its entries, so it only changes when
+    the contents of the tree do. The digest of a file is only recomputed if
+    its size, mtime or inode differ from the ones recorded in the stat index
+    kept at index_path.
+
+    :param str top: the directory to fingerprint.
+    :param str index_path: file where the stat index is persisted.
+    :param ignore: callable with the same signature as the one taken by
+                   shutil.copytree, returning the entries to leave out.
+    """
+    index = _load_index(index_path)
+    new_index = {}  # type: Dict[str, List]
+
+    def _hash_directory(directory):
+        hasher = hashlib.sha384()
+        entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        ignored = set()
+        if ignore:
+            ignored = set(ignore(directory, [e.name for e in entries]))
+
+        for entry in entries:
+            if entry.name in ignored:
+                continue
+            entry_stat = entry.stat(follow_symlinks=False)
+            mode = stat.S_IMODE(entry_stat.st_mode)
+            if entry.is_symlink():
+                kind, digest = 'l', os.readlink(entry.path)
+            elif entry.is_dir(follow_symlinks=False):
+                kind, digest = 'd', _hash_directory(entry.path)
+            else:
+                kind, digest = 'f', _hash_file(entry.path, entry_stat)
+            hasher.update('{}\0{}\0{:o}\0{}\0'.format(
+                kind, entry.name, mode, digest).encode(
+                    'utf-8', 'surrogateescape'))
+
+        return hasher.hexdigest()
+
+    def _hash_file(path, file_stat):
+        signature = [file_stat.st_size, file_stat.st_mtime_ns,
+                     file_stat.st_ino]
+        relpath = os.path.relpath(path, top)
+        cached = index.get(relpath)
+        if cached and cached[:3] == signature:
+            digest = cached[3]
+        else:
+            digest = file_utils.calculate_hash(path, algorithm='sha384')
+        new_index[relpath] = signature + [digest]
+        return digest
+
+    fingerprint = _hash_directory(top)
+    _save_index(index_path, new_index)
+
+    return fingerprint
+
+
+def _load_index(index_path):
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        with open(index_path) as index_file:
+            return json.load(index_file)
+    return {}
+
+
+def _save_index(index_path, index):
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, 'w') as index_file:
+        json.dump(index, index_file)
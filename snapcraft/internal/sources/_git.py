@@ -19,6 +19,7 @@ import re
 import subprocess
 import sys
 
+from snapcraft.internal import cache
 from . import errors
 from ._base import Base
 
@@ -130,6 +131,9 @@ class Git(Base):
                 '--branch', self.source_tag or self.source_branch])
         if self.source_depth:
             command.extend(['--depth', str(self.source_depth)])
+        reference = self._get_reference()
+        if reference:
+            command.extend(['--reference', reference, '--dissociate'])
         subprocess.check_call(command + [self.source, self.source_dir],
                               **self._call_kwargs)
 
@@ -138,6 +142,14 @@ class Git(Base):
                                   'checkout', self.source_commit],
                                   **self._call_kwargs)
 
+    def _get_reference(self):
+        # Local repositories are already cloned with hardlinks, and mirroring
+        # a repository would fetch more than a shallow clone asks for.
+        if self.source_depth or os.path.isdir(self.source):
+            return None
+        return cache.GitCache(command=self.command).mirror(
+            self.source, call_kwargs=self._call_kwargs)
+
     def pull(self):
         if os.path.exists(os.path.join(self.source_dir, '.git')):
             self._pull_existing()
@@ -17,11 +17,11 @@
 import copy
 import glob
 import os
-import shutil
 
 from snapcraft import file_utils
 from snapcraft.internal import common
 from ._base import Base
+from ._fingerprint import fingerprint_tree
 
 
 class Local(Base):
@@ -29,23 +29,27 @@ class Local(Base):
     def pull(self):
         if os.path.islink(self.source_dir) or os.path.isfile(self.source_dir):
             os.remove(self.source_dir)
-        elif os.path.isdir(self.source_dir):
-            shutil.rmtree(self.source_dir)
 
-        current_dir = os.getcwd()
-        source_abspath = os.path.abspath(self.source)
+        # Only what changed since the last pull is linked again, and what
+        # went away is removed.
+        file_utils.sync_tree(os.path.abspath(self.source), self.source_dir,
+                             ignore=self._get_ignore(), prune=True)
+
+    def fingerprint(self, index_path):
+        return fingerprint_tree(os.path.abspath(self.source),
+                                index_path=index_path,
+                                ignore=self._get_ignore())
+
+    def _get_ignore(self):
+        # Only the snapcraft files at the top of the source, or in the
+        # project if it is inside the source, are ignored.
+        ignored = dict()
+        for directory in {os.path.abspath(self.source), os.getcwd()}:
+            ignored[directory] = copy.copy(common.SNAPCRAFT_FILES)
+            snaps = glob.glob(os.path.join(directory, '*.snap'))
+            ignored[directory] += [os.path.basename(s) for s in snaps]
 
         def ignore(directory, files):
-            if directory == source_abspath or \
-               directory == current_dir:
-                ignored = copy.copy(common.SNAPCRAFT_FILES)
-                snaps = glob.glob(os.path.join(directory, '*.snap'))
-                if snaps:
-                    snaps = [os.path.basename(s) for s in snaps]
-                    ignored += snaps
-                return ignored
-            else:
-                return []
-
-        shutil.copytree(source_abspath, self.source_dir, symlinks=True,
-                        copy_function=file_utils.link_or_copy, ignore=ignore)
+            return ignored.get(directory, [])
+
+        return ignore
@@ -14,15 +14,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import os
 import re
 import shutil
+import subprocess
 import tarfile
 import tempfile
 
 from . import errors
 from ._base import FileBase
 
+# Decompressors used in place of tarfile's own when available, those that
+# work in parallel first. The compression is told by the magic number of the
+# tarball, and tarfile does not support zstd at all.
+_DECOMPRESSORS = [
+    (b'\x1f\x8b', [['pigz', '-dc']]),
+    (b'BZh', [['lbzip2', '-dc'], ['pbzip2', '-dc']]),
+    (b'\xfd7zXZ\x00', [['pixz', '-d']]),
+    (b'\x28\xb5\x2f\xfd', [['zstd', '-dc']]),
+]
+
 
 class Tar(FileBase):
 
@@ -52,11 +64,15 @@ class Tar(FileBase):
                 self.source_dir, os.path.basename(self.source))
 
         if clean_target:
-            tmp_tarball = tempfile.NamedTemporaryFile().name
-            shutil.move(tarball, tmp_tarball)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_tarball, tarball)
+            # The tarball may be in dst, it is left alone.
+            os.makedirs(dst, exist_ok=True)
+            for entry in os.scandir(dst):
+                if os.path.abspath(entry.path) == os.path.abspath(tarball):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
 
         self._extract(tarball, dst)
 
@@ -64,35 +80,31 @@ class Tar(FileBase):
             os.remove(tarball)
 
     def _extract(self, tarball, dst):
-        with tarfile.open(tarball) as tar:
-            def filter_members(tar):
-                """Filters members and member names:
-                    - strips common prefix
-                    - bans dangerous names"""
-                members = tar.getmembers()
-                common = os.path.commonprefix([m.name for m in members])
-
-                # commonprefix() works a character at a time and will
-                # consider "d/ab" and "d/abc" to have common prefix "d/ab";
-                # check all members either start with common dir
-                for m in members:
-                    if not (m.name.startswith(common + '/') or
-                            m.isdir() and m.name == common):
-                        # commonprefix() didn't return a dir name; go up one
-                        # level
-                        common = os.path.dirname(common)
-                        break
-
-                for m in members:
-                    if m.name == common:
-                        continue
-                    self._strip_prefix(common, m)
-                    # We mask all files to be writable to be able to easily
-                    # extract on top.
-                    m.mode = m.mode | 0o200
-                    yield m
-
-            tar.extractall(members=filter_members(tar), path=dst)
+        # The tarball is extracted in a single pass as is, the common prefix
+        # can only be told once all the members are known. The contents of
+        # the common prefix are then moved into dst.
+        extract_dir = tempfile.mkdtemp(prefix='.snapcraft-extract-', dir=dst)
+        try:
+            members = []
+            with _open_stream(tarball) as tar:
+                def filter_members(tar):
+                    """Filters members and member names:
+                        - bans dangerous names
+                        - records the members to find the common prefix"""
+                    for m in tar:
+                        self._strip_prefix('', m)
+                        # We mask all files to be writable to be able to
+                        # easily extract on top.
+                        m.mode = m.mode | 0o200
+                        members.append(m)
+                        yield m
+
+                tar.extractall(members=filter_members(tar), path=extract_dir)
+
+            common = _get_common_prefix(members)
+            _merge_tree(os.path.join(extract_dir, common), dst)
+        finally:
+            shutil.rmtree(extract_dir, ignore_errors=True)
 
     def _strip_prefix(self, common, member):
         if member.name.startswith(common + '/'):
@@ -104,3 +116,71 @@ class Tar(FileBase):
             if member.linkname.startswith(common + '/'):
                 member.linkname = member.linkname[len(common + '/'):]
             member.linkname = re.sub(r'^(\.{0,2}/)*', r'', member.linkname)
+
+
+def _get_common_prefix(members):
+    common = os.path.commonprefix([m.name for m in members])
+
+    # commonprefix() works a character at a time and will
+    # consider "d/ab" and "d/abc" to have common prefix "d/ab";
+    # check all members either start with common dir
+    for m in members:
+        if not (m.name.startswith(common + '/') or
+                m.isdir() and m.name == common):
+            # commonprefix() didn't return a dir name; go up one
+            # level
+            common = os.path.dirname(common)
+            break
+
+    return common
+
+
+@contextlib.contextmanager
+def _open_stream(tarball):
+    command = _get_decompressor(tarball)
+    if not command:
+        with tarfile.open(tarball, 'r|*') as tar:
+            yield tar
+        return
+
+    with open(tarball, 'rb') as tarball_file:
+        process = subprocess.Popen(
+            command, stdin=tarball_file, stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode='r|') as tar:
+            yield tar
+        # Let the decompressor write out the padding tar did not read.
+        while process.stdout.read(tarfile.RECORDSIZE):
+            pass
+    finally:
+        process.stdout.close()
+        exit_code = process.wait()
+    if exit_code != 0:
+        raise errors.TarballDecompressionError(
+            tarball, ' '.join(command), exit_code)
+
+
+def _get_decompressor(tarball):
+    with open(tarball, 'rb') as tarball_file:
+        magic = tarball_file.read(6)
+
+    for compression_magic, commands in _DECOMPRESSORS:
+        if magic.startswith(compression_magic):
+            for command in commands:
+                if shutil.which(command[0]):
+                    return command
+    return None
+
+
+def _merge_tree(source, destination):
+    for entry in os.scandir(source):
+        destination_path = os.path.join(destination, entry.name)
+        if (entry.is_dir(follow_symlinks=False) and
+                os.path.isdir(destination_path) and
+                not os.path.islink(destination_path)):
+            _merge_tree(entry.path, destination_path)
+            continue
+        if (os.path.isdir(destination_path) and
+                not os.path.islink(destination_path)):
+            shutil.rmtree(destination_path)
+        os.replace(entry.path, destination_path)
@@ -43,3 +43,13 @@ class InvalidDebError(errors.SnapcraftError):
     fmt = ('The {deb_file} used does not contain valid data. '
            'Ensure a proper deb file is passed for .deb files '
            'as sources.')
+
+
+class TarballDecompressionError(errors.SnapcraftError):
+
+    fmt = ('Failed to decompress {tarball!r}: {command!r} exited with '
+           '{exit_code}.')
+
+    def __init__(self, tarball, command, exit_code):
+        super().__init__(tarball=tarball, command=command,
+                         exit_code=exit_code)
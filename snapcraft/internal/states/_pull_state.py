@@ -48,7 +48,8 @@ class PullState(PartState):
 
     def __init__(self, property_names, part_properties=None, project=None,
                  stage_packages=None, build_snaps=None, build_packages=None,
-                 source_details=None, metadata=None, metadata_files=None):
+                 source_details=None, metadata=None, metadata_files=None,
+                 source_fingerprint=None):
         # Save this off before calling super() since we'll need it
         # FIXME: for 3.x the name `schema_properties` is leaking
         #        implementation details from a higher layer.
@@ -71,6 +72,10 @@ class PullState(PartState):
             'files': metadata_files
         }
 
+        # Digest of the contents of the source, only recorded when the
+        # source-fingerprint build attribute is set.
+        self.source_fingerprint = source_fingerprint
+
         super().__init__(part_properties, project)
 
     def properties_of_interest(self, part_properties):
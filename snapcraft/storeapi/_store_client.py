@@ -230,6 +230,7 @@ class StoreClient():
         # LP: #1617765
         not_downloaded = True
         retry_count = 5
+        digests = dict()
         while not_downloaded and retry_count:
             headers = {}
             if resume_possible and os.path.exists(download_path):
@@ -242,8 +243,9 @@ class StoreClient():
                 logger.debug('Redirections for {!r}: {}'.format(
                     download_url, ', '.join(redirections)))
             try:
-                download_requests_stream(request, download_path,
-                                         total_read=total_read)
+                digests = download_requests_stream(
+                    request, download_path, total_read=total_read,
+                    algorithms=['sha512'])
                 not_downloaded = False
             except requests.exceptions.ChunkedEncodingError as e:
                 logger.debug('Error while downloading: {!r}. '
@@ -254,7 +256,7 @@ class StoreClient():
                     raise e
                 sleep(1)
 
-        if self._is_downloaded(download_path, expected_sha512):
+        if digests.get('sha512') == expected_sha512:
             logger.info('Successfully downloaded {} at {}'.format(
                 name, download_path))
         else:
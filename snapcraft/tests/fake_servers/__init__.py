@@ -46,9 +46,15 @@ class FakeFileHTTPRequestHandler(BaseHTTPRequestHandler):
 
     def do_GET(self):
         data = 'Test fake file'
+        etag = '"test-fake-file"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
         self.send_response(200)
         self.send_header('Content-Length', len(data))
         self.send_header('Content-type', 'text/html')
+        self.send_header('ETag', etag)
         self.end_headers()
         self.wfile.write(data.encode())
 
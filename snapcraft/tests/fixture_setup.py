@@ -833,6 +833,10 @@ class FakeAptCache(fixtures.Fixture):
         def update(self, *args, **kwargs):
             pass
 
+        def clear(self):
+            for package in self.packages.values():
+                package.marked_install = False
+
         def get_changes(self):
             return [self.packages[package] for package in self.packages
                     if self.packages[package].marked_install]
@@ -867,6 +871,11 @@ class FakeAptCache(fixtures.Fixture):
 
         self.cache = self.Cache()
         self.mock_apt_cache.return_value = self.cache
+
+        patcher = mock.patch('snapcraft.repo._deb._fetch_binaries',
+                             side_effect=self._fetch_binaries)
+        patcher.start()
+        self.addCleanup(patcher.stop)
         for package, version in self.packages:
             self.add_package(FakeAptCachePackage(package, version))
 
@@ -877,6 +886,14 @@ class FakeAptCache(fixtures.Fixture):
                     'internal', 'repo', 'manifest.txt'))) as manifest_file:
             self.add_packages([line.strip() for line in manifest_file])
 
+    def _fetch_binaries(self, versions, destdir, progress):
+        paths = []
+        for version in versions:
+            path = os.path.join(self.path, version.name)
+            open(path, 'w').close()
+            paths.append(path)
+        return paths
+
     def add_package(self, package):
         package.temp_dir = self.path
         self.cache[package.name] = package
@@ -936,11 +953,6 @@ class FakeAptCachePackage():
     def mark_keep(self):
         pass
 
-    def fetch_binary(self, dir_, progress):
-        path = os.path.join(self.temp_dir, self.name)
-        open(path, 'w').close()
-        return path
-
     def get_dependencies(self, _):
         return []
 
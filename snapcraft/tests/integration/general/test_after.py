@@ -57,7 +57,7 @@ class AfterTestCase(integration.TestCase):
         self.assertThat(exception.returncode, Equals(2))
         expected = (
             'Issue detected while analyzing snapcraft.yaml: '
-            'circular dependency chain found in parts definition\n')
+            'circular dependency chain found in parts definition: ')
         self.assertThat(exception.output, Contains(expected))
 
     def test_build_with_missing_dependencies(self):
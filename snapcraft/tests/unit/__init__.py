@@ -28,6 +28,7 @@ import testtools
 
 import snapcraft
 from snapcraft.internal import common
+from snapcraft.internal.pluginhandler import _plugin_loader
 from snapcraft.tests import fake_servers, fixture_setup
 from snapcraft.internal.project_loader import grammar_processing
 
@@ -118,6 +119,12 @@ class TestCase(testscenarios.WithScenarios, testtools.TestCase):
         self.addCleanup(common.set_schemadir, common.get_schemadir())
         self.addCleanup(common.set_librariesdir, common.get_librariesdir())
         self.addCleanup(common.reset_env)
+        self.addCleanup(
+            snapcraft.internal.pluginhandler.reset_machine_manifest)
+        self.addCleanup(
+            snapcraft.internal.pluginhandler._part_schema_defaults.clear)
+        self.addCleanup(_plugin_loader._plugin_classes.clear)
+        self.addCleanup(_plugin_loader._plugin_schemas.clear)
         common.set_schemadir(
                 os.path.join(__file__, '..', '..', '..', '..', 'schema'))
         self.fake_logger = fixtures.FakeLogger(level=logging.ERROR)
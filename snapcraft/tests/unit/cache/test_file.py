@@ -16,7 +16,7 @@
 import os
 from unittest.mock import patch
 
-from testtools.matchers import EndsWith, Is
+from testtools.matchers import EndsWith, Equals, Is
 
 from snapcraft.file_utils import calculate_hash
 from snapcraft.internal import cache
@@ -82,3 +82,43 @@ class FileCacheTestCase(unit.TestCase):
                                          algorithm=self.algo,
                                          hash=calculated_hash)
         self.assertThat(file, Is(None))
+
+
+class FileCacheDownloadTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.file_cache = cache.FileCache()
+        with open('download', 'w') as f:
+            f.write('random stub data')
+
+    def test_cache_and_retrieve_download(self):
+        url = 'http://example.com/file.tar'
+        file = self.file_cache.cache_download(
+            filename='download', url=url,
+            headers={'ETag': '"1"', 'Last-Modified': 'date'})
+
+        retrieved_file, headers = self.file_cache.get_download(url=url)
+        self.assertThat(retrieved_file, Equals(file))
+        self.assertThat(headers, Equals({
+            'If-None-Match': '"1"', 'If-Modified-Since': 'date'}))
+        with open(retrieved_file) as f:
+            self.assertThat(f.read(), Equals('random stub data'))
+
+    def test_get_download_other_url(self):
+        self.file_cache.cache_download(
+            filename='download', url='http://example.com/file.tar',
+            headers={'ETag': '"1"'})
+
+        self.assertThat(
+            self.file_cache.get_download(url='http://example.com/other'),
+            Equals((None, None)))
+
+    def test_download_without_validators_not_cached(self):
+        url = 'http://example.com/file.tar'
+        file = self.file_cache.cache_download(
+            filename='download', url=url, headers={})
+
+        self.assertThat(file, Is(None))
+        self.assertThat(self.file_cache.get_download(url=url),
+                        Equals((None, None)))
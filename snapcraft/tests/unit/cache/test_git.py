@@ -0,0 +1,71 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+
+from testtools.matchers import Equals, Is
+
+from snapcraft.internal import cache
+from snapcraft.tests import unit
+from snapcraft.tests.subprocess_utils import call, call_with_output
+
+
+class GitCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.git_cache = cache.GitCache()
+
+        self.repo = os.path.abspath('repo')
+        call(['git', 'init', self.repo])
+        call(['git', '-C', self.repo, 'config', 'user.name', 'Example Dev'])
+        call(['git', '-C', self.repo, 'config', 'user.email',
+              'dev@example.com'])
+        self.head = self.commit()
+
+    def commit(self):
+        call(['git', '-C', self.repo, 'commit', '--allow-empty', '-m',
+              'commit'])
+        return call_with_output(['git', '-C', self.repo, 'rev-parse', 'HEAD'])
+
+    def mirror_head(self, mirror_path):
+        return call_with_output(
+            ['git', '-C', mirror_path, 'rev-parse', 'HEAD'])
+
+    def test_mirror(self):
+        mirror_path = self.git_cache.mirror(self.repo)
+
+        self.assertThat(mirror_path,
+                        Equals(self.git_cache.get_mirror_path(self.repo)))
+        self.assertThat(self.mirror_head(mirror_path), Equals(self.head))
+
+    def test_mirror_is_updated(self):
+        mirror_path = self.git_cache.mirror(self.repo)
+        commit = self.commit()
+
+        self.assertThat(self.git_cache.mirror(self.repo), Equals(mirror_path))
+        self.assertThat(self.mirror_head(mirror_path), Equals(commit))
+
+    def test_mirror_failure(self):
+        source = os.path.abspath('missing')
+
+        self.assertThat(
+            self.git_cache.mirror(source, call_kwargs=dict(
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)),
+            Is(None))
+        self.assertFalse(
+            os.path.exists(self.git_cache.get_mirror_path(source)))
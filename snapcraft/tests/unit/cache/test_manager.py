@@ -0,0 +1,119 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import fixtures
+from testtools.matchers import DirExists, Equals, FileExists, Not
+
+from snapcraft.internal import cache, errors
+from snapcraft.tests import unit
+
+
+class CacheManagerTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = cache.CacheManager()
+
+    def make_entry(self, path, size, last_used):
+        path = os.path.join(self.manager.cache_root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        os.utime(path, (last_used, last_used))
+        return path
+
+    def test_stats(self):
+        self.make_entry(os.path.join('files', 'sha256', 'a'), 10, 1)
+        self.make_entry(os.path.join('files', 'sha256', 'b'), 20, 1)
+        self.make_entry(os.path.join('sonames', 'c'), 5, 1)
+
+        self.assertThat(self.manager.stats(), Equals({
+            'files': (2, 30),
+            'git': (0, 0),
+            'snaps': (0, 0),
+            'sonames': (1, 5),
+            'stage-packages': (0, 0),
+        }))
+
+    def test_prune_evicts_least_recently_used(self):
+        old = self.make_entry(os.path.join('files', 'sha256', 'old'), 10, 1)
+        used = self.make_entry(os.path.join('files', 'sha256', 'used'), 10, 2)
+        new = self.make_entry(os.path.join('sonames', 'new'), 10, 3)
+        cache.CacheManager().mark_used(used)
+
+        pruned = self.manager.prune(max_size=15)
+
+        self.assertThat(pruned, Equals([old, new]))
+        self.assertThat(used, FileExists())
+
+    def test_prune_evicts_unused_apt_caches_after_their_entries(self):
+        apt_dir = os.path.join('stage-packages', 'apt', 'digest')
+        deb = self.make_entry(os.path.join(
+            apt_dir, 'var', 'cache', 'apt', 'archives', 'foo.deb'), 10, 2)
+        self.make_entry(os.path.join(
+            apt_dir, 'var', 'lib', 'apt', 'lists', 'list'), 10, 1)
+        apt_dir = os.path.join(self.manager.cache_root, apt_dir)
+        os.utime(apt_dir, (3, 3))
+
+        self.assertThat(self.manager.stats()['stage-packages'],
+                        Equals((2, 20)))
+
+        self.assertThat(self.manager.prune(max_size=10), Equals([deb]))
+        self.assertThat(apt_dir, DirExists())
+        self.assertThat(self.manager.prune(max_size=0), Equals([apt_dir]))
+        self.assertThat(apt_dir, Not(DirExists()))
+
+    def test_prune_keeps_apt_caches_with_recently_used_entries(self):
+        apt_dir = os.path.join('stage-packages', 'apt', 'digest')
+        deb = self.make_entry(os.path.join(
+            apt_dir, 'var', 'cache', 'apt', 'archives', 'foo.deb'), 10, 3)
+        self.make_entry(os.path.join(
+            apt_dir, 'var', 'lib', 'apt', 'lists', 'list'), 10, 1)
+        old = self.make_entry(os.path.join('sonames', 'old'), 10, 2)
+        apt_dir = os.path.join(self.manager.cache_root, apt_dir)
+        os.utime(apt_dir, (1, 1))
+
+        self.assertThat(self.manager.prune(max_size=20), Equals([old]))
+        self.assertThat(deb, FileExists())
+
+    def test_access_time_is_not_taken_as_use(self):
+        old = self.make_entry(os.path.join('files', 'sha256', 'old'), 10, 1)
+        new = self.make_entry(os.path.join('files', 'sha256', 'new'), 10, 2)
+        os.utime(old, (3, 1))
+
+        self.assertThat(self.manager.prune(max_size=10), Equals([old]))
+        self.assertThat(new, FileExists())
+
+
+class ParseSizeTestCase(unit.TestCase):
+
+    def test_parse_size(self):
+        self.assertThat(cache.parse_size('100'), Equals(100))
+        self.assertThat(cache.parse_size('2k'), Equals(2048))
+        self.assertThat(cache.parse_size('10G'), Equals(10 * 2**30))
+
+    def test_parse_invalid_size(self):
+        self.assertRaises(errors.InvalidCacheSizeError,
+                          cache.parse_size, '10 gigs')
+
+    def test_get_max_size(self):
+        self.assertThat(cache.get_max_size(), Equals(None))
+
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_CACHE_MAX_SIZE', '1M'))
+        self.assertThat(cache.get_max_size(), Equals(2**20))
@@ -0,0 +1,73 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Equals, Is
+
+from snapcraft.internal import cache
+from snapcraft.tests import unit
+
+
+class SonameCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.soname_cache = cache.SonameCache()
+
+        os.makedirs(os.path.join('core', '10'))
+        os.symlink('10', os.path.join('core', 'current'))
+
+    def test_get_nothing_cached(self):
+        self.assertThat(
+            self.soname_cache.get(base_path=os.path.join('core', 'current')),
+            Is(None))
+
+    def test_cache_and_retrieve(self):
+        index = {'foo.so.1': ['/lib/foo.so.1']}
+        self.soname_cache.cache(
+            base_path=os.path.join('core', 'current'), index=index)
+
+        self.assertThat(
+            self.soname_cache.get(base_path=os.path.join('core', '10')),
+            Equals(index))
+
+    def test_new_revision_is_not_cached(self):
+        self.soname_cache.cache(
+            base_path=os.path.join('core', 'current'), index={})
+
+        os.makedirs(os.path.join('core', '11'))
+        os.remove(os.path.join('core', 'current'))
+        os.symlink('11', os.path.join('core', 'current'))
+
+        self.assertThat(
+            self.soname_cache.get(base_path=os.path.join('core', 'current')),
+            Is(None))
+
+    def test_replaced_unsquashed_core_is_not_cached(self):
+        meta_path = os.path.join('core', '10', 'meta')
+        os.makedirs(meta_path)
+        with open(os.path.join(meta_path, 'snap.yaml'), 'w') as snap_yaml:
+            snap_yaml.write('name: core\nversion: 16-2.30\n')
+        self.soname_cache.cache(
+            base_path=os.path.join('core', 'current'), index={})
+
+        with open(os.path.join(meta_path, 'snap.yaml'), 'w') as snap_yaml:
+            snap_yaml.write('name: core\nversion: 16-2.31\n')
+
+        self.assertThat(
+            self.soname_cache.get(base_path=os.path.join('core', 'current')),
+            Is(None))
@@ -0,0 +1,86 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import importlib
+import os
+import pkgutil
+import subprocess
+import sys
+
+import click
+from testtools.matchers import Equals
+
+import snapcraft.cli
+from snapcraft.tests import unit
+
+
+class CommandGroupsTestCase(unit.TestCase):
+
+    def test_command_groups_list_their_commands(self):
+        for module_name, (group_name, commands) in (
+                snapcraft.cli._COMMAND_GROUPS.items()):
+            module = importlib.import_module(
+                'snapcraft.cli.{}'.format(module_name))
+            command_group = getattr(module, group_name)
+            self.assertThat(sorted(command_group.commands),
+                            Equals(sorted(commands)),
+                            message=module_name)
+
+    def test_every_command_group_is_listed(self):
+        group_modules = set()
+        for _, module_name, _ in pkgutil.iter_modules(
+                snapcraft.cli.__path__):
+            # Private modules, such as __main__, do not provide commands.
+            if module_name.startswith('_'):
+                continue
+            module = importlib.import_module(
+                'snapcraft.cli.{}'.format(module_name))
+            if any(isinstance(attr, click.Group)
+                   for attr in vars(module).values()):
+                group_modules.add(module_name)
+
+        self.assertThat(group_modules,
+                        Equals(set(snapcraft.cli._COMMAND_GROUPS)))
+
+    def test_commands_belong_to_a_single_group(self):
+        commands = [command
+                    for _, group_commands in (
+                        snapcraft.cli._COMMAND_GROUPS.values())
+                    for command in group_commands]
+
+        self.assertThat(len(snapcraft.cli._COMMAND_MODULES),
+                        Equals(len(commands)))
+
+    def test_command_groups_are_not_imported_on_startup(self):
+        # Importing from scratch, as the test suite has loaded them all.
+        source_path = os.path.dirname(os.path.dirname(snapcraft.__file__))
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(
+            p for p in (source_path, env.get('PYTHONPATH')) if p)
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, snapcraft.cli; print("\\n".join(sys.modules))'],
+            env=env)
+        modules = output.decode().splitlines()
+
+        lazy_modules = ['snapcraft.cli.{}'.format(m)
+                        for m in snapcraft.cli._COMMAND_GROUPS]
+        lazy_modules += ['snapcraft.internal.lifecycle',
+                         'snapcraft.internal.lxd',
+                         'snapcraft.internal.pluginhandler',
+                         'snapcraft.internal.project_loader']
+        self.assertThat(
+            [m for m in lazy_modules if m in modules], Equals([]))
@@ -0,0 +1,65 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import fixtures
+from testtools.matchers import Contains, Equals, FileExists, Not
+
+from snapcraft.internal import cache
+from . import CommandBaseTestCase
+
+
+class CacheCommandTestCase(CommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_root = cache.CacheManager().cache_root
+        self.cached_file = os.path.join(
+            self.cache_root, 'files', 'sha256', 'hash')
+        os.makedirs(os.path.dirname(self.cached_file))
+        with open(self.cached_file, 'wb') as f:
+            f.write(b'x' * 2048)
+
+    def test_stats(self):
+        result = self.run_command(['cache', 'stats'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('files'))
+        self.assertThat(result.output, Contains('2.0 KiB'))
+
+    def test_prune(self):
+        result = self.run_command(['cache', 'prune'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('Pruned 1 cache entries.'))
+        self.assertThat(self.cached_file, Not(FileExists()))
+
+    def test_prune_to_max_size(self):
+        result = self.run_command(['cache', 'prune', '--max-size', '4K'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('Pruned 0 cache entries.'))
+        self.assertThat(self.cached_file, FileExists())
+
+    def test_prune_to_configured_max_size(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_CACHE_MAX_SIZE', '4K'))
+
+        result = self.run_command(['cache', 'prune'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(self.cached_file, FileExists())
@@ -74,6 +74,12 @@ parts:
                 handler.stage()
                 handler.prime()
 
+                # What the part memoizes alongside its state.
+                for memo in ('source-index', 'elf-dependencies',
+                             'stage-digests'):
+                    open(os.path.join(
+                        handler.plugin.statedir, memo), 'w').close()
+
         return parts
 
     def test_part_to_remove_not_defined_exits_with_error(self):
@@ -0,0 +1,78 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017-2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from unittest import mock
+
+from testtools.matchers import Equals
+
+from snapcraft.internal.pluginhandler._fileset_matcher import FilesetMatcher
+from snapcraft.tests import unit
+
+
+class FilesetMatcherTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs(os.path.join('install', 'usr', 'lib', 'foo'))
+        os.makedirs(os.path.join('install', '.hidden'))
+        for path in ('1', '.2', os.path.join('usr', 'lib', 'libfoo.so'),
+                     os.path.join('usr', 'lib', 'libfoo.a'),
+                     os.path.join('usr', 'lib', 'foo', '.3'),
+                     os.path.join('.hidden', 'libbar.so')):
+            open(os.path.join('install', path), 'w').close()
+        os.symlink('lib', os.path.join('install', 'usr', 'lib64'))
+
+        self.matcher = FilesetMatcher('install')
+
+    def test_glob(self):
+        self.assertThat(self.matcher.glob('*'), Equals({'1', 'usr'}))
+        self.assertThat(self.matcher.glob('.*'), Equals({'.2', '.hidden'}))
+        self.assertThat(self.matcher.glob('**/*.so'), Equals({
+            'usr/lib/libfoo.so', 'usr/lib64/libfoo.so'}))
+        self.assertThat(self.matcher.glob('usr/lib64/*.a'), Equals({
+            'usr/lib64/libfoo.a'}))
+        self.assertThat(self.matcher.glob('usr/*/foo'), Equals({
+            'usr/lib/foo', 'usr/lib64/foo'}))
+        self.assertThat(self.matcher.glob('nonexistent/*'), Equals(set()))
+
+    def test_include_set_expands_directories(self):
+        self.assertThat(self.matcher.include_set(['usr']), Equals({
+            'usr', 'usr/lib', 'usr/lib64', 'usr/lib/foo', 'usr/lib/foo/.3',
+            'usr/lib/libfoo.so', 'usr/lib/libfoo.a'}))
+
+    def test_include_set_literal_paths(self):
+        self.assertThat(self.matcher.include_set(['nonexistent', './1']),
+                        Equals({'nonexistent', '1'}))
+
+    def test_exclude_set(self):
+        self.assertThat(self.matcher.exclude_set(['usr/lib', '*.a']), Equals(
+            ({'usr/lib'}, {'usr/lib'})))
+
+    def test_directories_are_listed_once(self):
+        with mock.patch('os.scandir', wraps=os.scandir) as scandir_mock:
+            self.matcher.include_set(['*', 'usr/lib/*'])
+            self.matcher.exclude_set(['**/*.a', 'usr/*/foo'])
+
+        listed = [c[0][0] for c in scandir_mock.call_args_list]
+        self.assertThat(sorted(listed), Equals(sorted(set(listed))))
+
+    def test_symlink_loops_terminate(self):
+        os.symlink('..', os.path.join('install', 'usr', 'lib', 'loop'))
+
+        self.assertThat(self.matcher.glob('usr/**/*.so'), Equals({
+            'usr/lib/libfoo.so', 'usr/lib64/libfoo.so'}))
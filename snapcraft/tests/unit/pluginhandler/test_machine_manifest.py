@@ -0,0 +1,105 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from unittest import mock
+
+from testtools.matchers import Equals
+
+from snapcraft.internal.pluginhandler import _machine_manifest
+from snapcraft.tests import unit
+
+
+class MachineManifestTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        open('status', 'w').close()
+        patcher = mock.patch.object(
+            _machine_manifest, '_DPKG_STATUS', 'status')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.makedirs(os.path.join('snap', 'core', '1'))
+        os.symlink('1', os.path.join('snap', 'core', 'current'))
+        patcher = mock.patch.object(
+            _machine_manifest, '_SNAP_MOUNT_DIR', 'snap')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('snapcraft.internal.common.run_output',
+                             return_value='Linux test uname')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch(
+            'snapcraft.internal.repo.Repo.get_installed_packages',
+            return_value=['foo=1.0'])
+        self.get_installed_packages = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch(
+            'snapcraft.internal.repo.snaps.get_installed_snaps',
+            return_value=['core=1'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_manifest_is_reused(self):
+        expected = {
+            'uname': 'Linux test uname',
+            'installed-packages': ['foo=1.0'],
+            'installed-snaps': ['core=1'],
+        }
+
+        self.assertThat(
+            _machine_manifest.get_machine_manifest(), Equals(expected))
+        self.assertThat(
+            _machine_manifest.get_machine_manifest(), Equals(expected))
+        self.get_installed_packages.assert_called_once_with()
+
+    def test_manifest_is_recomputed_when_packages_change(self):
+        _machine_manifest.get_machine_manifest()
+        os.utime('status', (1, 1))
+        self.get_installed_packages.return_value = ['foo=2.0']
+
+        self.assertThat(
+            _machine_manifest.get_machine_manifest()['installed-packages'],
+            Equals(['foo=2.0']))
+
+    def test_manifest_is_recomputed_when_snaps_change(self):
+        _machine_manifest.get_machine_manifest()
+        os.remove(os.path.join('snap', 'core', 'current'))
+        os.symlink('2', os.path.join('snap', 'core', 'current'))
+
+        _machine_manifest.get_machine_manifest()
+
+        self.assertThat(self.get_installed_packages.call_count, Equals(2))
+
+    def test_reset(self):
+        _machine_manifest.get_machine_manifest()
+        _machine_manifest.reset_machine_manifest()
+        _machine_manifest.get_machine_manifest()
+
+        self.assertThat(self.get_installed_packages.call_count, Equals(2))
+
+    def test_manifest_changes_do_not_leak(self):
+        _machine_manifest.get_machine_manifest()['installed-snaps'].append(
+            'other=2')
+
+        self.assertThat(
+            _machine_manifest.get_machine_manifest()['installed-snaps'],
+            Equals(['core=1']))
@@ -20,10 +20,14 @@ import sys
 from unittest.mock import patch
 
 import fixtures
-from testtools.matchers import Equals
+from testtools.matchers import Equals, IsInstance
 
 import snapcraft
-from snapcraft.internal import errors
+from snapcraft.internal import (
+    errors,
+    pluginhandler,
+    project_loader
+)
 from snapcraft.tests import (
     fixture_setup,
     unit
@@ -221,3 +225,81 @@ class PluginLoaderTestCase(unit.TestCase):
 
         self.assertThat(raised.plugin_name, Equals('plugin'))
         self.assertThat(raised.properties, Equals(['bar']))
+
+    def test_plugin_schema_is_shared_between_parts(self):
+        class Plugin(snapcraft.BasePlugin):
+            @classmethod
+            def schema(cls):
+                schema = super().schema()
+                schema['properties']['foo'] = {
+                    'type': 'string',
+                }
+                return schema
+
+        self.useFixture(fixture_setup.FakePlugin('plugin', Plugin))
+        validator = project_loader.Validator()
+        project_options = snapcraft.ProjectOptions()
+
+        def load_plugin(part_name, foo):
+            return pluginhandler.load_plugin(
+                plugin_name='plugin',
+                part_name=part_name,
+                project_options=project_options,
+                properties={'plugin': 'plugin', 'foo': foo},
+                part_schema=validator.part_schema,
+                definitions_schema=validator.definitions_schema)
+
+        with patch.object(Plugin, 'schema',
+                          wraps=Plugin.schema) as mock_schema:
+            plugin1 = load_plugin('part1', 'bar')
+            schema_calls = mock_schema.call_count
+            plugin2 = load_plugin('part2', 'baz')
+
+        self.assertThat(mock_schema.call_count, Equals(schema_calls))
+        self.assertThat(plugin1.options.foo, Equals('bar'))
+        self.assertThat(plugin2.options.foo, Equals('baz'))
+
+    def test_plugin_option_defaults_are_not_shared(self):
+        class Plugin(snapcraft.BasePlugin):
+            @classmethod
+            def schema(cls):
+                schema = super().schema()
+                schema['properties']['foo'] = {
+                    'type': 'array',
+                    'default': [],
+                }
+                return schema
+
+        self.useFixture(fixture_setup.FakePlugin('plugin', Plugin))
+        validator = project_loader.Validator()
+        project_options = snapcraft.ProjectOptions()
+
+        def load_plugin(part_name):
+            return pluginhandler.load_plugin(
+                plugin_name='plugin',
+                part_name=part_name,
+                project_options=project_options,
+                properties={'plugin': 'plugin'},
+                part_schema=validator.part_schema,
+                definitions_schema=validator.definitions_schema)
+
+        plugin1 = load_plugin('part1')
+        plugin2 = load_plugin('part2')
+        plugin1.options.foo.append('bar')
+
+        self.assertThat(plugin2.options.foo, Equals([]))
+
+    def test_replaced_plugin_module_is_reloaded(self):
+        class Plugin(snapcraft.BasePlugin):
+            pass
+
+        class OtherPlugin(snapcraft.BasePlugin):
+            pass
+
+        with fixture_setup.FakePlugin('plugin', Plugin):
+            handler = self.load_part('fake-part', 'plugin')
+        self.assertThat(handler.plugin, IsInstance(Plugin))
+
+        with fixture_setup.FakePlugin('plugin', OtherPlugin):
+            handler = self.load_part('fake-part', 'plugin')
+        self.assertThat(handler.plugin, IsInstance(OtherPlugin))
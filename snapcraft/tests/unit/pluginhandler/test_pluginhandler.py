@@ -27,7 +27,13 @@ from unittest.mock import (
     patch,
 )
 
-from testtools.matchers import Contains, Equals, FileExists, Not
+from testtools.matchers import (
+    Contains,
+    Equals,
+    FileContains,
+    FileExists,
+    Not,
+)
 
 import snapcraft
 from . import mocks
@@ -347,6 +353,47 @@ class PluginTestCase(unit.TestCase):
             Equals(stat.S_IMODE(
                 os.stat(os.path.join('stage', 'foo', 'bar')).st_mode)))
 
+    def test_migrate_files_creates_directories_once(self):
+        os.makedirs(os.path.join('install', 'foo', 'bar'))
+        for name in ('1', '2', '3'):
+            open(os.path.join('install', 'foo', 'bar', name), 'w').close()
+
+        files, dirs = pluginhandler._migratable_filesets(['*'], 'install')
+        with patch('snapcraft.file_utils.create_similar_directory',
+                   wraps=snapcraft.file_utils.create_similar_directory
+                   ) as create_mock:
+            pluginhandler._migrate_files(files, dirs, 'install', 'stage')
+
+        self.assertThat(create_mock.call_args_list, Equals([
+            call(os.path.join('install', 'foo'),
+                 os.path.join('stage', 'foo')),
+            call(os.path.join('install', 'foo', 'bar'),
+                 os.path.join('stage', 'foo', 'bar'))]))
+        for name in ('1', '2', '3'):
+            self.assertThat(os.path.join('stage', 'foo', 'bar', name),
+                            FileExists())
+
+    def test_migrate_files_copies_when_linking_fails(self):
+        os.makedirs('install')
+        for name in ('foo', 'bar'):
+            with open(os.path.join('install', name), 'w') as f:
+                f.write(name)
+
+        fixup_mock = Mock()
+        files, dirs = pluginhandler._migratable_filesets(['*'], 'install')
+        with patch('os.link', side_effect=OSError):
+            pluginhandler._migrate_files(files, dirs, 'install', 'stage',
+                                         fixup_func=fixup_mock)
+
+        for name in ('foo', 'bar'):
+            self.assertThat(os.path.join('stage', name),
+                            FileContains(name))
+            self.assertThat(
+                os.stat(os.path.join('stage', name)).st_nlink, Equals(1))
+        fixup_mock.assert_has_calls([
+            call(os.path.join('stage', 'bar')),
+            call(os.path.join('stage', 'foo'))])
+
     def test_filesets_includes_without_relative_paths(self):
         raised = self.assertRaises(
             errors.PluginError,
@@ -2068,7 +2115,7 @@ class PerStepCleanTestCase(unit.TestCase):
         self.manager_mock.assert_has_calls([
             call.clean_prime({}, 'foo'),
             call.clean_stage({}, 'foo'),
-            call.clean_build('foo'),
+            call.clean_build('foo', keep_build_basedir=False),
             call.clean_pull('foo'),
         ])
 
@@ -2080,7 +2127,7 @@ class PerStepCleanTestCase(unit.TestCase):
         self.manager_mock.assert_has_calls([
             call.clean_prime({}, ''),
             call.clean_stage({}, ''),
-            call.clean_build(''),
+            call.clean_build('', keep_build_basedir=False),
             call.clean_pull(''),
         ])
 
@@ -2092,7 +2139,7 @@ class PerStepCleanTestCase(unit.TestCase):
         self.manager_mock.assert_has_calls([
             call.clean_prime({}, ''),
             call.clean_stage({}, ''),
-            call.clean_build(''),
+            call.clean_build('', keep_build_basedir=False),
         ])
 
     def test_clean_stage_order(self):
@@ -2203,6 +2250,55 @@ class CollisionTestCase(unit.TestCase):
         # a part not built doesn't have the stage file in the installdir.
         pluginhandler.check_for_collisions([part_built, part_not_built])
 
+    def test_no_collisions_with_hardlinks(self):
+        part5 = self.load_part('part5')
+        part5.plugin.installdir = os.path.join(self.path, 'install5')
+        os.makedirs(part5.installdir)
+        os.link(os.path.join(self.part2.installdir, '1'),
+                os.path.join(part5.installdir, '1'))
+
+        with patch('snapcraft.file_utils.calculate_hash') as mock_hash:
+            pluginhandler.check_for_collisions([self.part2, part5])
+        mock_hash.assert_not_called()
+
+    def test_collisions_by_size_do_not_hash(self):
+        with open(os.path.join(self.part3.installdir, '1'), 'w') as f:
+            f.write('22')
+
+        with patch('snapcraft.file_utils.calculate_hash') as mock_hash:
+            raised = self.assertRaises(
+                errors.SnapcraftPartConflictError,
+                pluginhandler.check_for_collisions,
+                [self.part2, self.part3])
+        mock_hash.assert_not_called()
+        self.assertThat(raised.file_paths, Equals('    1\n    a/2'))
+
+    def test_digests_are_cached_between_runs(self):
+        part5 = self.load_part('part5')
+        part5.plugin.installdir = os.path.join(self.path, 'install5')
+        os.makedirs(os.path.join(part5.installdir, 'a'))
+        with open(os.path.join(part5.installdir, '1'), 'w') as f:
+            f.write('1')
+        with open(os.path.join(part5.installdir, 'a', '2'), 'w') as f:
+            f.write('a/2')
+
+        pluginhandler.check_for_collisions([self.part2, part5])
+        self.assertThat(
+            os.path.join(part5.plugin.statedir, 'stage-digests'), FileExists())
+
+        with patch('snapcraft.file_utils.calculate_hash') as mock_hash:
+            pluginhandler.check_for_collisions([self.part2, part5])
+        mock_hash.assert_not_called()
+
+        # A file that changed is hashed again.
+        with open(os.path.join(part5.installdir, '1'), 'w') as f:
+            f.write('2')
+        raised = self.assertRaises(
+            errors.SnapcraftPartConflictError,
+            pluginhandler.check_for_collisions,
+            [self.part2, part5])
+        self.assertThat(raised.file_paths, Equals('    1'))
+
 
 class StagePackagesTestCase(unit.TestCase):
 
@@ -2400,3 +2496,63 @@ class CleanBuildTestCase(unit.TestCase):
 
         # Make sure the install directory is gone
         self.assertFalse(os.path.exists(handler.plugin.installdir))
+
+    def test_clean_build_keeps_incremental_build_directory(self):
+        handler = self.load_part('test-part', part_properties={
+            'build-attributes': ['incremental-build']})
+
+        handler.build()
+        open(os.path.join(handler.plugin.build_basedir, 'built'), 'w').close()
+        open(os.path.join(handler.plugin.installdir, 'installed'), 'w').close()
+
+        handler.clean_build(keep_build_basedir=True)
+
+        self.assertTrue(os.path.isfile(
+            os.path.join(handler.plugin.build_basedir, 'built')))
+        self.assertFalse(os.path.exists(handler.plugin.installdir))
+
+    def test_clean_build_removes_incremental_build_directory(self):
+        handler = self.load_part('test-part', part_properties={
+            'build-attributes': ['incremental-build']})
+
+        handler.build()
+
+        handler.clean_build()
+
+        self.assertFalse(os.path.exists(handler.plugin.build_basedir))
+
+
+class IncrementalBuildTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.handler = self.load_part('test-part', part_properties={
+            'build-attributes': ['incremental-build']})
+        os.makedirs(self.handler.plugin.sourcedir)
+        self.source_file = os.path.join(self.handler.plugin.sourcedir, 'file')
+        open(self.source_file, 'w').close()
+
+        self.handler.build()
+        self.build_file = os.path.join(
+            self.handler.plugin.build_basedir, 'file')
+        self.built_file = os.path.join(
+            self.handler.plugin.build_basedir, 'built')
+        open(self.built_file, 'w').close()
+        self.handler.clean_build(keep_build_basedir=True)
+
+    def test_build_keeps_build_results(self):
+        self.handler.build()
+
+        self.assertTrue(os.path.isfile(self.built_file))
+        self.assertThat(
+            os.stat(self.build_file).st_ino,
+            Equals(os.stat(self.source_file).st_ino))
+
+    def test_build_removes_deleted_sources(self):
+        os.remove(self.source_file)
+
+        self.handler.build()
+
+        self.assertTrue(os.path.isfile(self.built_file))
+        self.assertFalse(os.path.exists(self.build_file))
@@ -976,7 +976,8 @@ parts:
 
         self.assertThat(
             raised.message,
-            Equals('circular dependency chain found in parts definition'))
+            Equals('circular dependency chain found in parts definition: '
+                   'p1 -> p2 -> p1'))
 
 
 class YamlVCSBuildPackagesTestCase(YamlBaseTestCase):
@@ -1847,15 +1848,72 @@ parts:
                 '{stage_dir}/lib:'
                 '{stage_dir}/usr/lib:'
                 '{stage_dir}/lib/{arch_triplet}:'
-                '{stage_dir}/usr/lib/{arch_triplet}:'
-                '{stage_dir}/lib:'
-                '{stage_dir}/usr/lib:'
-                '{stage_dir}/lib/{arch_triplet}:'
                 '{stage_dir}/usr/lib/{arch_triplet}'.format(
                     parts_dir=self.parts_dir,
                     stage_dir=self.stage_dir,
                     arch_triplet=self.arch_triplet)))
 
+    def test_parts_build_env_for_shared_dependencies(self):
+        self.make_snapcraft_yaml("""name: test
+version: "1"
+summary: test
+description: test
+confinement: strict
+grade: stable
+
+parts:
+  base:
+    plugin: nil
+  left:
+    plugin: nil
+    after: [base]
+  right:
+    plugin: nil
+    after: [base]
+  top:
+    plugin: nil
+    after: [left, right]
+""")
+        config = _config.Config()
+        parts = {part.name: part for part in config.parts.all_parts}
+
+        with unittest.mock.patch.object(
+                parts['base'], 'env',
+                wraps=parts['base'].env) as mock_env:
+            env = config.parts.build_env_for_part(parts['top'])
+
+        mock_env.assert_called_once_with(self.stage_dir)
+        self.assertThat(len(env), Equals(len(set(env))))
+
+    def test_parts_build_env_keeps_the_last_repeated_entry(self):
+        self.make_snapcraft_yaml("""name: test
+version: "1"
+summary: test
+description: test
+confinement: strict
+grade: stable
+
+parts:
+  base:
+    plugin: nil
+  top:
+    plugin: nil
+    after: [base]
+""")
+        config = _config.Config()
+        parts = {part.name: part for part in config.parts.all_parts}
+
+        with unittest.mock.patch.object(
+                parts['top'], 'env',
+                return_value=['export FOO=base', 'export FOO=top']):
+            with unittest.mock.patch.object(
+                    parts['base'], 'env', return_value=['export FOO=base']):
+                env = config.parts.build_env_for_part(parts['top'])
+
+        self.assertThat(
+            [e for e in env if e.startswith('export FOO=')],
+            Equals(['export FOO=top', 'export FOO=base']))
+
     def test_parts_build_env_contains_parallel_build_count(self):
         self.useFixture(fixture_setup.FakeProjectOptions(
             parallel_build_count='fortytwo'))
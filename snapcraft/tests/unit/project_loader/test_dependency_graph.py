@@ -0,0 +1,100 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+
+from testtools.matchers import Equals, Is
+
+from snapcraft.internal.project_loader import errors
+from snapcraft.internal.project_loader._dependency_graph import (
+    DependencyGraph)
+from snapcraft.tests import unit
+
+_Part = collections.namedtuple('_Part', ['name'])
+
+
+def _make_graph(after_requests, names=None):
+    if names is None:
+        names = ['base', 'left', 'right', 'top']
+    return DependencyGraph([_Part(name) for name in names], after_requests)
+
+
+class DependencyGraphTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph = _make_graph({
+            'left': ['base'],
+            'right': ['base'],
+            'top': ['left', 'right'],
+        })
+
+    def test_sorted_parts(self):
+        self.assertThat(
+            [part.name for part in self.graph.sorted_parts],
+            Equals(['base', 'right', 'left', 'top']))
+
+    def test_sorted_parts_with_independent_parts(self):
+        graph = _make_graph({'a': ['c']}, names=['a', 'b', 'c'])
+
+        self.assertThat(
+            [part.name for part in graph.sorted_parts],
+            Equals(['c', 'b', 'a']))
+
+    def test_get_part(self):
+        self.assertThat(self.graph.get_part('left').name, Equals('left'))
+        self.assertThat(self.graph.get_part('missing'), Is(None))
+
+    def test_prereqs_and_dependents(self):
+        self.assertThat(self.graph.get_prereqs('top'),
+                        Equals({'left', 'right'}))
+        self.assertThat(self.graph.get_dependents('base'),
+                        Equals({'left', 'right'}))
+        self.assertThat(self.graph.get_dependents('top'), Equals(set()))
+
+    def test_ancestors_and_descendants(self):
+        self.assertThat(self.graph.get_ancestors('top'),
+                        Equals({'base', 'left', 'right'}))
+        self.assertThat(self.graph.get_descendants('base'),
+                        Equals({'left', 'right', 'top'}))
+        self.assertThat(self.graph.get_descendants('missing'),
+                        Equals(set()))
+
+    def test_returned_sets_are_copies(self):
+        self.graph.get_descendants('base').add('other')
+
+        self.assertThat(self.graph.get_descendants('base'),
+                        Equals({'left', 'right', 'top'}))
+
+    def test_unknown_prereqs_are_not_walked(self):
+        graph = _make_graph({'base': ['remote']})
+
+        self.assertThat(graph.get_prereqs('base'), Equals({'remote'}))
+        self.assertThat(graph.get_dependents('remote'), Equals({'base'}))
+        self.assertThat(graph.get_ancestors('base'), Equals(set()))
+
+    def test_cycle_is_reported(self):
+        raised = self.assertRaises(
+            errors.SnapcraftLogicError, _make_graph, {
+                'base': ['top'],
+                'left': ['base'],
+                'top': ['left'],
+            })
+
+        self.assertThat(
+            raised.message,
+            Equals('circular dependency chain found in parts definition: '
+                   'base -> top -> left -> base'))
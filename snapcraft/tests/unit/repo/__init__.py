@@ -19,6 +19,7 @@ import tempfile
 
 import fixtures
 
+from snapcraft.internal.repo import _deb
 from snapcraft.tests import unit
 
 
@@ -31,3 +32,4 @@ class RepoBaseTestCase(unit.TestCase):
         tempdirObj = tempfile.TemporaryDirectory()
         self.addCleanup(tempdirObj.cleanup)
         self.tempdir = tempdirObj.name
+        self.addCleanup(_deb._sessions.clear)
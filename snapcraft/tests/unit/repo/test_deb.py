@@ -14,13 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import os
+import stat
+import tarfile
 from subprocess import CalledProcessError
 from unittest.mock import ANY, call, patch, MagicMock
 
+import fixtures
+
 from testtools.matchers import (
     Contains,
     Equals,
+    FileContains,
     FileExists,
 )
 
@@ -42,16 +48,27 @@ class UbuntuTestCase(RepoBaseTestCase):
         self.mock_cache = patcher.start()
         self.addCleanup(patcher.stop)
 
-        def _fetch_binary(download_dir, **kwargs):
-            path = os.path.join(download_dir, 'fake-package.deb')
-            open(path, 'w').close()
-            return path
-
         self.mock_package = MagicMock()
-        self.mock_package.candidate.fetch_binary.side_effect = _fetch_binary
+        self.mock_package.candidate.filename = (
+            'pool/main/f/fake-package/fake-package.deb')
+        self.mock_package.candidate.uri = (
+            'http://archive.ubuntu.com/ubuntu/'
+            'pool/main/f/fake-package/fake-package.deb')
+        self.mock_package.candidate.size = 0
+        self.mock_package.candidate.sha256 = (
+            'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
         self.mock_cache.return_value.get_changes.return_value = [
             self.mock_package]
 
+    def fake_fetcher(self, mock_apt_pkg):
+        def _acquire_file(fetcher, uri, **kwargs):
+            open(kwargs['destfile'], 'w').close()
+            item = MagicMock()
+            item.status = item.STAT_DONE
+            return item
+
+        mock_apt_pkg.AcquireFile.side_effect = _acquire_file
+
     def test_get_pkg_name_parts_name_only(self):
         name, version = repo.get_pkg_name_parts('hello')
         self.assertThat(name, Equals('hello'))
@@ -70,6 +87,7 @@ class UbuntuTestCase(RepoBaseTestCase):
     @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
     def test_get_package(self, mock_apt_pkg):
         self.mock_cache().is_virtual_package.return_value = False
+        self.fake_fetcher(mock_apt_pkg)
 
         project_options = snapcraft.ProjectOptions(
             use_geoip=False)
@@ -96,9 +114,12 @@ class UbuntuTestCase(RepoBaseTestCase):
             self.mock_cache.return_value.__getitem__.call_args_list,
             Contains(call('fake-package')))
 
-        self.mock_package.assert_has_calls([
-            call.candidate.fetch_binary(ANY, progress=ANY)
-        ])
+        mock_apt_pkg.AcquireFile.assert_called_once_with(
+            mock_apt_pkg.Acquire.return_value,
+            self.mock_package.candidate.uri,
+            hash='SHA256:{}'.format(self.mock_package.candidate.sha256),
+            size=0, descr='fake-package.deb', destfile=ANY)
+        mock_apt_pkg.Acquire.return_value.run.assert_called_once_with()
 
         # Verify that the package was actually fetched and copied into the
         # requested location.
@@ -109,6 +130,7 @@ class UbuntuTestCase(RepoBaseTestCase):
     @patch('snapcraft.repo._deb.apt.apt_pkg')
     def test_get_multiarch_package(self, mock_apt_pkg):
         self.mock_cache().is_virtual_package.return_value = False
+        self.fake_fetcher(mock_apt_pkg)
 
         project_options = snapcraft.ProjectOptions(
             use_geoip=False)
@@ -134,9 +156,12 @@ class UbuntuTestCase(RepoBaseTestCase):
             self.mock_cache.return_value.__getitem__.call_args_list,
             Contains(call('fake-package:arch')))
 
-        self.mock_package.assert_has_calls([
-            call.candidate.fetch_binary(ANY, progress=ANY)
-        ])
+        mock_apt_pkg.AcquireFile.assert_called_once_with(
+            mock_apt_pkg.Acquire.return_value,
+            self.mock_package.candidate.uri,
+            hash='SHA256:{}'.format(self.mock_package.candidate.sha256),
+            size=0, descr='fake-package.deb', destfile=ANY)
+        mock_apt_pkg.Acquire.return_value.run.assert_called_once_with()
 
         # Verify that the package was actually fetched and copied into the
         # requested location.
@@ -144,6 +169,107 @@ class UbuntuTestCase(RepoBaseTestCase):
             os.path.join(self.tempdir, 'download', 'fake-package.deb'),
             FileExists())
 
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_apt_cache_is_shared_across_repos(self, mock_apt_pkg):
+        self.mock_cache().is_virtual_package.return_value = False
+        self.mock_cache.reset_mock()
+        self.fake_fetcher(mock_apt_pkg)
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu1 = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu2 = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu1.is_valid('fake-package')
+        ubuntu2.is_valid('fake-package')
+        ubuntu2.get(['fake-package'])
+
+        self.mock_cache.assert_called_once_with(memonly=True, rootdir=ANY)
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(1))
+        self.assertThat(
+            self.mock_cache.return_value.open.call_count, Equals(1))
+        self.mock_cache.return_value.close.assert_not_called()
+
+        del ubuntu1, ubuntu2
+        self.mock_cache.return_value.close.assert_called_once_with()
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_lists_are_updated_once_per_run(self, mock_apt_pkg):
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        for _ in range(2):
+            ubuntu = repo.Ubuntu(
+                self.tempdir, project_options=project_options)
+            ubuntu.is_valid('fake-package')
+            del ubuntu
+
+        self.assertThat(self.mock_cache.call_count, Equals(2))
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(1))
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_lists_are_updated_again_in_a_new_run(self, mock_apt_pkg):
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.is_valid('fake-package')
+        del ubuntu
+        self.useFixture(fixtures.MockPatch(
+            'snapcraft.internal.repo._deb._RUN_ID', 'next-run'))
+
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.is_valid('fake-package')
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_lists_are_not_updated_within_ttl(self, mock_apt_pkg):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_APT_LISTS_TTL', '3600'))
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.is_valid('fake-package')
+        del ubuntu
+        self.useFixture(fixtures.MockPatch(
+            'snapcraft.internal.repo._deb._RUN_ID', 'next-run'))
+
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.is_valid('fake-package')
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(1))
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_get_reuses_cached_package(self, mock_apt_pkg):
+        self.mock_cache().is_virtual_package.return_value = False
+        self.fake_fetcher(mock_apt_pkg)
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.get(['fake-package'])
+        ubuntu.get(['fake-package'])
+
+        self.assertThat(mock_apt_pkg.AcquireFile.call_count, Equals(1))
+        self.assertThat(
+            mock_apt_pkg.Acquire.return_value.run.call_count, Equals(1))
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_get_package_fetch_error(self, mock_apt_pkg):
+        self.mock_cache().is_virtual_package.return_value = False
+        mock_apt_pkg.AcquireFile.return_value.error_text = 'hash mismatch'
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+
+        raised = self.assertRaises(
+            errors.PackageFetchError, ubuntu.get, ['fake-package'])
+        self.assertThat(str(raised), Equals(
+            'Package fetch error: hash mismatch'))
+
     @patch('snapcraft.repo._deb._get_geoip_country_code_prefix')
     def test_sources_is_none_uses_default(self, mock_cc):
         mock_cc.return_value = 'ar'
@@ -246,6 +372,109 @@ class UbuntuTestCaseWithFakeAptCache(RepoBaseTestCase):
             Equals(['test-installed-package=test-installed-package-version']))
 
 
+class UnpackTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(fixture_setup.FakeAptCache())
+
+        patcher = patch('debian.arfile.ArFile')
+        self.mock_ar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('snapcraft.repo._deb.Ubuntu.get_package_libraries',
+                        return_value=set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ubuntu = repo.Ubuntu(
+            self.tempdir,
+            project_options=snapcraft.ProjectOptions(use_geoip=False))
+        os.makedirs(os.path.join(self.tempdir, 'download'))
+        open(os.path.join(
+            self.tempdir, 'download', 'fake-package.deb'), 'w').close()
+        self.unpackdir = os.path.join(self.tempdir, 'unpack')
+
+    def make_data_tar(self):
+        contents = os.path.join(self.tempdir, 'contents')
+        os.makedirs(os.path.join(contents, 'usr', 'bin'))
+        os.makedirs(os.path.join(contents, 'usr', 'lib', 'pkgconfig'))
+        with open(os.path.join(
+                contents, 'usr', 'lib', 'pkgconfig', 'foo.pc'), 'w') as f:
+            f.write('prefix=/usr\n')
+        open(os.path.join(contents, 'usr', 'bin', 'suid'), 'w').close()
+        os.chmod(os.path.join(contents, 'usr', 'bin', 'suid'), 0o4755)
+        os.symlink('/usr/bin/suid', os.path.join(contents, 'usr', 'bin',
+                                                 'link'))
+
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w:xz') as tar:
+            tar.add(contents, arcname='.')
+        data.seek(0)
+        return data
+
+    def test_unpack_fixes_artifacts_while_extracting(self):
+        self.mock_ar.return_value.getnames.return_value = [
+            'debian-binary', 'control.tar.gz', 'data.tar.xz']
+        self.mock_ar.return_value.getmember.return_value = (
+            self.make_data_tar())
+
+        self.ubuntu.unpack(self.unpackdir)
+
+        self.assertThat(
+            os.path.join(self.unpackdir, 'usr', 'lib', 'pkgconfig',
+                         'foo.pc'),
+            FileContains('prefix={}/usr\n'.format(self.unpackdir)))
+        self.assertThat(
+            stat.S_IMODE(os.stat(os.path.join(
+                self.unpackdir, 'usr', 'bin', 'suid')).st_mode),
+            Equals(0o755))
+        self.assertThat(
+            os.readlink(os.path.join(self.unpackdir, 'usr', 'bin', 'link')),
+            Equals('suid'))
+
+    def test_unpack_reuses_cached_tree(self):
+        self.mock_ar.return_value.getnames.return_value = [
+            'debian-binary', 'control.tar.gz', 'data.tar.xz']
+        self.mock_ar.return_value.getmember.return_value = (
+            self.make_data_tar())
+
+        self.ubuntu.unpack(self.unpackdir)
+        other_unpackdir = os.path.join(self.tempdir, 'other-unpack')
+        self.ubuntu.unpack(other_unpackdir)
+
+        self.mock_ar.assert_called_once_with(
+            os.path.join(self.tempdir, 'download', 'fake-package.deb'))
+        pc_path = os.path.join('usr', 'lib', 'pkgconfig', 'foo.pc')
+        self.assertThat(
+            os.path.join(other_unpackdir, pc_path),
+            FileContains('prefix={}/usr\n'.format(other_unpackdir)))
+        # The fixups must not leak into the cache.
+        self.assertThat(
+            os.path.join(self.unpackdir, pc_path),
+            FileContains('prefix={}/usr\n'.format(self.unpackdir)))
+
+    @patch('subprocess.check_call')
+    def test_unpack_unsupported_compression_uses_dpkg_deb(
+            self, mock_check_call):
+        self.mock_ar.return_value.getnames.return_value = [
+            'debian-binary', 'control.tar.zst', 'data.tar.zst']
+
+        self.ubuntu.unpack(self.unpackdir)
+
+        mock_check_call.assert_called_once_with([
+            'dpkg-deb', '--extract',
+            os.path.join(self.tempdir, 'download', 'fake-package.deb'),
+            ANY])
+
+    def test_unpack_invalid_deb(self):
+        self.mock_ar.return_value.getnames.return_value = [
+            'debian-binary', 'control.tar.gz']
+
+        self.assertRaises(errors.UnpackError, self.ubuntu.unpack,
+                          self.unpackdir)
+
+
 class BuildPackagesTestCase(unit.TestCase):
 
     def setUp(self):
@@ -80,9 +80,11 @@ class TestFileBase(unit.TestCase):
         file_src.pull()
 
         mock_requests.get.assert_called_once_with(
-            file_src.source, stream=True, allow_redirects=True)
+            file_src.source, stream=True, allow_redirects=True,
+            headers=None)
         mock_request.raise_for_status.assert_called_once_with()
-        mock_download.assert_called_once_with(mock_request, file_src.file)
+        mock_download.assert_called_once_with(
+            mock_request, file_src.file, algorithms=[])
 
     @mock.patch(
         'snapcraft.internal.sources._base.download_urllib_source')
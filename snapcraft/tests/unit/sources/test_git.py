@@ -40,6 +40,11 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
         self.mock_get_source_details.return_value = ""
         self.addCleanup(patcher.stop)
 
+        patcher = mock.patch('snapcraft.internal.cache.GitCache.mirror')
+        self.mock_mirror = patcher.start()
+        self.mock_mirror.return_value = None
+        self.addCleanup(patcher.stop)
+
     def test_pull(self):
         git = sources.Git('git://my-source', 'source_dir')
 
@@ -58,6 +63,25 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
             ['git', 'clone', '--recursive', '--depth', '2', 'git://my-source',
              'source_dir'])
 
+    def test_pull_with_mirror(self):
+        self.mock_mirror.return_value = 'mirror'
+        git = sources.Git('git://my-source', 'source_dir')
+
+        git.pull()
+
+        self.mock_mirror.assert_called_once_with(
+            'git://my-source', call_kwargs={})
+        self.mock_run.assert_called_once_with(
+            ['git', 'clone', '--recursive', '--reference', 'mirror',
+             '--dissociate', 'git://my-source', 'source_dir'])
+
+    def test_pull_with_depth_does_not_use_mirror(self):
+        git = sources.Git('git://my-source', 'source_dir', source_depth=2)
+
+        git.pull()
+
+        self.mock_mirror.assert_not_called()
+
     def test_pull_branch(self):
         git = sources.Git('git://my-source', 'source_dir',
                           source_branch='my-branch')
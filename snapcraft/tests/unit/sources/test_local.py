@@ -20,9 +20,11 @@ from unittest import mock
 from testtools.matchers import (
     DirExists,
     Equals,
-    FileExists
+    FileExists,
+    Not,
 )
 
+from snapcraft import file_utils
 from snapcraft.internal import common
 from snapcraft.internal import sources
 
@@ -167,10 +169,119 @@ class TestLocal(unit.TestCase):
             os.path.join('destination', 'dir', 'file_symlink'),
             unit.LinkExists('file'))
 
+    def test_pulling_again_only_updates_changed_entries(self):
+        os.makedirs(os.path.join('src', 'dir'))
+        open(os.path.join('src', 'dir', 'file'), 'w').close()
+        open(os.path.join('src', 'removed'), 'w').close()
+
+        local = sources.Local('src', 'destination')
+        local.pull()
+
+        os.remove(os.path.join('src', 'removed'))
+        open(os.path.join('src', 'dir', 'new'), 'w').close()
+
+        with mock.patch('snapcraft.file_utils.link_or_copy',
+                        wraps=file_utils.link_or_copy) as mock_link:
+            local.pull()
+
+        mock_link.assert_called_once_with(
+            os.path.join(os.path.abspath('src'), 'dir', 'new'),
+            os.path.join('destination', 'dir', 'new'))
+        self.assertThat(os.path.join('destination', 'removed'),
+                        Not(FileExists()))
+        self.assertThat(os.path.join('destination', 'dir', 'file'),
+                        FileExists())
+
+    def test_pulling_again_replaces_changed_files(self):
+        os.mkdir('src')
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('old')
+
+        local = sources.Local('src', 'destination')
+        local.pull()
+
+        # Editors usually write a new file in place of the old one.
+        os.remove(os.path.join('src', 'file'))
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('new')
+        local.pull()
+
+        with open(os.path.join('destination', 'file')) as f:
+            self.assertThat(f.read(), Equals('new'))
+
     def test_has_source_handler_entry(self):
         self.assertTrue(sources._source_handler['local'] is sources.Local)
 
 
+class TestLocalFingerprint(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs(os.path.join('src', 'dir'))
+        with open(os.path.join('src', 'dir', 'file'), 'w') as f:
+            f.write('content')
+        self.local = sources.Local('src', 'destination')
+        self.index_path = os.path.join('state', 'source-index')
+
+    def test_fingerprint_is_stable(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        self.assertThat(self.index_path, FileExists())
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Equals(fingerprint))
+
+    def test_fingerprint_ignores_touched_files(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        os.utime(os.path.join('src', 'dir', 'file'), (0, 0))
+
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Equals(fingerprint))
+
+    def test_fingerprint_changes_with_contents(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        with open(os.path.join('src', 'dir', 'file'), 'w') as f:
+            f.write('new content')
+
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Not(Equals(fingerprint)))
+
+    def test_fingerprint_changes_with_new_files(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        open(os.path.join('src', 'new-file'), 'w').close()
+
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Not(Equals(fingerprint)))
+
+    def test_fingerprint_changes_with_permissions(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        os.chmod(os.path.join('src', 'dir', 'file'), 0o755)
+
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Not(Equals(fingerprint)))
+
+    def test_fingerprint_ignores_snapcraft_files(self):
+        fingerprint = self.local.fingerprint(self.index_path)
+
+        os.makedirs(os.path.join('src', 'parts'))
+        open(os.path.join('src', 'test.snap'), 'w').close()
+
+        self.assertThat(
+            self.local.fingerprint(self.index_path), Equals(fingerprint))
+
+    def test_fingerprint_reuses_index(self):
+        self.local.fingerprint(self.index_path)
+
+        with mock.patch('snapcraft.file_utils.calculate_hash') as mock_hash:
+            self.local.fingerprint(self.index_path)
+
+        mock_hash.assert_not_called()
+
+
 class TestLocalIgnores(unit.TestCase):
     """Verify that the snapcraft root dir does not get copied into itself."""
 
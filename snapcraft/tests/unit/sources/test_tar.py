@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import subprocess
 import tarfile
 import fixtures
 from unittest import mock
@@ -22,7 +23,8 @@ from unittest import mock
 import requests
 from testtools.matchers import Equals
 
-from snapcraft.internal import sources
+from snapcraft.internal import cache, sources
+from snapcraft.internal.sources import errors
 from snapcraft.tests import unit
 
 
@@ -72,6 +74,35 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
             tar_source.pull()
             self.assertThat(download_spy.call_count, Equals(0))
 
+    @mock.patch('snapcraft.sources.Tar.provision')
+    def test_pull_twice_revalidates_download(self, mock_prov):
+        source = 'http://{}:{}/{file_name}'.format(
+            *self.server.server_address, file_name='test.tar')
+        tar_source = sources.Tar(source, self.path)
+
+        tar_source.pull()
+        with mock.patch(
+            'requests.get',
+                new=mock.Mock(wraps=requests.get)) as download_spy:
+            tar_source.pull()
+
+        self.assertThat(download_spy.call_args[1]['headers'],
+                        Equals({'If-None-Match': '"test-fake-file"'}))
+        with open(tar_source.file) as tar_file:
+            self.assertThat(tar_file.read(), Equals('Test fake file'))
+        # The download is copied from the cache.
+        self.assertThat(os.stat(tar_source.file).st_nlink, Equals(1))
+
+    def test_pull_with_wrong_checksum_is_not_cached(self):
+        source = 'http://{}:{}/{file_name}'.format(
+            *self.server.server_address, file_name='test.tar')
+        tar_source = sources.Tar(source, self.path,
+                                 source_checksum='sha384/wrong')
+
+        self.assertRaises(errors.DigestDoesNotMatchError, tar_source.pull)
+        self.assertThat(cache.FileCache().get_download(url=source),
+                        Equals((None, None)))
+
     def test_strip_common_prefix(self):
         # Create tar file for testing
         os.makedirs(os.path.join('src', 'test_prefix'))
@@ -148,5 +179,40 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
         self.assertTrue(os.path.exists(os.path.join('dst', 'test.txt')))
         self.assertTrue(os.path.exists(os.path.join('dst', 'link.txt')))
 
+    def test_extract_on_top_of_existing_files(self):
+        os.makedirs(os.path.join('src', 'test_prefix', 'dir'))
+        open(os.path.join('src', 'test_prefix', 'dir', 'new'), 'w').close()
+        with tarfile.open('test.tar', 'w') as tar:
+            tar.add(os.path.join('src', 'test_prefix'))
+        os.makedirs(os.path.join('dst', 'dir'))
+        open(os.path.join('dst', 'dir', 'existing'), 'w').close()
+
+        tar_source = sources.Tar('test.tar', 'dst')
+        tar_source.provision('dst', clean_target=False, keep_tarball=True,
+                             src='test.tar')
+
+        self.assertThat(sorted(os.listdir(os.path.join('dst', 'dir'))),
+                        Equals(['existing', 'new']))
+        self.assertThat(os.listdir('dst'), Equals(['dir']))
+
+    def test_extract_with_decompressor(self):
+        os.makedirs(os.path.join('src', 'test_prefix'))
+        open(os.path.join('src', 'test_prefix', 'test.txt'), 'w').close()
+        with tarfile.open('test.tar.gz', 'w:gz') as tar:
+            tar.add(os.path.join('src', 'test_prefix'))
+        os.mkdir('dst')
+
+        self.useFixture(fixtures.MockPatch(
+            'snapcraft.internal.sources._tar._DECOMPRESSORS',
+            [(b'\x1f\x8b', [['gzip', '-dc']])]))
+        with mock.patch('subprocess.Popen',
+                        wraps=subprocess.Popen) as mock_popen:
+            tar_source = sources.Tar('test.tar.gz', 'dst')
+            tar_source.provision('dst', keep_tarball=True,
+                                 src='test.tar.gz')
+
+        self.assertThat(mock_popen.call_args[0][0], Equals(['gzip', '-dc']))
+        self.assertThat(os.listdir('dst'), Equals(['test.txt']))
+
     def test_has_source_handler_entry(self):
         self.assertTrue(sources._source_handler['tar'] is sources.Tar)
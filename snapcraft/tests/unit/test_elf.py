@@ -16,6 +16,7 @@
 import fixtures
 import logging
 import os
+import struct
 import subprocess
 import sys
 import tempfile
@@ -28,6 +29,40 @@ from snapcraft.internal import errors, elf, os_release
 from snapcraft.tests import unit
 
 
+def _write_elf(path, *, e_type=2, segment_types=(3, 2)):
+    """Write a 64 bit little endian elf header with the given segments."""
+    header = b'\x7fELF\x02\x01\x01' + bytes(9) + struct.pack(
+        '<HHIQQQIHHHHHH', e_type, 62, 1, 0, 64, 0, 0, 64, 56,
+        len(segment_types), 64, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(header)
+        for segment_type in segment_types:
+            f.write(struct.pack('<I', segment_type) + bytes(52))
+
+
+def _write_elf_with_paths(path, *, interpreter, rpath):
+    """Write a loadable 64 bit elf with an interpreter and an rpath."""
+    interp = interpreter.encode() + b'\0'
+    strtab = b'\0' + rpath.encode() + b'\0'
+    interp_offset = 64 + 3 * 56
+    strtab_offset = interp_offset + len(interp)
+    dynamic_offset = strtab_offset + len(strtab)
+    dynamic = struct.pack('<qQqQqQ', 5, strtab_offset, 15, 1, 0, 0)
+    size = dynamic_offset + len(dynamic)
+
+    def segment(p_type, offset, filesz):
+        return struct.pack('<IIQQQQQQ', p_type, 0, offset, offset, offset,
+                           filesz, filesz, 0)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x7fELF\x02\x01\x01' + bytes(9) + struct.pack(
+            '<HHIQQQIHHHHHH', 2, 62, 1, 0, 64, 0, 0, 64, 56, 3, 64, 0, 0))
+        f.write(segment(3, interp_offset, len(interp)))
+        f.write(segment(1, 0, size))
+        f.write(segment(2, dynamic_offset, len(dynamic)))
+        f.write(interp + strtab + dynamic)
+
+
 class TestLdLibraryPathParser(unit.TestCase):
 
     def _write_conf_file(self, contents):
@@ -100,20 +135,7 @@ class TestGetLibraries(unit.TestCase):
 
     def test_primed_libraries_are_preferred(self):
         primed_foo = os.path.join(self.prime_dir, 'foo.so.1')
-        open(primed_foo, 'w').close()
-
-        self.ms_mock = mock.Mock()
-        self.ms_mock.load.return_value = 0
-        self.ms_mock.file.return_value = (
-            'ELF 64-bit LSB executable, x86-64, version 1 (SYSV), '
-            'dynamically linked interpreter /lib64/ld-linux-x86-64.so.2, '
-            'for GNU/Linux 2.6.32, BuildID[sha1]=XYZ, stripped'
-        )
-
-        patcher = mock.patch('magic.open')
-        self.magic_mock = patcher.start()
-        self.magic_mock.return_value = self.ms_mock
-        self.addCleanup(patcher.stop)
+        _write_elf(primed_foo, e_type=3, segment_types=[2])
 
         elf_file = elf.ElfFile(path='foo', magic=self.stub_magic)
         libs = elf_file.load_dependencies(root_path=self.prime_dir,
@@ -168,6 +190,129 @@ class TestGetLibraries(unit.TestCase):
             Equals("Unable to determine library dependencies for 'foo'\n"))
 
 
+class TestSonameIndex(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        patcher = mock.patch.dict('snapcraft.internal.elf._soname_indexes')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.core_base_path = os.path.join(self.path, 'core')
+        os.makedirs(os.path.join(self.core_base_path, 'lib'))
+        _write_elf(os.path.join(self.core_base_path, 'lib', 'foo.so.1'))
+        os.makedirs(self.prime_dir)
+
+    def _crawl_for_path(self, soname):
+        return elf._crawl_for_path(soname=soname, root_path=self.prime_dir,
+                                   core_base_path=self.core_base_path)
+
+    def test_primed_libraries_are_preferred(self):
+        _write_elf(os.path.join(self.prime_dir, 'foo.so.1'))
+
+        self.assertThat(self._crawl_for_path('foo.so.1'), Equals(
+            os.path.join(self.prime_dir, 'foo.so.1')))
+
+    def test_core_libraries(self):
+        self.assertThat(self._crawl_for_path('foo.so.1'), Equals(
+            os.path.join(self.core_base_path, 'lib', 'foo.so.1')))
+        self.assertThat(self._crawl_for_path('bar.so.1'), Equals(None))
+
+    def test_core_index_is_persisted(self):
+        self._crawl_for_path('foo.so.1')
+        elf._soname_indexes.clear()
+
+        with mock.patch('os.walk', return_value=[]) as walk_mock:
+            self.assertThat(self._crawl_for_path('foo.so.1'), Equals(
+                os.path.join(self.core_base_path, 'lib', 'foo.so.1')))
+        walk_mock.assert_called_once_with(self.prime_dir)
+
+
+class TestLoadDependencies(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        patcher = mock.patch('snapcraft.internal.common.run_output')
+        self.run_output_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.run_output_mock.side_effect = lambda cmd: (
+            '\t{0}.so.1 => /lib/{0}.so.1 (0xdead)\n'.format(
+                os.path.basename(cmd[1])))
+
+        patcher = mock.patch('snapcraft.internal.elf._get_system_libs')
+        self.get_system_libs_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.get_system_libs_mock.return_value = frozenset()
+
+        self.core_base_path = os.path.join(self.path, 'core')
+        os.makedirs(self.core_base_path)
+        os.makedirs(self.prime_dir)
+        self.cache_path = os.path.join(self.path, 'cache', 'elf-dependencies')
+
+        self.elf_paths = []
+        for name in ('foo', 'bar'):
+            path = os.path.join(self.prime_dir, name)
+            open(path, 'w').close()
+            self.elf_paths.append(path)
+
+    def _load_dependencies(self):
+        elf_files = [elf.ElfFile(path=p, magic='interpreter')
+                     for p in self.elf_paths]
+        with mock.patch('os.path.exists', return_value=True):
+            return elf.load_dependencies(
+                elf_files, root_path=self.prime_dir,
+                core_base_path=self.core_base_path,
+                cache_path=self.cache_path)
+
+    def test_load_dependencies(self):
+        self.assertThat(self._load_dependencies(), Equals(
+            {'/lib/foo.so.1', '/lib/bar.so.1'}))
+        self.assertThat(self.run_output_mock.call_count, Equals(2))
+
+    def test_ldd_output_is_cached(self):
+        self._load_dependencies()
+        self.run_output_mock.reset_mock()
+
+        self.assertThat(self._load_dependencies(), Equals(
+            {'/lib/foo.so.1', '/lib/bar.so.1'}))
+        self.run_output_mock.assert_not_called()
+
+    def test_changed_files_are_inspected_again(self):
+        self._load_dependencies()
+        self.run_output_mock.reset_mock()
+
+        with open(self.elf_paths[0], 'w') as f:
+            f.write('changed')
+
+        self._load_dependencies()
+        self.run_output_mock.assert_called_once_with(
+            ['ldd', self.elf_paths[0]])
+
+    def test_unresolved_libraries_are_not_cached(self):
+        self.run_output_mock.side_effect = lambda cmd: (
+            '\t{}.so.1 => not found\n'.format(os.path.basename(cmd[1])))
+        self._load_dependencies()
+        self.run_output_mock.reset_mock()
+
+        self._load_dependencies()
+        self.assertThat(self.run_output_mock.call_count, Equals(2))
+
+    def test_ldd_failures_are_not_cached(self):
+        self.run_output_mock.side_effect = subprocess.CalledProcessError(
+            1, 'ldd')
+        self.useFixture(fixtures.FakeLogger(level=logging.WARNING))
+
+        self.assertThat(self._load_dependencies(), Equals(set()))
+        self.run_output_mock.reset_mock()
+
+        self._load_dependencies()
+        self.assertThat(self.run_output_mock.call_count, Equals(2))
+
+
 class TestSystemLibsOnNewRelease(unit.TestCase):
 
     def setUp(self):
@@ -272,82 +417,107 @@ class GetElfFilesTestCase(unit.TestCase):
         self.magic_mock.return_value = self.ms_mock
         self.addCleanup(patcher.stop)
 
+        elf._load_magic.cache_clear()
+        self.addCleanup(elf._load_magic.cache_clear)
+
     def test_get_elf_files(self):
         linked_elf_path = os.path.join(self.workdir, 'linked')
-        open(linked_elf_path, 'w').close()
-
-        linked_elf_path_b = linked_elf_path.encode(sys.getfilesystemencoding())
+        _write_elf(linked_elf_path)
 
         elf_files = elf.get_elf_files(self.workdir, {'linked'})
 
         self.assertThat(len(elf_files), Equals(1))
-        self.ms_mock.file.assert_called_once_with(linked_elf_path_b)
+        self.assertFalse(self.ms_mock.file.called,
+                         'magic is not needed for well formed elf files')
 
         elf_file = set(elf_files).pop()
         self.assertThat(elf_file.path, Equals(linked_elf_path))
         self.assertThat(elf_file.is_executable, Equals(True))
 
     def test_get_elf_is_library(self):
-        self.ms_mock.file.return_value = (
-            'ELF 64-bit LSB shared object, x86-64, version 1 (SYSV), '
-            'dynamically linked, '
-            'BuildID[sha1]=62b2bc59168b25ab9b025182c1f5f43194ba167b, stripped'
-        )
         linked_elf_path = os.path.join(self.workdir, 'linked')
-        open(linked_elf_path, 'w').close()
-
-        linked_elf_path_b = linked_elf_path.encode(sys.getfilesystemencoding())
+        _write_elf(linked_elf_path, e_type=3, segment_types=[1, 2])
 
         elf_files = elf.get_elf_files(self.workdir, {'linked'})
 
         self.assertThat(len(elf_files), Equals(1))
-        self.ms_mock.file.assert_called_once_with(linked_elf_path_b)
 
         elf_file = set(elf_files).pop()
         self.assertThat(elf_file.path, Equals(linked_elf_path))
         self.assertThat(elf_file.is_executable, Equals(False))
 
+    def test_get_elf_32_bit_big_endian(self):
+        linked_elf_path = os.path.join(self.workdir, 'linked')
+        header = b'\x7fELF\x01\x02\x01' + bytes(9) + struct.pack(
+            '>HHIIIIIHHHHHH', 2, 8, 1, 0, 52, 0, 0, 52, 32, 1, 40, 0, 0)
+        with open(linked_elf_path, 'wb') as f:
+            f.write(header + struct.pack('>I', 3) + bytes(28))
+
+        elf_files = elf.get_elf_files(self.workdir, {'linked'})
+
+        self.assertThat(len(elf_files), Equals(1))
+        self.assertThat(set(elf_files).pop().is_executable, Equals(True))
+
     def test_skip_object_files(self):
-        open(os.path.join(self.workdir, 'object_file.o'), 'w').close()
+        _write_elf(os.path.join(self.workdir, 'object_file.o'), e_type=1,
+                   segment_types=[])
 
         elf_files = elf.get_elf_files(self.workdir, {'object_file.o'})
 
-        self.assertFalse(self.ms_mock.file.called,
-                         'Expected object file to be skipped')
         self.assertThat(elf_files, Equals(set()))
 
-    def test_no_find_dependencies_of_non_dynamically_linked(self):
-        statically_linked_elf_path = os.path.join(self.workdir,
-                                                  'statically-linked')
-        open(statically_linked_elf_path, 'w').close()
+    def test_skip_relocatable_files(self):
+        _write_elf(os.path.join(self.workdir, 'object_file'), e_type=1,
+                   segment_types=[])
 
-        statically_linked_elf_path_b = statically_linked_elf_path.encode(
-            sys.getfilesystemencoding())
+        elf_files = elf.get_elf_files(self.workdir, {'object_file'})
 
-        self.ms_mock.file.return_value = (
-            'ELF 64-bit LSB executable, x86-64, version 1 (SYSV), '
-            'statically linked, for GNU/Linux 2.6.32, '
-            'BuildID[sha1]=XYZ, stripped')
+        self.assertThat(elf_files, Equals(set()))
+
+    def test_no_find_dependencies_of_non_dynamically_linked(self):
+        _write_elf(os.path.join(self.workdir, 'statically-linked'),
+                   segment_types=[1, 4])
 
         elf_files = elf.get_elf_files(self.workdir,
                                       {'statically-linked'})
 
-        self.ms_mock.file.assert_called_once_with(statically_linked_elf_path_b)
         self.assertThat(elf_files, Equals(set()))
 
     def test_non_elf_files(self):
         non_elf_path = os.path.join(self.workdir, 'non-elf')
-        open(non_elf_path, 'w').close()
-
-        non_elf_path_b = non_elf_path.encode(sys.getfilesystemencoding())
-
-        self.ms_mock.file.return_value = 'JPEG image data, Exif standard: ...'
+        with open(non_elf_path, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe1 JPEG image data')
 
         elf_files = elf.get_elf_files(self.workdir, {'non-elf'})
 
-        self.ms_mock.file.assert_called_once_with(non_elf_path_b)
+        self.assertFalse(self.ms_mock.file.called,
+                         'magic is not needed for non elf files')
         self.assertThat(elf_files, Equals(set()))
 
+    def test_malformed_elf_files_use_magic(self):
+        malformed_elf_path = os.path.join(self.workdir, 'malformed')
+        with open(malformed_elf_path, 'wb') as f:
+            f.write(b'\x7fELF\x02')
+
+        malformed_elf_path_b = malformed_elf_path.encode(
+            sys.getfilesystemencoding())
+
+        elf_files = elf.get_elf_files(self.workdir, {'malformed'})
+
+        self.ms_mock.file.assert_called_once_with(malformed_elf_path_b)
+        self.assertThat(len(elf_files), Equals(1))
+        self.assertThat(set(elf_files).pop().is_executable, Equals(True))
+
+    def test_magic_is_loaded_once(self):
+        for name in ('malformed1', 'malformed2'):
+            with open(os.path.join(self.workdir, name), 'wb') as f:
+                f.write(b'\x7fELF')
+
+        elf.get_elf_files(self.workdir, {'malformed1', 'malformed2'})
+
+        self.assertThat(self.ms_mock.file.call_count, Equals(2))
+        self.magic_mock.assert_called_once_with(0)
+
     def test_symlinks(self):
         symlinked_path = os.path.join(self.workdir, 'symlinked')
         os.symlink('/bin/dash', symlinked_path)
@@ -360,10 +530,12 @@ class GetElfFilesTestCase(unit.TestCase):
 
     def test_fail_to_load_magic_raises_exception(self):
         self.magic_mock.return_value.load.return_value = 1
+        with open(os.path.join(self.workdir, 'malformed'), 'wb') as f:
+            f.write(b'\x7fELF')
 
         raised = self.assertRaises(
             RuntimeError,
-            elf.get_elf_files, '.', set('libfake.so'))
+            elf.get_elf_files, self.workdir, {'malformed'})
 
         self.assertThat(
             raised.__str__(), Equals('Cannot load magic header detection'))
@@ -419,6 +591,105 @@ class TestPatcher(unit.TestCase):
         self.assertFalse(check_call_mock.called)
 
 
+class TestPatcherBatch(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(fixtures.EnvironmentVariable('SNAP', ''))
+        self.useFixture(fixtures.EnvironmentVariable('SNAP_NAME', ''))
+
+        patcher = mock.patch('subprocess.check_call')
+        self.check_call_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.makedirs(os.path.join(self.prime_dir, 'bin'))
+        os.makedirs(os.path.join(self.prime_dir, 'lib'))
+        self.elf_path = os.path.join(self.prime_dir, 'bin', 'foo')
+        self.elf_file = elf.ElfFile(path=self.elf_path, is_executable=True)
+        self.elf_file.dependencies = {mock.Mock(
+            path=os.path.join(self.prime_dir, 'lib', 'libfoo.so.1'),
+            in_base_snap=False)}
+        self.elf_patcher = elf.Patcher(dynamic_linker='/lib/fake-ld',
+                                       root_path=self.prime_dir)
+
+    def test_read_elf_paths(self):
+        _write_elf_with_paths(self.elf_path, interpreter='/lib/ld.so',
+                              rpath='/usr/lib')
+
+        self.assertThat(elf._read_elf_paths(self.elf_path), Equals(
+            elf._ElfPaths(interpreter='/lib/ld.so', rpath='/usr/lib',
+                          runpath=None)))
+
+    def test_patch_interpreter_and_rpath_at_once(self):
+        _write_elf_with_paths(self.elf_path, interpreter='/lib/ld.so',
+                              rpath='/usr/lib')
+
+        self.elf_patcher.patch(elf_file=self.elf_file)
+
+        self.check_call_mock.assert_called_once_with([
+            'patchelf', '--set-interpreter', '/lib/fake-ld',
+            '--force-rpath', '--set-rpath', '$ORIGIN/../lib',
+            self.elf_path])
+
+    def test_patch_only_what_differs(self):
+        _write_elf_with_paths(self.elf_path, interpreter='/lib/fake-ld',
+                              rpath='/usr/lib')
+
+        self.elf_patcher.patch(elf_file=self.elf_file)
+
+        self.check_call_mock.assert_called_once_with([
+            'patchelf', '--force-rpath', '--set-rpath', '$ORIGIN/../lib',
+            self.elf_path])
+
+    def test_patch_skips_patched_files(self):
+        _write_elf_with_paths(self.elf_path, interpreter='/lib/fake-ld',
+                              rpath='$ORIGIN/../lib')
+
+        self.elf_patcher.patch(elf_file=self.elf_file)
+
+        self.check_call_mock.assert_not_called()
+
+    def test_patch_leaves_linked_files_unchanged(self):
+        cached_path = os.path.join(self.path, 'cached-foo')
+        _write_elf_with_paths(cached_path, interpreter='/lib/ld.so',
+                              rpath='/usr/lib')
+        os.link(cached_path, self.elf_path)
+        with open(cached_path, 'rb') as cached_file:
+            cached_contents = cached_file.read()
+
+        def patchelf(cmd):
+            with open(cmd[-1], 'r+b') as elf_file:
+                elf_file.write(b'patched')
+        self.check_call_mock.side_effect = patchelf
+
+        self.elf_patcher.patch(elf_file=self.elf_file)
+
+        with open(cached_path, 'rb') as cached_file:
+            self.assertThat(cached_file.read(), Equals(cached_contents))
+        with open(self.elf_path, 'rb') as elf_file:
+            self.assertThat(elf_file.read(7), Equals(b'patched'))
+
+    def test_patch_all(self):
+        elf_files = [elf.ElfFile(path='/fake-elf{}'.format(i),
+                                 is_executable=True) for i in range(3)]
+
+        self.elf_patcher.patch_all(elf_files=elf_files)
+
+        self.check_call_mock.assert_has_calls([
+            mock.call(['patchelf', '--set-interpreter', '/lib/fake-ld',
+                       '/fake-elf{}'.format(i)]) for i in range(3)],
+            any_order=True)
+
+    def test_patch_all_raises_patcherror(self):
+        self.check_call_mock.side_effect = subprocess.CalledProcessError(
+            2, ['patchelf'])
+        self.useFixture(fixtures.FakeLogger(level=logging.WARNING))
+
+        self.assertRaises(
+            errors.PatcherError, self.elf_patcher.patch_all,
+            elf_files=[elf.ElfFile(path='/fake-elf', is_executable=True)])
+
+
 class TestPatcherErrors(unit.TestCase):
 
     @mock.patch('subprocess.check_call',
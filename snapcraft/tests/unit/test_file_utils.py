@@ -20,7 +20,13 @@ import subprocess
 from unittest import mock
 
 import fixtures
-from testtools.matchers import Equals
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileContains,
+    FileExists,
+    Not,
+)
 
 from snapcraft import file_utils
 from snapcraft.internal.errors import (
@@ -178,6 +184,110 @@ class TestLinkOrCopy(unit.TestCase):
         self.assertTrue(os.path.isfile('foo2/bar/baz/4'))
 
 
+class SyncTreeTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs(os.path.join('src', 'dir'))
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('file')
+        with open(os.path.join('src', 'dir', 'nested'), 'w') as f:
+            f.write('nested')
+        os.symlink('file', os.path.join('src', 'link'))
+
+    def test_sync_new_tree(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+
+        self.assertThat(
+            synced_paths,
+            Equals({'file', 'dir', os.path.join('dir', 'nested'), 'link'}))
+        self.assertThat(
+            os.stat(os.path.join('dst', 'dir', 'nested')).st_ino,
+            Equals(os.stat(os.path.join('src', 'dir', 'nested')).st_ino))
+        self.assertThat(
+            os.path.join('dst', 'link'), unit.LinkExists('file'))
+
+    def test_sync_keeps_untracked_files(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+        open(os.path.join('dst', 'dir', 'nested.o'), 'w').close()
+
+        file_utils.sync_tree('src', 'dst', synced_paths=synced_paths)
+
+        self.assertThat(
+            os.path.join('dst', 'dir', 'nested.o'), FileExists())
+
+    def test_sync_prune_removes_untracked_files(self):
+        file_utils.sync_tree('src', 'dst')
+        open(os.path.join('dst', 'dir', 'nested.o'), 'w').close()
+        os.mkdir(os.path.join('dst', 'other'))
+
+        synced_paths = file_utils.sync_tree('src', 'dst', prune=True)
+
+        self.assertThat(
+            synced_paths,
+            Equals({'file', 'dir', os.path.join('dir', 'nested'), 'link'}))
+        self.assertThat(
+            os.path.join('dst', 'dir', 'nested.o'), Not(FileExists()))
+        self.assertThat(os.path.join('dst', 'other'), Not(DirExists()))
+
+    def test_sync_removes_deleted_files(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+        os.remove(os.path.join('src', 'file'))
+        os.remove(os.path.join('src', 'dir', 'nested'))
+        os.rmdir(os.path.join('src', 'dir'))
+
+        synced_paths = file_utils.sync_tree(
+            'src', 'dst', synced_paths=synced_paths)
+
+        self.assertThat(synced_paths, Equals({'link'}))
+        self.assertThat(os.path.join('dst', 'file'), Not(FileExists()))
+        self.assertThat(os.path.join('dst', 'dir'), Not(DirExists()))
+
+    def test_sync_replaces_changed_files(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+        os.remove(os.path.join('src', 'file'))
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('new file')
+
+        file_utils.sync_tree('src', 'dst', synced_paths=synced_paths)
+
+        self.assertThat(
+            os.path.join('dst', 'file'), FileContains('new file'))
+
+    def test_sync_replaces_retargeted_links(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+        link_stat = os.stat(os.path.join('dst', 'link'),
+                            follow_symlinks=False)
+        os.remove(os.path.join('src', 'link'))
+        # Same length and mtime as the old target.
+        os.symlink('elif', os.path.join('src', 'link'))
+        os.utime(os.path.join('src', 'link'), follow_symlinks=False,
+                 ns=(link_stat.st_atime_ns, link_stat.st_mtime_ns))
+
+        file_utils.sync_tree('src', 'dst', synced_paths=synced_paths)
+
+        self.assertThat(
+            os.readlink(os.path.join('dst', 'link')), Equals('elif'))
+
+    def test_sync_leaves_unchanged_files_alone(self):
+        synced_paths = file_utils.sync_tree('src', 'dst')
+
+        with mock.patch('snapcraft.file_utils.link_or_copy') as mock_link:
+            file_utils.sync_tree('src', 'dst', synced_paths=synced_paths)
+
+        mock_link.assert_not_called()
+
+    def test_sync_with_ignore(self):
+        def ignore(directory, files):
+            return ['dir'] if directory == 'src' else []
+
+        synced_paths = file_utils.sync_tree('src', 'dst', ignore=ignore)
+
+        self.assertThat(synced_paths, Equals({'file', 'link'}))
+        self.assertThat(os.path.join('dst', 'dir'), Not(DirExists()))
+
+
 class ExecutableExistsTestCase(unit.TestCase):
 
     def test_file_does_not_exist(self):
@@ -22,6 +22,7 @@ from unittest.mock import patch
 
 from testtools.matchers import Equals
 
+from snapcraft.file_utils import calculate_hash
 from snapcraft.internal import indicators
 from snapcraft.tests import unit
 
@@ -99,6 +100,28 @@ class IndicatorsDownloadTests(unit.FakeFileHTTPServerBasedTestCase):
 
         self.assertTrue(os.path.exists(self.dest_file))
 
+    def test_download_request_stream_digests(self):
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digests = indicators.download_requests_stream(
+            request, self.dest_file, algorithms=['sha3_384', 'sha512'])
+
+        self.assertThat(digests, Equals({
+            'sha3_384': calculate_hash(self.dest_file, algorithm='sha3_384'),
+            'sha512': calculate_hash(self.dest_file, algorithm='sha512'),
+        }))
+
+    def test_download_request_stream_resumed_digests(self):
+        with open(self.dest_file, 'w') as f:
+            f.write('Resumed ')
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digests = indicators.download_requests_stream(
+            request, self.dest_file, total_read=8, algorithms=['sha512'])
+
+        with open(self.dest_file) as f:
+            self.assertThat(f.read(), Equals('Resumed Test fake file'))
+        self.assertThat(digests, Equals({
+            'sha512': calculate_hash(self.dest_file, algorithm='sha512')}))
+
     def test_download_urllib_source(self):
         indicators.download_urllib_source(self.source, self.dest_file)
 
@@ -17,6 +17,7 @@
 
 import contextlib
 import fileinput
+import io
 import logging
 import os
 import re
@@ -631,6 +632,71 @@ class ExecutionTestCase(BaseLifecycleTestCase):
                 "The 'bar' and 'foo' project options appear to have changed.\n"
             ))
 
+    def test_changed_source_with_fingerprint_is_pulled_again(self):
+        os.mkdir('src')
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('content')
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    source: src
+                    build-attributes: [source-fingerprint]
+                """))
+
+        lifecycle.execute('pull', self.project_options)
+
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('new content')
+
+        # Reset logging since we only care about the following
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        lifecycle.execute('pull', self.project_options)
+
+        self.assertThat(
+            self.fake_logger.output, Equals(
+                'Skipping cleaning priming area for part1 (out of date) '
+                '(already clean)\n'
+                'Skipping cleaning staging area for part1 (out of date) '
+                '(already clean)\n'
+                'Skipping cleaning build for part1 (out of date) '
+                '(already clean)\n'
+                'Cleaning pulled source for part1 (out of date)\n'
+                'Preparing to pull part1 \n'
+                'Pulling part1 \n'))
+        self.assertThat(
+            os.path.join(self.parts_dir, 'part1', 'src', 'file'),
+            FileContains('new content'))
+
+    def test_unchanged_source_with_fingerprint_is_not_pulled_again(self):
+        os.mkdir('src')
+        open(os.path.join('src', 'file'), 'w').close()
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    source: src
+                    build-attributes: [source-fingerprint]
+                """))
+
+        lifecycle.execute('pull', self.project_options)
+
+        os.utime(os.path.join('src', 'file'), (0, 0))
+
+        # Reset logging since we only care about the following
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        lifecycle.execute('pull', self.project_options)
+
+        self.assertThat(
+            self.fake_logger.output,
+            Equals('Skipping pull part1 (already ran)\n'))
+
     @mock.patch.object(snapcraft.BasePlugin, 'enable_cross_compilation')
     @mock.patch('snapcraft.repo.Repo.install_build_packages')
     def test_pull_is_dirty_if_target_arch_changes(
@@ -684,6 +750,90 @@ class ExecutionTestCase(BaseLifecycleTestCase):
             Not(DirExists()))
 
 
+class ConcurrentExecutionTestCase(BaseLifecycleTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.project_options = snapcraft.ProjectOptions(jobs=2)
+        self.fake_stdout = io.StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.fake_stdout))
+
+    def assert_step_done(self, part_name, step):
+        self.assertThat(
+            os.path.join(self.parts_dir, part_name, 'state', step),
+            FileExists())
+
+    def test_build_independent_parts(self):
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    build: echo building part1
+                  part2:
+                    plugin: nil
+                    build: echo building part2
+                """))
+
+        lifecycle.execute('build', self.project_options)
+
+        for part_name in ('part1', 'part2'):
+            self.assert_step_done(part_name, 'build')
+            self.assertThat(
+                self.fake_stdout.getvalue(),
+                Contains('{0}| building {0}\n'.format(part_name)))
+
+    def test_prerequisites_are_staged_first(self):
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    build: touch $SNAPCRAFT_PART_INSTALL/file1
+                  part2:
+                    plugin: nil
+                    after: [part1]
+                    build: test -f $SNAPCRAFT_STAGE/file1
+                  part3:
+                    plugin: nil
+                """))
+
+        lifecycle.execute('build', self.project_options)
+
+        self.assert_step_done('part1', 'stage')
+        self.assert_step_done('part2', 'build')
+        self.assert_step_done('part3', 'build')
+        self.assertThat(
+            os.path.join(self.parts_dir, 'part3', 'state', 'stage'),
+            Not(FileExists()))
+
+    def test_failed_step_raises(self):
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    build: exit 1
+                  part2:
+                    plugin: nil
+                    build: sleep 60
+                """))
+
+        raised = self.assertRaises(
+            errors.StepWorkerError,
+            lifecycle.execute,
+            'build', self.project_options)
+
+        self.assertThat(raised.step, Equals('build'))
+        self.assertThat(raised.part, Equals('part1'))
+        self.assertThat(raised.exit_code, Equals(1))
+        # The other workers are stopped rather than waited for.
+        self.assertThat(
+            os.path.join(self.parts_dir, 'part2', 'state', 'build'),
+            Not(FileExists()))
+
+
 class DirtyBuildScriptletTestCase(BaseLifecycleTestCase):
 
     scenarios = (
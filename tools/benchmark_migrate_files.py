@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how many files per second stage and prime can migrate.
+
+A synthetic tree is generated in a temporary directory and migrated with
+the same function used by the stage and prime steps, once hard-linking
+and once forcing the fallback copies.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+from snapcraft.internal import pluginhandler
+
+
+def _generate_tree(top, *, directories, files_per_directory):
+    snap_files = set()
+    snap_dirs = set()
+    for i in range(directories):
+        directory = os.path.join('usr', 'lib', 'dir{}'.format(i // 10),
+                                 'dir{}'.format(i))
+        os.makedirs(os.path.join(top, directory))
+        snap_dirs.add(directory)
+        for j in range(files_per_directory):
+            snap_file = os.path.join(directory, 'file{}'.format(j))
+            with open(os.path.join(top, snap_file), 'w') as f:
+                f.write(snap_file)
+            snap_files.add(snap_file)
+    return snap_files, snap_dirs
+
+
+def _benchmark(snap_files, snap_dirs, srcdir, dstdir):
+    start = time.monotonic()
+    pluginhandler._migrate_files(snap_files, snap_dirs, srcdir, dstdir)
+    return len(snap_files) / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--directories', type=int, default=1000)
+    parser.add_argument('--files-per-directory', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        srcdir = os.path.join(tmp, 'install')
+        snap_files, snap_dirs = _generate_tree(
+            srcdir, directories=args.directories,
+            files_per_directory=args.files_per_directory)
+
+        rate = _benchmark(snap_files, snap_dirs, srcdir,
+                          os.path.join(tmp, 'link'))
+        print('Hard-linked {} files at {:.0f} files/s'.format(
+            len(snap_files), rate))
+
+        with mock.patch('os.link', side_effect=OSError):
+            rate = _benchmark(snap_files, snap_dirs, srcdir,
+                              os.path.join(tmp, 'copy'))
+        print('Copied {} files at {:.0f} files/s'.format(
+            len(snap_files), rate))
+
+
+if __name__ == '__main__':
+    main()